@@ -0,0 +1,117 @@
+from django.core.exceptions import PermissionDenied
+from django.db.models import Case, Exists, OuterRef, Q, Subquery, Value, When
+from .models import Note, NoteVersion, SharedNoteUser
+from .sharding import shard_for_note, shard_for_user, sharded
+
+
+def shared_note_ids(user):
+    """
+    Subquery selecting the IDs of the notes shared with a user.
+
+    Args:
+        user (User): The user the notes are shared with.
+
+    Returns:
+        QuerySet: A `note_id` values queryset, usable inside `pk__in`.
+    """
+    return SharedNoteUser.objects.filter(user_id=user.pk).values('note_id')
+
+
+def accessible_notes(user, shard=None):
+    """
+    Queryset of every note on a shard that a user owns or has been shared with.
+
+    Args:
+        user (User): The user whose notes are requested.
+        shard (str): Alias of the shard to query; defaults to the user's own shard.
+            See `backend.sharding.user_shards` for every shard holding notes the user can access.
+
+    Returns:
+        QuerySet: The accessible notes, served by the `(user, updated_at)` and `(user, note)` indexes.
+    """
+    shard = shard or shard_for_user(user.pk)
+    return sharded(Note, shard).filter(Q(user_id=user.pk) | Q(pk__in=shared_note_ids(user)))
+
+
+def with_access(queryset, user):
+    """
+    Annotate a note queryset with whether `user` may access each note.
+
+    Ownership is checked on the `user_id` column, so the owning User row is never loaded,
+    and sharing is resolved with a correlated EXISTS against the `(user, note)` index.
+
+    Args:
+        queryset (QuerySet): The note queryset to annotate.
+        user (User): The user requesting access.
+
+    Returns:
+        QuerySet: The queryset with a boolean `has_access` annotation.
+    """
+    return queryset.annotate(
+        has_access=Case(
+            When(user_id=user.pk, then=Value(True)),
+            default=Exists(
+                SharedNoteUser.objects.filter(note=OuterRef('pk'), user_id=user.pk)
+            )
+        )
+    )
+
+
+def get_accessible_note(user, note_id, fields=None):
+    """
+    Fetch a note and check that `user` owns it or has it shared with them, in a single query.
+
+    Args:
+        user (User): The user requesting access.
+        note_id (int): ID of the note.
+        fields (list): Optional list of columns to load; defaults to all columns.
+
+    Returns:
+        Note: The requested note.
+
+    Raises:
+        Note.DoesNotExist: If the note does not exist.
+        PermissionDenied: If the note exists but the user may not access it.
+    """
+    queryset = sharded(Note, shard_for_note(note_id)).all()
+    if fields is not None:
+        queryset = queryset.only(*fields)
+
+    note = with_access(queryset, user).get(pk=note_id)
+    if not note.has_access:
+        raise PermissionDenied("Unauthorized access")
+    return note
+
+
+def get_accessible_note_values(user, note_id, fields, with_latest_version=False):
+    """
+    Fetch selected columns of a note as a dict, checking access in the same query.
+
+    Unlike `get_accessible_note`, no model instance is built, which makes this the
+    cheapest way to read a note for a response.
+
+    Args:
+        user (User): The user requesting access.
+        note_id (int): ID of the note.
+        fields (list): Columns to read.
+        with_latest_version (bool): Also read the ID of the note's latest version as `latest_version_id`.
+
+    Returns:
+        dict: The requested columns of the note.
+
+    Raises:
+        Note.DoesNotExist: If the note does not exist.
+        PermissionDenied: If the note exists but the user may not access it.
+    """
+    queryset = with_access(sharded(Note, shard_for_note(note_id)).filter(pk=note_id), user)
+    if with_latest_version:
+        latest_version = NoteVersion.objects.filter(note=OuterRef('pk')).order_by('-id').values('id')[:1]
+        queryset = queryset.annotate(latest_version_id=Subquery(latest_version))
+        fields = [*fields, 'latest_version_id']
+
+    row = queryset.values(*fields, 'has_access').first()
+    if row is None:
+        raise Note.DoesNotExist("Note does not exist")
+    if not row.pop('has_access'):
+        raise PermissionDenied("Unauthorized access")
+    return row
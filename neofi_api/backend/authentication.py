@@ -0,0 +1,144 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+
+class TokenCache:
+    """
+    Bounded, thread-safe LRU cache of token key -> (user, token) with a time-to-live.
+
+    The cache lives in the process, so entries are invalidated immediately by the
+    signal handlers of this process, and by the TTL everywhere else.
+    """
+
+    def __init__(self, max_size=None, ttl=None):
+        self._max_size = max_size
+        self._ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def max_size(self):
+        return self._max_size or settings.TOKEN_AUTH_CACHE_SIZE
+
+    @property
+    def ttl(self):
+        return self._ttl if self._ttl is not None else settings.TOKEN_AUTH_CACHE_TTL
+
+    def get(self, key):
+        """
+        Return the cached (user, token) pair of a token key, or None if absent or expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, credentials = entry
+            if expires_at <= time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return credentials
+
+    def set(self, key, credentials):
+        """
+        Cache the (user, token) pair of a token key, evicting the least recently used entry if full.
+        """
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, credentials)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_key(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def invalidate_user(self, user_id):
+        with self._lock:
+            for key in [key for key, (_, (user, _)) in self._entries.items() if user.pk == user_id]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Process-wide token cache used by CachedTokenAuthentication
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for `TokenAuthentication` that caches token lookups in process.
+
+    Tokens are cached for `TOKEN_AUTH_CACHE_TTL` seconds in an LRU of at most
+    `TOKEN_AUTH_CACHE_SIZE` entries, so most authenticated requests skip the
+    Token + User query. Deleting or rotating a token, or saving or deleting its user
+    (including deactivating it), invalidates the cached entries immediately.
+    """
+
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(key, credentials)
+
+        # Hand each request its own user instance, so request code cannot alter the cached one
+        user, token = credentials
+        return copy.copy(user), token
+
+
+@database_sync_to_async
+def get_token_user(key):
+    """
+    Return the active user owning a token, or an anonymous user.
+
+    Args:
+        key (str): The token key.
+
+    Returns:
+        User: The token's user, or AnonymousUser if the token is unknown or the user inactive.
+    """
+    try:
+        token = Token.objects.select_related('user').get(key=key)
+    except Token.DoesNotExist:
+        return AnonymousUser()
+    return token.user if token.user.is_active else AnonymousUser()
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Channels middleware authenticating WebSocket connections with a REST framework token.
+
+    The token is read from an `Authorization: Token <key>` header or, since browsers
+    cannot set headers on WebSocket requests, from a `token` query string parameter.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        key = self.get_token_key(scope)
+        scope['user'] = await get_token_user(key) if key else AnonymousUser()
+        return await super().__call__(scope, receive, send)
+
+    @staticmethod
+    def get_token_key(scope):
+        for name, value in scope.get('headers', []):
+            if name == b'authorization':
+                keyword, _, key = value.decode().partition(' ')
+                if keyword.lower() == 'token' and key:
+                    return key.strip()
+
+        query = parse_qs(scope.get('query_string', b'').decode())
+        return query.get('token', [None])[0]
@@ -0,0 +1,158 @@
+from django.db import transaction
+from rest_framework import status
+from .access import with_access
+from .cache import invalidate_note_lists
+from .events import publish_note_changes
+from .models import Note, SharedNoteUser
+from .search import index_notes
+from .serializers import NoteSerializer
+from .sharding import allocate_note_ids, shard_for_user, shards_for_notes, sharded
+from .versions import append_to_notes
+
+
+def validate_items(items, **kwargs):
+    """
+    Validate a list of items with `NoteSerializer(many=True)`, keeping the valid ones.
+
+    Args:
+        items (list): The items to validate.
+        **kwargs: Extra arguments for the serializer, such as `partial`.
+
+    Returns:
+        tuple: The validated data of each item (None when invalid) and the errors of each item (empty when valid).
+    """
+    serializer = NoteSerializer(data=items, many=True, **kwargs)
+    if serializer.is_valid():
+        return list(serializer.validated_data), [{} for _ in items]
+
+    # Only some items are invalid: validate the others again to get their data
+    errors = serializer.errors
+    valid_indexes = [index for index, error in enumerate(errors) if not error]
+    validated = [None] * len(items)
+    if valid_indexes:
+        serializer = NoteSerializer(data=[items[index] for index in valid_indexes], many=True, **kwargs)
+        serializer.is_valid()
+        for index, data in zip(valid_indexes, serializer.validated_data):
+            validated[index] = data
+    return validated, errors
+
+
+def batch_create_notes(user, items):
+    """
+    Create many notes owned by `user` in one transaction on the user's shard.
+
+    Args:
+        user (User): The owner of the new notes.
+        items (list): Dicts with the `title` and `content` of each note.
+
+    Returns:
+        list: One result per item, in order, with its HTTP status and either the note ID or the errors.
+    """
+    validated, errors = validate_items([
+        {'title': item.get('title'), 'content': item.get('content')}
+        for item in items
+    ])
+
+    valid = [data for data in validated if data is not None]
+    note_ids = allocate_note_ids(user.pk, len(valid))
+    notes = [
+        Note(id=note_id, user=user, title=data['title'], content=data['content'])
+        for note_id, data in zip(note_ids, valid)
+    ]
+    shard = shard_for_user(user.pk)
+    with transaction.atomic(using=shard):
+        sharded(Note, shard).bulk_create(notes)
+        index_notes(notes, using=shard)
+
+    if notes:
+        invalidate_note_lists([user.pk])
+
+    created = iter(notes)
+    results = []
+    for index, data in enumerate(validated):
+        if data is None:
+            results.append({'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors[index]})
+        else:
+            results.append({'index': index, 'status': status.HTTP_201_CREATED, 'id': next(created).pk})
+    return results
+
+
+def batch_update_notes(user, items):
+    """
+    Append content to many notes the user can access, in one transaction per shard.
+
+    The updates of each shard go through one `append_to_notes` call, the bulk form of what
+    `update_note` does: the deltas are appended inside the database, so note contents are
+    never loaded and appends made concurrently by other requests are kept, and the number of
+    queries does not grow with the number of updates.
+
+    Args:
+        user (User): The user making the changes.
+        items (list): Dicts with the `id` of a note and the `content` to append to it.
+
+    Returns:
+        list: One result per item, in order, with its HTTP status and either the new version number or the error.
+    """
+    validated, errors = validate_items(
+        [{'content': item.get('content')} for item in items],
+        partial=True
+    )
+
+    results = [None] * len(items)
+    note_ids = {}
+    for index, item in enumerate(items):
+        if validated[index] is None:
+            results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': errors[index]}
+            continue
+        try:
+            note_ids[index] = int(item.get('id'))
+        except (TypeError, ValueError):
+            results[index] = {'index': index, 'status': status.HTTP_400_BAD_REQUEST, 'errors': {'id': ['A valid note ID is required.']}}
+
+    # Check access with one query per shard, without loading the contents
+    shards = shards_for_notes(note_ids.values())
+    notes = {}
+    for shard, shard_note_ids in shards.items():
+        notes.update(
+            (note.pk, note)
+            for note in with_access(sharded(Note, shard).filter(pk__in=shard_note_ids).only('id', 'user_id'), user)
+        )
+
+    # Group the allowed updates by shard, keeping the request order within each shard
+    note_shard = {note_id: shard for shard, shard_note_ids in shards.items() for note_id in shard_note_ids}
+    by_shard = {}
+    for index, note_id in note_ids.items():
+        note = notes.get(note_id)
+        if note is None:
+            results[index] = {'index': index, 'status': status.HTTP_404_NOT_FOUND, 'error': 'Note does not exist'}
+        elif not note.has_access:
+            results[index] = {'index': index, 'status': status.HTTP_403_FORBIDDEN, 'error': 'Unauthorized access'}
+        else:
+            by_shard.setdefault(note_shard[note_id], []).append(index)
+
+    updated = {}
+    recipient_ids = []
+    for shard, indexes in by_shard.items():
+        # One transaction, UPDATE and version insert per shard; appends keep the request order,
+        # so repeated notes get consecutive versions
+        with transaction.atomic(using=shard):
+            versions = append_to_notes(
+                shard, user, [(notes[note_ids[index]], validated[index]['content']) for index in indexes]
+            )
+            publish_note_changes(versions, using=shard)
+
+        for index, version in zip(indexes, versions):
+            updated[version.note_id] = notes[version.note_id]
+            results[index] = {'index': index, 'status': status.HTTP_200_OK, 'id': version.note_id, 'version': version.number}
+
+        recipient_ids.extend(
+            sharded(SharedNoteUser, shard)
+            .filter(note_id__in={note_ids[index] for index in indexes})
+            .values_list('user_id', flat=True)
+        )
+
+    if updated:
+        # The new updated_at reorders the notes in their owners' and recipients' lists
+        invalidate_note_lists([*(note.user_id for note in updated.values()), *recipient_ids])
+
+    return results
@@ -0,0 +1,665 @@
+import itertools
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+import uuid
+from contextlib import ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+from django.db.utils import ConnectionHandler
+from django.test import Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from .access import accessible_notes
+from .fields import compress_text, decompress_text
+from .models import Note, NoteVersion
+from .routers import PrimaryReplicaRouter
+from .sharding import note_shards, shard_for_user, sharded, user_shards
+from .urls import urlpatterns
+
+
+class BenchmarkContext:
+    """
+    Seeded data the benchmark scenarios draw their requests from.
+
+    Args:
+        prefix (str): Username prefix used by `seed_data`.
+        password (str): Password of the seeded users.
+    """
+
+    def __init__(self, prefix, password):
+        tokens = list(
+            Token.objects.filter(user__username__startswith=prefix)
+            .select_related('user')
+            .order_by('user_id')
+        )
+        if len(tokens) < 2:
+            raise ValueError(f"At least two users named '{prefix}*' with tokens are required; run seed_data first.")
+
+        self.prefix = prefix
+        self.password = password
+        self.token = tokens[0].key
+        self.user = tokens[0].user
+        self.usernames = [token.user.username for token in tokens[1:]]
+        # Oldest first, so earlier benchmark runs' notes (without versions) are not picked
+        self.owned_note_ids = list(
+            sharded(Note, shard_for_user(self.user.pk)).filter(user=self.user).order_by('id').values_list('id', flat=True)[:1000]
+        )
+        self.note_ids = []
+        self.versioned = []
+        for shard in user_shards(self.user.pk):
+            note_ids = list(accessible_notes(self.user, shard).order_by('id').values_list('id', flat=True)[:1000])
+            self.note_ids.extend(note_ids)
+            self.versioned.extend(
+                sharded(NoteVersion, shard).filter(note_id__in=note_ids).order_by('id').values_list('note_id', 'number')[:1000]
+            )
+        if not self.owned_note_ids or not self.versioned:
+            raise ValueError("The benchmark user needs notes with versions; run seed_data with --notes and --versions.")
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+
+    def next(self):
+        """
+        Return a process-wide increasing number, to spread requests over the seeded data.
+        """
+        with self._lock:
+            return next(self._counter)
+
+    def pick(self, items):
+        return items[self.next() % len(items)]
+
+
+def consume(response):
+    """
+    Read a streamed response to the end, so its queries run inside the measurement.
+    """
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return response
+
+
+# Request builders for every route in backend/urls.py, keyed by route pattern.
+# Each takes a test client and the benchmark context and performs one request.
+SCENARIOS = {
+    'signup/': lambda client, ctx: client.post('/signup/', {
+        'username': f'{ctx.prefix}-signup-{uuid.uuid4().hex[:12]}',
+        'email': f'{uuid.uuid4().hex[:12]}@example.com',
+        'password': 'benchmark123',
+    }),
+    'login/': lambda client, ctx: client.post('/login/', {
+        'username': ctx.user.username,
+        'password': ctx.password,
+    }),
+    'notes/create/': lambda client, ctx: client.post('/notes/create/', {
+        'title': 'Benchmark note',
+        'content': 'Created by the benchmark',
+    }),
+    'notes/batch/create/': lambda client, ctx: client.post('/notes/batch/create/', [
+        {'title': f'Benchmark note {index}', 'content': 'Created by the benchmark'} for index in range(10)
+    ], content_type='application/json'),
+    'notes/batch/update/': lambda client, ctx: client.put('/notes/batch/update/', [
+        {'id': ctx.pick(ctx.owned_note_ids), 'content': 'Appended by the benchmark'} for _ in range(10)
+    ], content_type='application/json'),
+    'notes/list/': lambda client, ctx: client.get('/notes/list/'),
+    'notes/<int:id>/': lambda client, ctx: client.get(f'/notes/{ctx.pick(ctx.note_ids)}/'),
+    'notes/<int:id>/diff/': lambda client, ctx: client.get(
+        '/notes/{}/diff/?from=1&to={}'.format(*ctx.pick(ctx.versioned))
+    ),
+    'notes/search/': lambda client, ctx: client.get('/notes/search/', {'q': 'note'}),
+    'notes/export/': lambda client, ctx: consume(client.get('/notes/export/')),
+    'notes/share/': lambda client, ctx: client.post('/notes/share/', {
+        'note_id': ctx.pick(ctx.owned_note_ids),
+        'usernames': ctx.usernames[:5],
+    }, content_type='application/json'),
+    'notes/version-history/<int:id>/': lambda client, ctx: client.get(
+        f'/notes/version-history/{ctx.pick(ctx.versioned)[0]}/'
+    ),
+    'notes/version-history/<int:id>/<int:number>/': lambda client, ctx: client.get(
+        '/notes/version-history/{}/{}/'.format(*ctx.pick(ctx.versioned))
+    ),
+    'notes/update/<int:id>/': lambda client, ctx: client.put(
+        f'/notes/update/{ctx.pick(ctx.owned_note_ids)}/',
+        {'content': 'Appended by the benchmark'},
+        content_type='application/json'
+    ),
+}
+
+
+def missing_scenarios():
+    """
+    Return the routes of backend/urls.py that have no benchmark scenario.
+    """
+    return [str(pattern.pattern) for pattern in urlpatterns if str(pattern.pattern) not in SCENARIOS]
+
+
+def percentile(values, fraction):
+    """
+    Return a percentile of a list of values, interpolating between the closest ranks.
+    """
+    ordered = sorted(values)
+    if len(ordered) == 1:
+        return ordered[0]
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def database_size(alias):
+    """
+    Return the size in bytes of a SQLite database (its pages, without the WAL), or None for other engines.
+    """
+    connection = connections[alias]
+    if connection.vendor != 'sqlite':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("PRAGMA page_count")
+        page_count = cursor.fetchone()[0]
+        cursor.execute("PRAGMA page_size")
+        return page_count * cursor.fetchone()[0]
+
+
+def benchmark_host():
+    """
+    Return a host name accepted by ALLOWED_HOSTS, for the in-process client.
+    """
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*' and not host.startswith('.'):
+            return host
+    return 'localhost'
+
+
+def _run_requests(scenario, ctx, count, worker=False):
+    # One client per worker, authenticated with the benchmark user's token
+    client = Client(
+        SERVER_NAME=benchmark_host(),
+        HTTP_AUTHORIZATION=f'Token {ctx.token}',
+        raise_request_exception=False  # Record server errors (e.g. locked database) as 500s
+    )
+    aliases = {DEFAULT_DB_ALIAS, PrimaryReplicaRouter().replica_alias() or DEFAULT_DB_ALIAS, *note_shards()}
+    samples = []
+    for _ in range(count):
+        # Count the queries of the primary, of the replica and of every note shard
+        with ExitStack() as stack:
+            captures = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases]
+            started = time.perf_counter()
+            response = scenario(client, ctx)
+            elapsed = time.perf_counter() - started
+        samples.append((elapsed, sum(len(capture) for capture in captures), response.status_code))
+    if worker:
+        # Worker threads own their database connections
+        connections.close_all()
+    return samples
+
+
+def run_route(route, ctx, requests, concurrency):
+    """
+    Run one route's scenario `requests` times over `concurrency` workers.
+
+    Args:
+        route (str): The route pattern.
+        ctx (BenchmarkContext): The seeded data.
+        requests (int): Total number of requests.
+        concurrency (int): Number of concurrent workers; 1 runs in the calling thread.
+
+    Returns:
+        dict: Latency percentiles (ms), throughput (requests/s), query counts and status codes.
+    """
+    scenario = SCENARIOS[route]
+    shares = [requests // concurrency + (1 if index < requests % concurrency else 0) for index in range(concurrency)]
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        samples = _run_requests(scenario, ctx, requests) if requests else []
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            futures = [executor.submit(_run_requests, scenario, ctx, share, True) for share in shares if share]
+            samples = [sample for future in futures for sample in future.result()]
+    wall_time = time.perf_counter() - started
+
+    latencies = [sample[0] * 1000 for sample in samples]
+    query_counts = [sample[1] for sample in samples]
+    status_codes = {}
+    for sample in samples:
+        status_codes[str(sample[2])] = status_codes.get(str(sample[2]), 0) + 1
+
+    return {
+        'requests': len(samples),
+        'concurrency': concurrency,
+        'latency_ms': {
+            'p50': percentile(latencies, 0.50),
+            'p95': percentile(latencies, 0.95),
+            'p99': percentile(latencies, 0.99),
+            'mean': statistics.fmean(latencies),
+            'max': max(latencies),
+        },
+        'throughput_rps': len(samples) / wall_time if wall_time else None,
+        'queries': {
+            'mean': statistics.fmean(query_counts),
+            'max': max(query_counts),
+        },
+        'status_codes': status_codes,
+    }
+
+
+def run_benchmark(ctx, routes=None, requests=100, concurrency=1):
+    """
+    Benchmark the given routes, or every route in backend/urls.py.
+
+    Args:
+        ctx (BenchmarkContext): The seeded data.
+        routes (list): Route patterns to run; defaults to every route.
+        requests (int): Requests per route.
+        concurrency (int): Number of concurrent workers per route.
+
+    Returns:
+        dict: Environment details and the results of each route, ready to be written as JSON.
+    """
+    routes = routes or [str(pattern.pattern) for pattern in urlpatterns]
+    return {
+        'environment': {
+            'python': platform.python_version(),
+            'database': settings.DATABASES['default']['ENGINE'],
+            'database_bytes': {alias: database_size(alias) for alias in note_shards()},
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+        },
+        'parameters': {
+            'requests': requests,
+            'concurrency': concurrency,
+            'prefix': ctx.prefix,
+        },
+        'routes': {route: run_route(route, ctx, requests, concurrency) for route in routes},
+    }
+
+
+# Mixed read/write workload for comparing SQLite configurations. It runs on its own
+# database file, with a notes/versions schema shaped like the app's, so it does not need
+# seeded data and never touches the configured database.
+
+SQLITE_WORKLOAD_SCHEMA = [
+    "CREATE TABLE note (id INTEGER PRIMARY KEY, content TEXT NOT NULL, updated_at REAL NOT NULL)",
+    "CREATE TABLE version (id INTEGER PRIMARY KEY, note_id INTEGER NOT NULL, number INTEGER NOT NULL, changes TEXT NOT NULL)",
+    "CREATE INDEX version_note_number ON version (note_id, number)",
+]
+
+
+def _sqlite_workload_connection(path, options):
+    # A private connection handler, so every thread opens its own connection to `path`
+    # and the connection_created handler applies the configured pragmas to it
+    handler = ConnectionHandler({'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': str(path),
+        'OPTIONS': dict(options),
+    }})
+    return handler['default']
+
+
+def _sqlite_writer(path, options, notes, count, seed):
+    db = _sqlite_workload_connection(path, options)
+    done = errors = 0
+    try:
+        for index in range(count):
+            note_id = (seed * 7919 + index) % notes + 1
+            try:
+                # Read then write in one transaction, like update_note and the batch update
+                with db.cursor() as cursor:
+                    cursor.execute("BEGIN")
+                    try:
+                        cursor.execute("SELECT COALESCE(MAX(number), 0) FROM version WHERE note_id = %s", [note_id])
+                        number = cursor.fetchone()[0] + 1
+                        cursor.execute(
+                            "UPDATE note SET content = content || %s, updated_at = %s WHERE id = %s",
+                            ["\nbenchmark", time.time(), note_id]
+                        )
+                        cursor.execute(
+                            "INSERT INTO version (note_id, number, changes) VALUES (%s, %s, %s)",
+                            [note_id, number, "benchmark"]
+                        )
+                        cursor.execute("COMMIT")
+                    except Exception:
+                        cursor.execute("ROLLBACK")
+                        raise
+                done += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        db.close()
+    return 'write', done, errors
+
+
+def _sqlite_reader(path, options, notes, count, seed):
+    db = _sqlite_workload_connection(path, options)
+    done = errors = 0
+    try:
+        for index in range(count):
+            try:
+                with db.cursor() as cursor:
+                    cursor.execute(
+                        "SELECT id, content FROM note WHERE updated_at >= %s ORDER BY updated_at DESC LIMIT 20", [0]
+                    )
+                    cursor.fetchall()
+                    cursor.execute(
+                        "SELECT number, changes FROM version WHERE note_id = %s ORDER BY number",
+                        [(seed * 7919 + index) % notes + 1]
+                    )
+                    cursor.fetchall()
+                done += 1
+            except OperationalError:
+                errors += 1
+    finally:
+        db.close()
+    return 'read', done, errors
+
+
+def _sqlite_shard_paths(path, shards):
+    # The first shard is `path` itself, the others sit next to it
+    return [path, *(path.with_name(f'{path.stem}.shard{index}{path.suffix}') for index in range(1, shards))]
+
+
+def run_sqlite_concurrency(path, options=None, writers=4, readers=4, operations=200, notes=100, shards=1):
+    """
+    Run concurrent readers and writers against fresh SQLite database files.
+
+    The connections are configured from the current settings (`SQLITE_PRAGMAS` and
+    `SQLITE_IMMEDIATE_TRANSACTIONS`), so run it under `override_settings` to compare profiles.
+    With several shards, every file holds its own notes and the threads are spread over
+    the files, the way notes are partitioned by owner across `NOTE_SHARDS`.
+
+    Args:
+        path (Path): Database file to create; it must not exist yet.
+        options (dict): `OPTIONS` of the connections, e.g. the sqlite3 `timeout`.
+        writers (int): Number of writer threads.
+        readers (int): Number of reader threads.
+        operations (int): Transactions run by each thread.
+        notes (int): Number of notes per file the writers spread their updates over.
+        shards (int): Number of database files, created next to `path`.
+
+    Returns:
+        dict: The journal mode, and the completed operations, errors and throughput of reads and writes.
+    """
+    paths = _sqlite_shard_paths(path, shards)
+    for shard_path in paths:
+        setup = _sqlite_workload_connection(shard_path, options or {})
+        with setup.cursor() as cursor:
+            for statement in SQLITE_WORKLOAD_SCHEMA:
+                cursor.execute(statement)
+            cursor.executemany(
+                "INSERT INTO note (content, updated_at) VALUES (%s, %s)",
+                [("benchmark note", time.time()) for _ in range(notes)]
+            )
+            cursor.execute("PRAGMA journal_mode")
+            journal_mode = cursor.fetchone()[0]
+        setup.close()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=writers + readers) as executor:
+        futures = [
+            *(
+                executor.submit(_sqlite_writer, paths[seed % shards], options or {}, notes, operations, seed)
+                for seed in range(writers)
+            ),
+            *(
+                executor.submit(_sqlite_reader, paths[seed % shards], options or {}, notes, operations, seed)
+                for seed in range(readers)
+            ),
+        ]
+        outcomes = [future.result() for future in futures]
+    wall_time = time.perf_counter() - started
+
+    results = {'journal_mode': journal_mode, 'shards': shards, 'wall_time_s': wall_time}
+    for kind in ('read', 'write'):
+        done = sum(outcome[1] for outcome in outcomes if outcome[0] == kind)
+        results[f'{kind}s'] = done
+        results[f'{kind}_errors'] = sum(outcome[2] for outcome in outcomes if outcome[0] == kind)
+        results[f'{kind}s_per_second'] = done / wall_time if wall_time else None
+    return results
+
+
+# Storage workload for comparing plain and compressed note text. Like the SQLite workload,
+# it runs on its own database files, filled with append-only notes and versions shaped like
+# the app's (deltas, with a full snapshot every NOTE_VERSION_SNAPSHOT_INTERVAL versions).
+COMPRESSION_WORKLOAD_SCHEMA = [
+    "CREATE TABLE note (id INTEGER PRIMARY KEY, content TEXT NOT NULL)",
+    "CREATE TABLE version (id INTEGER PRIMARY KEY, note_id INTEGER NOT NULL, number INTEGER NOT NULL, "
+    "changes TEXT NOT NULL, snapshot TEXT)",
+    "CREATE INDEX version_note_number ON version (note_id, number)",
+]
+
+
+def _compression_workload_rows(notes, versions, delta_size, seed):
+    # Words drawn from a fixed vocabulary, so the text repeats the way prose does
+    rng = random.Random(seed)
+    vocabulary = [
+        ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(2, 9)))
+        for _ in range(2000)
+    ]
+
+    def text(length):
+        return ' '.join(rng.choices(vocabulary, k=length // 6 + 1))[:length]
+
+    interval = settings.NOTE_VERSION_SNAPSHOT_INTERVAL
+    for note_id in range(1, notes + 1):
+        content = text(delta_size * 4)
+        rows = []
+        for number in range(1, versions + 1):
+            delta = text(delta_size)
+            content = content + "\n" + delta
+            rows.append((note_id, number, delta, content if (number - 1) % interval == 0 else None))
+        yield note_id, content, rows
+
+
+def _fill_compression_workload(path, encode, notes, versions, delta_size, seed):
+    db = _sqlite_workload_connection(path, {})
+    try:
+        with db.cursor() as cursor:
+            for statement in COMPRESSION_WORKLOAD_SCHEMA:
+                cursor.execute(statement)
+            for note_id, content, rows in _compression_workload_rows(notes, versions, delta_size, seed):
+                cursor.execute("INSERT INTO note (id, content) VALUES (%s, %s)", [note_id, encode(content)])
+                cursor.executemany(
+                    "INSERT INTO version (note_id, number, changes, snapshot) VALUES (%s, %s, %s, %s)",
+                    [
+                        (note_id, number, encode(changes), None if snapshot is None else encode(snapshot))
+                        for note_id, number, changes, snapshot in rows
+                    ]
+                )
+            cursor.execute("VACUUM")
+            cursor.execute("PRAGMA page_count")
+            page_count = cursor.fetchone()[0]
+            cursor.execute("PRAGMA page_size")
+            return page_count * cursor.fetchone()[0]
+    finally:
+        db.close()
+
+
+def _read_compression_workload(path, notes, versions, reads, seed):
+    rng = random.Random(seed)
+    db = _sqlite_workload_connection(path, {})
+    note_latencies = []
+    version_latencies = []
+    try:
+        with db.cursor() as cursor:
+            for _ in range(reads):
+                # Read a whole note, like get_note
+                started = time.perf_counter()
+                cursor.execute("SELECT content FROM note WHERE id = %s", [rng.randint(1, notes)])
+                decompress_text(cursor.fetchone()[0])
+                note_latencies.append(time.perf_counter() - started)
+
+                # Rebuild a past version from its snapshot and deltas, like materialize_version
+                note_id, number = rng.randint(1, notes), rng.randint(1, versions)
+                started = time.perf_counter()
+                cursor.execute(
+                    "SELECT number, snapshot FROM version WHERE note_id = %s AND number <= %s AND snapshot IS NOT NULL "
+                    "ORDER BY number DESC LIMIT 1",
+                    [note_id, number]
+                )
+                base, snapshot = cursor.fetchone()
+                cursor.execute(
+                    "SELECT changes FROM version WHERE note_id = %s AND number > %s AND number <= %s ORDER BY number",
+                    [note_id, base, number]
+                )
+                content = decompress_text(snapshot) + ''.join("\n" + decompress_text(row[0]) for row in cursor.fetchall())
+                version_latencies.append(time.perf_counter() - started)
+    finally:
+        db.close()
+
+    def summary(latencies):
+        milliseconds = [latency * 1000 for latency in latencies]
+        return {'p50': percentile(milliseconds, 0.50), 'p95': percentile(milliseconds, 0.95)}
+
+    return summary(note_latencies), summary(version_latencies)
+
+
+def run_compression_benchmark(directory, notes=200, versions=100, delta_size=80, reads=500, seed=0):
+    """
+    Compare the on-disk size and read latency of plain and compressed note text.
+
+    The same notes and versions are written to two fresh SQLite files, once as plain text
+    and once encoded the way CompressedTextField stores them (with the current
+    `NOTE_COMPRESSION_MIN_SIZE` and `NOTE_COMPRESSION_LEVEL`), then read back at random.
+
+    Args:
+        directory (Path): Directory in which to create the database files.
+        notes (int): Number of notes.
+        versions (int): Versions per note.
+        delta_size (int): Length of the text appended by each version.
+        reads (int): Note reads and version reads timed on each file.
+        seed (int): Random seed, for reproducible data and reads.
+
+    Returns:
+        dict: For `plain` and `compressed`, the database size in bytes and the p50/p95 latency (ms)
+        of note reads and version reads, plus the compressed to plain size ratio.
+    """
+    results = {}
+    for name, encode in (('plain', lambda value: value), ('compressed', compress_text)):
+        path = directory / f'{name}.sqlite3'
+        size = _fill_compression_workload(path, encode, notes, versions, delta_size, seed)
+        note_latency, version_latency = _read_compression_workload(path, notes, versions, reads, seed)
+        results[name] = {
+            'database_bytes': size,
+            'note_read_ms': note_latency,
+            'version_read_ms': version_latency,
+        }
+    results['size_ratio'] = results['compressed']['database_bytes'] / results['plain']['database_bytes']
+    return results
+
+
+# Settings modules compared by run_settings_comparison: the current settings, the tuned
+# SQLite profile and the API-only profile built on it
+SETTINGS_PROFILES = ['neofi_api.settings', 'neofi_api.settings_production', 'neofi_api.settings_api']
+
+# Run in a fresh interpreter per settings module: times Django's startup (app registry,
+# middleware chain and URLconf), then optionally measure_request_overhead
+SETTINGS_WORKER_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.handlers.wsgi import WSGIHandler
+from django.urls import get_resolver
+WSGIHandler()
+get_resolver().url_patterns
+result = {'startup_ms': (time.perf_counter() - started) * 1000, 'modules': len(sys.modules)}
+if int(sys.argv[1]):
+    from backend.benchmarks import measure_request_overhead
+    result['requests'] = measure_request_overhead(int(sys.argv[1]))
+print(json.dumps(result))
+"""
+
+# Requests that do little besides going through the middleware and the REST framework
+OVERHEAD_SCENARIOS = {
+    'login/': lambda client, user, token: client.post('/login/', {'username': user.username, 'password': 'benchmark'}),
+    'notes/list/ (cached)': lambda client, user, token: client.get('/notes/list/', HTTP_AUTHORIZATION=f'Token {token.key}'),
+    'notes/list/ (anonymous)': lambda client, user, token: client.get('/notes/list/'),
+}
+
+
+def measure_request_overhead(requests=200):
+    """
+    Time the `OVERHEAD_SCENARIOS` with the current settings.
+
+    A temporary user and token are created in a transaction that is rolled back at the
+    end. Passwords are hashed with MD5 while measuring, so signin times the framework and
+    the session write rather than PBKDF2.
+
+    Args:
+        requests (int): Timed requests per scenario, after one warm-up request.
+
+    Returns:
+        dict: For each scenario, the p50/p95 latency (µs), the queries per request and the status codes.
+    """
+    results = {}
+    aliases = {DEFAULT_DB_ALIAS, PrimaryReplicaRouter().replica_alias() or DEFAULT_DB_ALIAS, *note_shards()}
+    with override_settings(PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher']), transaction.atomic():
+        user = User.objects.create_user(username=f'settings-{uuid.uuid4().hex[:12]}', password='benchmark')
+        token = Token.objects.create(user=user)
+        client = Client(SERVER_NAME=benchmark_host(), raise_request_exception=False)
+        for name, scenario in OVERHEAD_SCENARIOS.items():
+            scenario(client, user, token)
+            latencies = []
+            queries = 0
+            statuses = {}
+            for _ in range(requests):
+                with ExitStack() as stack:
+                    captures = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in aliases]
+                    started = time.perf_counter()
+                    response = scenario(client, user, token)
+                    latencies.append((time.perf_counter() - started) * 1e6)
+                queries += sum(len(capture) for capture in captures)
+                statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+            results[name] = {
+                'p50_us': percentile(latencies, 0.50),
+                'p95_us': percentile(latencies, 0.95),
+                'queries': queries / requests,
+                'status': statuses,
+            }
+        transaction.set_rollback(True)
+    return results
+
+
+def run_settings_comparison(profiles=None, startup_runs=5, requests=200):
+    """
+    Compare the startup time and per-request overhead of settings modules.
+
+    Each module is loaded in `startup_runs` fresh interpreters, which time Django's startup
+    and count the modules imported. The first one also runs `measure_request_overhead`
+    against the configured database, which must be migrated.
+
+    Args:
+        profiles (list): Settings modules to compare; defaults to `SETTINGS_PROFILES`.
+        startup_runs (int): Interpreters started per module.
+        requests (int): Timed requests per overhead scenario; 0 skips the requests.
+
+    Returns:
+        dict: For each module, the median and minimum startup time (ms), the number of
+        imported modules and, with `requests`, the overhead results.
+    """
+    results = {}
+    for module in profiles or SETTINGS_PROFILES:
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': module}
+        runs = []
+        for run in range(startup_runs):
+            output = subprocess.run(
+                [sys.executable, '-c', SETTINGS_WORKER_SCRIPT, str(requests if run == 0 else 0)],
+                cwd=settings.BASE_DIR, env=env, capture_output=True, text=True, check=True
+            ).stdout
+            runs.append(json.loads(output.strip().splitlines()[-1]))
+
+        startup = [run['startup_ms'] for run in runs]
+        results[module] = {
+            'startup_ms': {'median': statistics.median(startup), 'min': min(startup)},
+            'modules': runs[0]['modules'],
+        }
+        if requests:
+            results[module]['requests'] = runs[0]['requests']
+    return results
@@ -0,0 +1,112 @@
+import uuid
+from django.conf import settings
+from django.core.cache import caches
+
+# Cache keys used by the note-list cache
+GENERATION_KEY = 'notes:list:gen:{user_id}'
+PAGE_KEY = 'notes:list:{user_id}:{generation}:{cursor}:{page_size}'
+HITS_KEY = 'notes:list:hits'
+MISSES_KEY = 'notes:list:misses'
+
+
+def get_cache():
+    """
+    Return the cache backend configured for note lists.
+
+    Returns:
+        BaseCache: The cache named by `NOTES_LIST_CACHE_ALIAS`.
+    """
+    return caches[settings.NOTES_LIST_CACHE_ALIAS]
+
+
+def _new_generation():
+    # A random token never repeats a generation used before, even if the generation key
+    # itself was evicted from the cache; a wall-clock timestamp could, when the clock goes back
+    return uuid.uuid4().hex
+
+
+def _get_generation(cache, key):
+    generation = cache.get(key)
+    if generation is None:
+        cache.add(key, _new_generation(), timeout=None)
+        generation = cache.get(key)
+    return generation
+
+
+def _increment(cache, key):
+    try:
+        cache.incr(key)
+    except ValueError:
+        # The counter does not exist yet (or was evicted)
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+def get_note_list_page(user_id, cursor, page_size, fetch):
+    """
+    Return a cached page of a user's note list, computing it with `fetch` on a miss.
+
+    Pages are keyed by the user's current cache generation, so invalidating a user
+    only needs to bump that generation instead of finding every cached page.
+
+    Args:
+        user_id (int): ID of the user whose notes are listed.
+        cursor (str): Cursor of the requested page, or None for the first page.
+        page_size (int): Number of notes per page.
+        fetch (callable): Called without arguments to build the page on a miss.
+
+    Returns:
+        The cached or freshly fetched page.
+    """
+    cache = get_cache()
+    key = PAGE_KEY.format(
+        user_id=user_id,
+        generation=_get_generation(cache, GENERATION_KEY.format(user_id=user_id)),
+        cursor=cursor or '',
+        page_size=page_size
+    )
+
+    page = cache.get(key)
+    if page is not None:
+        _increment(cache, HITS_KEY)
+        return page
+
+    _increment(cache, MISSES_KEY)
+    page = fetch()
+    cache.set(key, page, timeout=settings.NOTES_LIST_CACHE_TIMEOUT)
+    return page
+
+
+def invalidate_note_lists(user_ids):
+    """
+    Invalidate every cached note-list page of the given users.
+
+    Args:
+        user_ids (iterable): IDs of the users whose cached lists are stale.
+    """
+    generation = _new_generation()
+    get_cache().set_many(
+        {GENERATION_KEY.format(user_id=user_id): generation for user_id in set(user_ids)},
+        timeout=None
+    )
+
+
+def get_note_list_stats():
+    """
+    Return the hit and miss counters of the note-list cache.
+
+    Returns:
+        dict: The `hits` and `misses` counts.
+    """
+    cache = get_cache()
+    return {
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def reset_note_list_stats():
+    """
+    Reset the hit and miss counters of the note-list cache.
+    """
+    get_cache().delete_many([HITS_KEY, MISSES_KEY])
@@ -0,0 +1,130 @@
+import time
+from django.db import connections, transaction
+from django.db.models import F
+from .models import Note, NoteVersion
+from .renderers import ndjson_lines
+from .sharding import sharded
+from .versions import materialize_version
+
+# Columns of a version written to the archive, with the alias of its shard
+ARCHIVE_FIELDS = ['id', 'note_id', 'number', 'timestamp', 'user_id', 'changes', 'snapshot']
+
+
+def pruned_versions(versions, cutoff):
+    """
+    Apply the retention policy to the versions of some notes.
+
+    Versions from `cutoff` on are kept. Of older versions, only the latest one of each
+    note and (UTC) day is kept.
+
+    Args:
+        versions (list): Version dicts with `id`, `note_id`, `number` and `timestamp`.
+        cutoff (datetime): Start of the period kept in full.
+
+    Returns:
+        list: The versions to prune, in their original order.
+    """
+    last_of_day = {}
+    for version in versions:
+        if version['timestamp'] < cutoff:
+            key = (version['note_id'], version['timestamp'].date())
+            if key not in last_of_day or version['number'] > last_of_day[key]['number']:
+                last_of_day[key] = version
+    kept_ids = {version['id'] for version in last_of_day.values()}
+    return [
+        version for version in versions
+        if version['timestamp'] < cutoff and version['id'] not in kept_ids
+    ]
+
+
+def compact_shard(alias, cutoff, archive=None, batch_size=100, pause=0, dry_run=False):
+    """
+    Prune the versions of a shard's notes older than `cutoff`, archiving them first.
+
+    Notes are processed `batch_size` at a time, each batch in its own short transaction,
+    so other writers wait for the write lock only briefly. A kept version whose previous
+    version is pruned gets a snapshot of its content, so every kept version can still be
+    rebuilt by `materialize_version`. The batch also bumps the `history_generation` of its
+    compacted notes, so cached histories (ETags) and diffs are not served again by any process.
+
+    If a run is interrupted, the archive may hold rows of a batch that was rolled back;
+    they are archived again by the next run, so deduplicate restores by `shard` and `id`.
+
+    Args:
+        alias (str): Alias of the shard.
+        cutoff (datetime): Start of the period kept in full.
+        archive (file): Binary file receiving the pruned versions as NDJSON; required unless `dry_run`.
+        batch_size (int): Number of notes compacted per transaction.
+        pause (float): Seconds to sleep between batches.
+        dry_run (bool): Only count what would be pruned.
+
+    Returns:
+        dict: The number of notes with old versions, and of versions archived (or to archive) and rebased.
+    """
+    versions = sharded(NoteVersion, alias)
+    note_ids = list(
+        versions.filter(timestamp__lt=cutoff).order_by('note_id').values_list('note_id', flat=True).distinct()
+    )
+    counts = {'notes': len(note_ids), 'archived': 0, 'rebased': 0}
+
+    for start in range(0, len(note_ids), batch_size):
+        chunk = note_ids[start:start + batch_size]
+        with transaction.atomic(using=alias):
+            old = list(
+                versions.filter(note_id__in=chunk, timestamp__lt=cutoff)
+                .order_by('note_id', 'number')
+                .values(*ARCHIVE_FIELDS)
+            )
+            pruned = pruned_versions(old, cutoff)
+            if not pruned:
+                continue
+
+            # The versions right after a pruned one can no longer replay the deltas before them.
+            # A pruned version is never the last of its day, so its successor is one of the old rows
+            old_by_key = {(version['note_id'], version['number']): version for version in old}
+            pruned_keys = {(version['note_id'], version['number']) for version in pruned}
+            successors = [
+                old_by_key[(note_id, number + 1)]
+                for note_id, number in sorted(pruned_keys)
+                if (note_id, number + 1) in old_by_key and (note_id, number + 1) not in pruned_keys
+            ]
+            rebased = [
+                NoteVersion(id=version['id'], note_id=version['note_id'], number=version['number'])
+                for version in successors if version['snapshot'] is None
+            ]
+            counts['archived'] += len(pruned)
+            counts['rebased'] += len(rebased)
+            if dry_run:
+                continue
+
+            # Rebuild the snapshots before deleting the deltas they are made of
+            for version in rebased:
+                version.snapshot = materialize_version(version.note_id, version.number, shard=alias)
+            versions.bulk_update(rebased, ['snapshot'])
+
+            archive.writelines(ndjson_lines({'shard': alias, **version} for version in pruned))
+            archive.flush()
+            versions.filter(pk__in=[version['id'] for version in pruned]).delete()
+            compacted = {version['note_id'] for version in pruned}
+            sharded(Note, alias).filter(pk__in=compacted).update(history_generation=F('history_generation') + 1)
+
+        if pause:
+            time.sleep(pause)
+
+    return counts
+
+
+def optimize_database(alias, vacuum=False, analyze=False):
+    """
+    Run `VACUUM` and/or `ANALYZE` on a database, to return freed pages and refresh planner statistics.
+
+    Args:
+        alias (str): Alias of the database.
+        vacuum (bool): Rebuild the database file without its free pages.
+        analyze (bool): Refresh the statistics used by the query planner.
+    """
+    with connections[alias].cursor() as cursor:
+        if vacuum:
+            cursor.execute("VACUUM")
+        if analyze:
+            cursor.execute("ANALYZE")
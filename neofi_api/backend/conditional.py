@@ -0,0 +1,117 @@
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_etags, quote_etag
+
+
+def is_conditional(request):
+    """
+    Tell whether a request carries conditional GET headers.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        bool: True if `If-None-Match` or `If-Modified-Since` is present.
+    """
+    return 'HTTP_IF_NONE_MATCH' in request.META or 'HTTP_IF_MODIFIED_SINCE' in request.META
+
+
+def version_etag(version):
+    """
+    Build the strong ETag identifying a version of a note, as accepted by `If-Match`.
+
+    Args:
+        version (int): The note's version counter.
+
+    Returns:
+        str: The quoted ETag, e.g. `"3"`.
+    """
+    return quote_etag(str(version))
+
+
+def get_if_match_versions(request):
+    """
+    Read the note versions a write is conditioned on from the `If-Match` header.
+
+    Versions are strong ETags such as `"3"` (see `version_etag`). Weak and unknown
+    tags never match, as If-Match uses the strong comparison.
+
+    Args:
+        request (Request): The incoming request.
+
+    Returns:
+        list: The acceptable versions (possibly empty, so nothing matches), or None if the
+        header is absent or `*`.
+    """
+    header = request.META.get('HTTP_IF_MATCH')
+    if header is None:
+        return None
+    etags = parse_etags(header)
+    if etags == ['*']:
+        return None
+    return [int(etag[1:-1]) for etag in etags if etag[1:-1].isdigit() and etag.startswith('"')]
+
+
+def get_validators(request, note_id, metadata, generation=None):
+    """
+    Build the strong ETag and Last-Modified timestamp of a note representation.
+
+    The ETag covers the note's `updated_at`, its latest version ID, the request path,
+    query string and negotiated format, and `generation` if given, since each of those
+    changes the representation.
+
+    Args:
+        request (Request): The incoming request.
+        note_id (int): ID of the note.
+        metadata (dict): The note's `updated_at` and `latest_version_id`.
+        generation (str): Cache generation of the representation, e.g. the note's history generation.
+
+    Returns:
+        tuple: The quoted ETag and the Last-Modified time as a Unix timestamp.
+    """
+    updated_at = metadata['updated_at']
+    fingerprint = '|'.join([
+        str(note_id),
+        updated_at.isoformat(),
+        str(metadata['latest_version_id']),
+        request.get_full_path(),
+        request.accepted_renderer.format,
+        generation or '',
+    ])
+    etag = quote_etag(hashlib.sha256(fingerprint.encode()).hexdigest()[:32])
+    return etag, int(updated_at.timestamp())
+
+
+def not_modified_response(request, etag, last_modified):
+    """
+    Answer `If-None-Match` / `If-Modified-Since` without building the response body.
+
+    Args:
+        request (Request): The incoming request.
+        etag (str): The current ETag.
+        last_modified (int): The current Last-Modified Unix timestamp.
+
+    Returns:
+        HttpResponse: A 304 (or 412) response if the client's copy is current, else None.
+    """
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """
+    Add the ETag and Last-Modified headers to a response.
+
+    Args:
+        response (HttpResponse): The response.
+        etag (str): The quoted ETag.
+        last_modified (int): The Last-Modified Unix timestamp.
+
+    Returns:
+        HttpResponse: The same response.
+    """
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    return response
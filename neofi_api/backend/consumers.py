@@ -0,0 +1,72 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from .access import accessible_notes
+from .events import note_group, user_group
+from .sharding import shards_for_notes
+
+
+class NoteConsumer(AsyncJsonWebsocketConsumer):
+    """
+    WebSocket consumer pushing note changes to the clients subscribed to them.
+
+    Clients send `{"action": "subscribe", "note_ids": [...]}` (or `"unsubscribe"`);
+    only the notes the user owns or has been shared with are subscribed. The server
+    then pushes `note.changed` events for those notes, and `note.shared` events when
+    notes are shared with the user.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=4001)
+            return
+
+        self.note_ids = set()
+        await self.channel_layer.group_add(user_group(self.user.pk), self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if not hasattr(self, 'note_ids'):
+            # The connection was rejected before joining any group
+            return
+        await self.channel_layer.group_discard(user_group(self.user.pk), self.channel_name)
+        for note_id in self.note_ids:
+            await self.channel_layer.group_discard(note_group(note_id), self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action') if isinstance(content, dict) else None
+        note_ids = content.get('note_ids') if isinstance(content, dict) else None
+        if action not in ('subscribe', 'unsubscribe') or not isinstance(note_ids, list):
+            await self.send_json({'type': 'error', 'error': 'Expected a subscribe or unsubscribe action with note_ids'})
+            return
+
+        try:
+            note_ids = {int(note_id) for note_id in note_ids}
+        except (TypeError, ValueError):
+            await self.send_json({'type': 'error', 'error': 'Note IDs must be integers'})
+            return
+
+        if action == 'subscribe':
+            granted = await self.get_accessible_ids(note_ids)
+            for note_id in granted - self.note_ids:
+                await self.channel_layer.group_add(note_group(note_id), self.channel_name)
+            self.note_ids |= granted
+            await self.send_json({'type': 'subscribed', 'note_ids': sorted(granted)})
+        else:
+            for note_id in note_ids & self.note_ids:
+                await self.channel_layer.group_discard(note_group(note_id), self.channel_name)
+            self.note_ids -= note_ids
+            await self.send_json({'type': 'unsubscribed', 'note_ids': sorted(note_ids)})
+
+    @database_sync_to_async
+    def get_accessible_ids(self, note_ids):
+        granted = set()
+        for shard, shard_note_ids in shards_for_notes(note_ids).items():
+            granted.update(accessible_notes(self.user, shard).filter(pk__in=shard_note_ids).values_list('id', flat=True))
+        return granted
+
+    async def note_changed(self, event):
+        await self.send_json(event)
+
+    async def note_shared(self, event):
+        await self.send_json(event)
@@ -0,0 +1,80 @@
+from django.conf import settings
+from .fields import append_text, decompress_text
+
+
+def sqlite_pragma_statements(pragmas):
+    """
+    Build the PRAGMA statements that configure a SQLite connection.
+
+    Args:
+        pragmas (dict): Maps pragma names to their values, e.g. `{'journal_mode': 'WAL'}`.
+
+    Returns:
+        list: One `PRAGMA name = value` statement per pragma, in order.
+    """
+    return [f"PRAGMA {name} = {value}" for name, value in pragmas.items()]
+
+
+# Pragmas that change the database file rather than the connection; only the primary sets them
+FILE_PRAGMAS = {'journal_mode'}
+
+
+def is_read_only(connection):
+    """
+    Tell whether a SQLite connection opens its database read-only (a `mode=ro` URI).
+    """
+    return 'mode=ro' in str(connection.settings_dict['NAME'])
+
+
+def begin_immediate(execute, sql, params, many, context):
+    """
+    Database execute wrapper starting SQLite transactions with `BEGIN IMMEDIATE`.
+
+    A deferred transaction that reads before it writes cannot wait for the write lock
+    once another connection has committed (SQLite returns "database is locked" at once,
+    without honouring `busy_timeout`). Taking the write lock when the transaction starts
+    makes concurrent writers queue on `busy_timeout` instead.
+    """
+    if sql == "BEGIN":
+        sql = "BEGIN IMMEDIATE"
+    return execute(sql, params, many, context)
+
+
+def register_sqlite_functions(connection):
+    """
+    Register the SQL functions reading and appending to compressed text columns.
+
+    - `neofi_text(value)` returns the text of a `CompressedTextField` value.
+    - `neofi_append_text(value, delta)` appends to one and compresses the result as needed.
+    """
+    connection.connection.create_function('neofi_text', 1, decompress_text, deterministic=True)
+    connection.connection.create_function('neofi_append_text', 2, append_text, deterministic=True)
+
+
+def configure_sqlite_connection(sender, connection, **kwargs):
+    """
+    Apply `SQLITE_PRAGMAS` (and `SQLITE_IMMEDIATE_TRANSACTIONS`) to each new SQLite connection,
+    and register the compressed text functions.
+
+    Connected to `connection_created`; connections to other databases are left untouched.
+    Read-only connections (such as the replica alias) skip the pragmas that write to the
+    database file, and never start write transactions.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    register_sqlite_functions(connection)
+
+    read_only = is_read_only(connection)
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    if read_only:
+        pragmas = {name: value for name, value in pragmas.items() if name not in FILE_PRAGMAS}
+
+    with connection.cursor() as cursor:
+        for statement in sqlite_pragma_statements(pragmas):
+            cursor.execute(statement)
+
+    if read_only:
+        return
+    if getattr(settings, 'SQLITE_IMMEDIATE_TRANSACTIONS', False) and begin_immediate not in connection.execute_wrappers:
+        # Insert first: temporary wrappers (e.g. PerformanceMiddleware's) are pushed and popped at the end
+        connection.execute_wrappers.insert(0, begin_immediate)
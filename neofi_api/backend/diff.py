@@ -0,0 +1,136 @@
+import difflib
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from .models import Note
+from .sharding import shard_for_note, sharded
+from .versions import materialize_version
+
+# Output styles of version diffs
+DIFF_STYLES = ('structured', 'unified')
+
+
+class DiffCache:
+    """
+    Bounded, thread-safe LRU cache of computed version diffs, keyed by (note, history
+    generation, from, to, style).
+
+    Versions never change once written, so entries need no time-to-live; compaction removes
+    versions and bumps the note's persisted history generation, so every process misses after
+    it. The cache lives in the process and does not check access: look entries up only after checking it.
+    """
+
+    def __init__(self, max_size=None):
+        self._max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def max_size(self):
+        return self._max_size or settings.NOTE_DIFF_CACHE_SIZE
+
+    def get(self, key):
+        """
+        Return the cached diff of a key, or None if absent.
+        """
+        with self._lock:
+            diff = self._entries.get(key)
+            if diff is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return diff
+
+    def set(self, key, diff):
+        """
+        Cache the diff of a key, evicting the least recently used entry if full.
+        """
+        with self._lock:
+            self._entries[key] = diff
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+
+# Process-wide diff cache used by diff_versions
+diff_cache = DiffCache()
+
+
+def diff_lines(old, new, style='structured', labels=('', '')):
+    """
+    Compare two texts line by line.
+
+    Args:
+        old (str): The text before.
+        new (str): The text after.
+        style (str): `structured` for a list of changes, `unified` for a unified diff.
+        labels (tuple): Names of the old and new text in the unified diff header.
+
+    Returns:
+        list | str: For `structured`, one dict per changed block with its `op` (`insert`,
+        `delete` or `replace`), its 0-based, end-exclusive line ranges in both texts
+        (`from_lines`, `to_lines`) and the `removed` and `added` lines. For `unified`,
+        the diff text.
+    """
+    old_lines = old.splitlines()
+    new_lines = new.splitlines()
+    if style == 'unified':
+        return '\n'.join(difflib.unified_diff(old_lines, new_lines, *labels, lineterm=''))
+
+    matcher = difflib.SequenceMatcher(None, old_lines, new_lines, autojunk=False)
+    return [
+        {
+            'op': op,
+            'from_lines': [i1, i2],
+            'to_lines': [j1, j2],
+            'removed': old_lines[i1:i2],
+            'added': new_lines[j1:j2],
+        }
+        for op, i1, i2, j1, j2 in matcher.get_opcodes()
+        if op != 'equal'
+    ]
+
+
+def diff_versions(note_id, from_number, to_number, style='structured', shard=None, generation=None):
+    """
+    Diff the contents of a note at two versions, through the process-wide LRU cache.
+
+    Args:
+        note_id (int): ID of the note.
+        from_number (int): The version to compare from.
+        to_number (int): The version to compare to.
+        style (str): One of `DIFF_STYLES`; see `diff_lines`.
+        shard (str): Alias of the shard holding the note; looked up when omitted.
+        generation (int): The note's `history_generation`; read from the note when omitted.
+
+    Returns:
+        list | str: The diff.
+
+    Raises:
+        NoteVersion.DoesNotExist: If either version does not exist.
+    """
+    if generation is None:
+        shard = shard or shard_for_note(note_id)
+        generation = sharded(Note, shard).values_list('history_generation', flat=True).get(pk=note_id)
+    key = (note_id, generation, from_number, to_number, style)
+    diff = diff_cache.get(key)
+    if diff is None:
+        diff = diff_lines(
+            materialize_version(note_id, from_number, shard=shard),
+            materialize_version(note_id, to_number, shard=shard),
+            style,
+            labels=(f'version {from_number}', f'version {to_number}')
+        )
+        diff_cache.set(key, diff)
+    return diff
@@ -0,0 +1,66 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+
+def note_group(note_id):
+    """
+    Name of the channel layer group receiving the changes of a note.
+    """
+    return f'note_{note_id}'
+
+
+def user_group(user_id):
+    """
+    Name of the channel layer group receiving the events addressed to a user.
+    """
+    return f'user_{user_id}'
+
+
+def _send(groups, event):
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for group in groups:
+        async_to_sync(channel_layer.group_send)(group, event)
+
+
+def publish_note_changes(changes, using=None):
+    """
+    Publish note changes to their subscribers once the current transaction commits.
+
+    Args:
+        changes (iterable): NoteVersion instances describing the changes.
+        using (str): Alias of the database (shard) whose transaction must commit first.
+    """
+    events = [
+        (note_group(version.note_id), {
+            'type': 'note.changed',
+            'note_id': version.note_id,
+            'version': version.number,
+            'delta': version.changes,
+            'user': version.user.username,
+        })
+        for version in changes
+    ]
+    transaction.on_commit(lambda: [_send([group], event) for group, event in events], using=using)
+
+
+def publish_note_shares(note_ids, user_ids, owner):
+    """
+    Tell users that notes were shared with them, once the current transaction commits.
+
+    Recipients may then subscribe to the notes to receive their changes.
+
+    Args:
+        note_ids (iterable): IDs of the shared notes.
+        user_ids (iterable): IDs of the recipients.
+        owner (User): The user who shared the notes.
+    """
+    event = {
+        'type': 'note.shared',
+        'note_ids': list(note_ids),
+        'user': owner.username,
+    }
+    groups = [user_group(user_id) for user_id in user_ids]
+    transaction.on_commit(lambda: _send(groups, event))
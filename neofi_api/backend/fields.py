@@ -0,0 +1,143 @@
+import zlib
+from django.conf import settings
+from django.db import models
+
+# First byte of a compressed value. It is followed by a zlib stream of the UTF-8 text, then by
+# one raw deflate stream (no header or checksum) per text appended since, see `append_text`
+COMPRESSED_MARKER = b'\x01'
+
+# wbits of the raw deflate streams of appended text
+APPENDED_WBITS = -zlib.MAX_WBITS
+
+# Bytes of compressed data fed to the decompressor at a time; see `inflate`
+INFLATE_CHUNK_SIZE = 1024
+
+
+def compress_text(value):
+    """
+    Encode text for storage, compressing it when it is large enough to benefit.
+
+    Values shorter than `NOTE_COMPRESSION_MIN_SIZE` bytes, or that zlib does not shrink,
+    are kept as plain text. Larger ones become bytes: `COMPRESSED_MARKER` followed by the
+    zlib-compressed UTF-8 text, which SQLite stores as a BLOB in the text column.
+
+    Args:
+        value (str): The text to store.
+
+    Returns:
+        str | bytes: The plain text, or the marked compressed bytes.
+    """
+    data = value.encode()
+    if len(data) < settings.NOTE_COMPRESSION_MIN_SIZE:
+        return value
+    compressed = COMPRESSED_MARKER + zlib.compress(data, settings.NOTE_COMPRESSION_LEVEL)
+    return compressed if len(compressed) < len(data) else value
+
+
+def inflate(data):
+    """
+    Decompress a zlib stream followed by raw deflate streams, as written by `compress_text`
+    and `append_text`.
+
+    The data is fed in small chunks: the decompressor copies what follows the end of each
+    stream, so feeding it whole would copy the rest of the value once per appended stream.
+
+    Args:
+        data (bytes): The concatenated streams.
+
+    Returns:
+        bytes: The concatenated decompressed data.
+
+    Raises:
+        zlib.error: If the data is not made of complete streams.
+    """
+    parts = []
+    decompressor = zlib.decompressobj()
+    incomplete = False
+    view = memoryview(data)
+    for start in range(0, len(view), INFLATE_CHUNK_SIZE):
+        chunk = view[start:start + INFLATE_CHUNK_SIZE]
+        while chunk:
+            parts.append(decompressor.decompress(chunk))
+            incomplete = not decompressor.eof
+            if incomplete:
+                break
+            # The next stream, text appended later, starts right after this one
+            chunk = decompressor.unused_data
+            decompressor = zlib.decompressobj(APPENDED_WBITS)
+    if incomplete:
+        raise zlib.error("Incomplete compressed text")
+    return b''.join(parts)
+
+
+def decompress_text(value):
+    """
+    Decode a value stored by `compress_text` or `append_text`; plain text is returned unchanged.
+
+    Args:
+        value (str | bytes): The stored value.
+
+    Returns:
+        str: The text.
+    """
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value[:1] == COMPRESSED_MARKER:
+            return inflate(value[1:]).decode()
+        return value.decode()
+    return value
+
+
+def append_text(value, delta):
+    """
+    Append text to a stored value and encode the result again.
+
+    A compressed value is extended with a raw deflate stream of the delta alone, so the
+    existing text is neither decompressed nor recompressed: the work done is proportional to
+    the delta. Short deltas compress poorly on their own (a few bytes over their size);
+    saving the note through the ORM compresses the whole text as one stream again. Plain
+    values are concatenated, and compressed once they reach `NOTE_COMPRESSION_MIN_SIZE`
+    bytes (values that zlib did not shrink stay plain).
+
+    Registered as the `neofi_append_text` SQL function on SQLite connections, so appends
+    run inside a single UPDATE whether or not the stored value is compressed.
+
+    Args:
+        value (str | bytes): The stored value.
+        delta (str): The text to append.
+
+    Returns:
+        str | bytes: The encoded result.
+    """
+    if isinstance(value, (bytes, memoryview)):
+        value = bytes(value)
+        if value[:1] == COMPRESSED_MARKER:
+            compressor = zlib.compressobj(settings.NOTE_COMPRESSION_LEVEL, zlib.DEFLATED, APPENDED_WBITS)
+            return value + compressor.compress(delta.encode()) + compressor.flush()
+        value = value.decode()
+    if len(value.encode()) >= settings.NOTE_COMPRESSION_MIN_SIZE:
+        # Already too large to be plain unless zlib could not shrink it
+        return value + delta
+    return compress_text(value + delta)
+
+
+class CompressedTextField(models.TextField):
+    """
+    Text field storing large values zlib-compressed, transparently for the ORM.
+
+    Reads (including `values()` and `values_list()`) return text and writes accept text;
+    only the stored representation changes. Lookups on the column other than `isnull`
+    do not see the compressed text, and raw SQL must read it through the
+    `neofi_text` SQL function (see `backend.db.configure_sqlite_connection`).
+    """
+
+    def from_db_value(self, value, expression, connection):
+        if value is None:
+            return value
+        return decompress_text(value)
+
+    def get_db_prep_value(self, value, connection, prepared=False):
+        value = super().get_db_prep_value(value, connection, prepared)
+        if isinstance(value, str):
+            return compress_text(value)
+        return value
@@ -0,0 +1,62 @@
+import json
+from contextlib import nullcontext
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from backend.benchmarks import SCENARIOS, BenchmarkContext, missing_scenarios, run_benchmark
+from backend.writebehind import version_writer
+
+
+class Command(BaseCommand):
+    help = (
+        "Benchmark every API route in process against the seeded data (see seed_data), "
+        "reporting latency percentiles, throughput and query counts."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help="Requests per route.")
+        parser.add_argument('--concurrency', type=int, default=1, help="Concurrent workers per route.")
+        parser.add_argument('--route', action='append', dest='routes', help="Route pattern to run; repeatable. Defaults to every route.")
+        parser.add_argument('--prefix', default='bench', help="Username prefix of the seeded users.")
+        parser.add_argument('--password', default='benchmark', help="Password of the seeded users.")
+        parser.add_argument('--write-behind', action='store_true', help="Queue note versions and insert them in batches (NOTE_VERSION_WRITE_BEHIND).")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        missing = missing_scenarios()
+        if missing:
+            raise CommandError(f"Routes without a benchmark scenario: {', '.join(missing)}")
+        unknown = [route for route in options['routes'] or [] if route not in SCENARIOS]
+        if unknown:
+            raise CommandError(f"Unknown routes: {', '.join(unknown)}")
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+
+        try:
+            ctx = BenchmarkContext(options['prefix'], options['password'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        write_behind = override_settings(NOTE_VERSION_WRITE_BEHIND=True) if options['write_behind'] else nullcontext()
+        with write_behind:
+            results = run_benchmark(
+                ctx,
+                routes=options['routes'],
+                requests=options['requests'],
+                concurrency=options['concurrency']
+            )
+            # Write the versions still queued before the settings are restored
+            version_writer.close()
+        results['parameters']['write_behind'] = options['write_behind']
+
+        self.stdout.write(f"{'route':<46} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'queries':>8}  status")
+        for route, result in results['routes'].items():
+            latency = result['latency_ms']
+            self.stdout.write(
+                f"{route:<46} {latency['p50']:8.2f} {latency['p95']:8.2f} {latency['p99']:8.2f} "
+                f"{result['throughput_rps']:8.1f} {result['queries']['mean']:8.1f}  {result['status_codes']}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
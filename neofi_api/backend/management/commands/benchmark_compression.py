@@ -0,0 +1,49 @@
+import json
+import tempfile
+from pathlib import Path
+from django.core.management.base import BaseCommand, CommandError
+from backend.benchmarks import run_compression_benchmark
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the on-disk size and read latency of note contents and versions stored "
+        "as plain text and compressed, on scratch databases."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--notes', type=int, default=200, help="Number of notes.")
+        parser.add_argument('--versions', type=int, default=100, help="Versions per note.")
+        parser.add_argument('--delta-size', type=int, default=80, help="Length of the text appended by each version.")
+        parser.add_argument('--reads', type=int, default=500, help="Note and version reads timed per database.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible data.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if min(options['notes'], options['versions'], options['delta_size'], options['reads']) < 1:
+            raise CommandError("--notes, --versions, --delta-size and --reads must be positive.")
+
+        with tempfile.TemporaryDirectory() as directory:
+            results = run_compression_benchmark(
+                Path(directory),
+                notes=options['notes'],
+                versions=options['versions'],
+                delta_size=options['delta_size'],
+                reads=options['reads'],
+                seed=options['seed']
+            )
+
+        self.stdout.write(f"{'storage':<12} {'size MB':>9} {'note p50 ms':>12} {'note p95 ms':>12} {'version p50 ms':>15} {'version p95 ms':>15}")
+        for name in ('plain', 'compressed'):
+            result = results[name]
+            self.stdout.write(
+                f"{name:<12} {result['database_bytes'] / 1e6:9.2f} "
+                f"{result['note_read_ms']['p50']:12.3f} {result['note_read_ms']['p95']:12.3f} "
+                f"{result['version_read_ms']['p50']:15.3f} {result['version_read_ms']['p95']:15.3f}"
+            )
+        self.stdout.write(f"Compressed size is {results['size_ratio']:.0%} of plain.")
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
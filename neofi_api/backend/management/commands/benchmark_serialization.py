@@ -0,0 +1,66 @@
+import timeit
+from datetime import datetime
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from backend.access import get_accessible_note, get_accessible_note_values
+from backend.models import Note
+from backend.renderers import FastJSONRenderer
+from backend.serializers import NoteSerializer, format_timestamp
+
+
+def serializer_response(user, note_id):
+    """
+    The note response as built before the fast path: NoteSerializer, strptime, strftime.
+    """
+    note = get_accessible_note(user, note_id)
+    serializer = NoteSerializer(note)
+    created_datetime = datetime.strptime(serializer.data['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
+    updated_datetime = datetime.strptime(serializer.data['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
+    return JSONRenderer().render({
+        'title': serializer.data['title'],
+        'content': serializer.data['content'],
+        'created_at': created_datetime.strftime('%Y-%m-%d, %H:%M UTC'),
+        'updated_at': updated_datetime.strftime('%Y-%m-%d, %H:%M UTC')
+    })
+
+
+def fast_response(user, note_id):
+    """
+    The note response as built by get_note: a values() row and timestamps formatted once.
+    """
+    note = get_accessible_note_values(user, note_id, ['title', 'content', 'created_at', 'updated_at'])
+    note['created_at'] = format_timestamp(note['created_at'])
+    note['updated_at'] = format_timestamp(note['updated_at'])
+    return FastJSONRenderer().render(note)
+
+
+class Command(BaseCommand):
+    help = "Compare the CPU cost of building a note response with NoteSerializer and with the fast path."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=2000, help="Responses built per measurement.")
+        parser.add_argument('--repeat', type=int, default=5, help="Measurements taken; the best one is reported.")
+        parser.add_argument('--content-size', type=int, default=1000, help="Length of the note content.")
+
+    def handle(self, *args, **options):
+        # Work on throwaway rows that are rolled back at the end
+        with transaction.atomic():
+            user = User.objects.create_user(username='benchmark-serialization')
+            note = Note.objects.create(user=user, title='Benchmark', content='x' * options['content_size'])
+
+            results = {}
+            for name, build in (('serializer', serializer_response), ('fast', fast_response)):
+                timer = timeit.Timer(lambda: build(user, note.pk))
+                best = min(timer.repeat(repeat=options['repeat'], number=options['iterations']))
+                results[name] = best / options['iterations'] * 1e6
+
+            transaction.set_rollback(True)
+
+        for name, microseconds in results.items():
+            self.stdout.write(f"{name:>10}: {microseconds:8.1f} us/response")
+        saved = results['serializer'] - results['fast']
+        self.stdout.write(self.style.SUCCESS(
+            f"Fast path saves {saved:.1f} us/response ({saved / results['serializer']:.0%})."
+        ))
@@ -0,0 +1,55 @@
+import json
+import subprocess
+from django.core.management.base import BaseCommand, CommandError
+from backend.benchmarks import OVERHEAD_SCENARIOS, SETTINGS_PROFILES, run_settings_comparison
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the startup time and per-request overhead of the default, production and "
+        "API-only settings, each loaded in fresh interpreters against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--profile', action='append', dest='profiles',
+            help="Settings module to compare (repeatable); defaults to " + ', '.join(SETTINGS_PROFILES) + ".",
+        )
+        parser.add_argument('--startup-runs', type=int, default=5, help="Interpreters started per settings module.")
+        parser.add_argument('--requests', type=int, default=200, help="Timed requests per scenario; 0 skips them.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options['startup_runs'] < 1 or options['requests'] < 0:
+            raise CommandError("--startup-runs must be positive and --requests not negative.")
+
+        try:
+            results = run_settings_comparison(
+                profiles=options['profiles'],
+                startup_runs=options['startup_runs'],
+                requests=options['requests']
+            )
+        except subprocess.CalledProcessError as e:
+            raise CommandError(f"Loading the settings failed (is the database migrated?):\n{e.stderr}")
+
+        self.stdout.write(f"{'settings':<32} {'startup ms':>11} {'min ms':>8} {'modules':>8}")
+        for module, result in results.items():
+            self.stdout.write(
+                f"{module:<32} {result['startup_ms']['median']:11.1f} {result['startup_ms']['min']:8.1f} {result['modules']:8d}"
+            )
+
+        if options['requests']:
+            self.stdout.write("")
+            self.stdout.write(f"{'settings':<32} {'route':<24} {'p50 us':>9} {'p95 us':>9} {'queries':>8}  status")
+            for module, result in results.items():
+                for name in OVERHEAD_SCENARIOS:
+                    timing = result['requests'][name]
+                    self.stdout.write(
+                        f"{module:<32} {name:<24} {timing['p50_us']:9.0f} {timing['p95_us']:9.0f} "
+                        f"{timing['queries']:8.1f}  {timing['status']}"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
@@ -0,0 +1,78 @@
+import importlib
+import json
+import tempfile
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from backend.benchmarks import run_sqlite_concurrency
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent read/write throughput of SQLite with the current settings "
+        "and with a tuned profile (WAL, pragmas, immediate transactions), on a scratch database; "
+        "with --shards, also with the tuned profile over several database files."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', default='neofi_api.settings_production', help="Settings module of the tuned profile.")
+        parser.add_argument('--writers', type=int, default=4, help="Concurrent writer threads.")
+        parser.add_argument('--readers', type=int, default=4, help="Concurrent reader threads.")
+        parser.add_argument('--operations', type=int, default=200, help="Transactions per thread.")
+        parser.add_argument('--shards', type=int, default=1, help="Also run the tuned profile with writers spread over this many files.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+
+    def handle(self, *args, **options):
+        if options['writers'] < 1 or options['readers'] < 0 or options['operations'] < 1 or options['shards'] < 1:
+            raise CommandError("--writers, --operations and --shards must be positive, --readers not negative.")
+        try:
+            profile = importlib.import_module(options['profile'])
+        except ImportError as e:
+            raise CommandError(f"Cannot import settings module {options['profile']}: {e}")
+
+        profiles = {
+            'current': {
+                'SQLITE_PRAGMAS': getattr(settings, 'SQLITE_PRAGMAS', {}),
+                'SQLITE_IMMEDIATE_TRANSACTIONS': getattr(settings, 'SQLITE_IMMEDIATE_TRANSACTIONS', False),
+                'options': {},
+            },
+            options['profile']: {
+                'SQLITE_PRAGMAS': getattr(profile, 'SQLITE_PRAGMAS', {}),
+                'SQLITE_IMMEDIATE_TRANSACTIONS': getattr(profile, 'SQLITE_IMMEDIATE_TRANSACTIONS', False),
+                'options': profile.DATABASES['default'].get('OPTIONS', {}),
+            },
+        }
+        if options['shards'] > 1:
+            profiles[f"{options['profile']} x{options['shards']} shards"] = {
+                **profiles[options['profile']],
+                'shards': options['shards'],
+            }
+
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for name, config in profiles.items():
+                with override_settings(
+                    SQLITE_PRAGMAS=config['SQLITE_PRAGMAS'],
+                    SQLITE_IMMEDIATE_TRANSACTIONS=config['SQLITE_IMMEDIATE_TRANSACTIONS']
+                ):
+                    results[name] = run_sqlite_concurrency(
+                        Path(directory) / f'{len(results)}.sqlite3',
+                        options=config['options'],
+                        writers=options['writers'],
+                        readers=options['readers'],
+                        operations=options['operations'],
+                        shards=config.get('shards', 1)
+                    )
+
+        self.stdout.write(f"{'profile':<48} {'journal':>8} {'reads/s':>10} {'writes/s':>10} {'read errors':>12} {'write errors':>13}")
+        for name, result in results.items():
+            self.stdout.write(
+                f"{name:<48} {result['journal_mode']:>8} {result['reads_per_second']:10.1f} "
+                f"{result['writes_per_second']:10.1f} {result['read_errors']:12} {result['write_errors']:13}"
+            )
+
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(results, output, indent=2, sort_keys=True)
+            self.stdout.write(self.style.SUCCESS(f"Results written to {options['output']}."))
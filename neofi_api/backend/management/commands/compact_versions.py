@@ -0,0 +1,72 @@
+import gzip
+from datetime import timedelta
+from pathlib import Path
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from backend.compaction import compact_shard, optimize_database
+from backend.sharding import note_shards
+
+
+class Command(BaseCommand):
+    help = (
+        "Prune old note versions: keep every version of the last --keep-days days and the latest "
+        "version of each earlier day, and move the pruned ones to a gzipped NDJSON archive."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep-days', type=int, default=30, help="Number of days of versions kept in full.")
+        parser.add_argument(
+            '--archive-dir', default=str(settings.BASE_DIR / 'archive'),
+            help="Directory receiving the archive of pruned versions.",
+        )
+        parser.add_argument('--batch-size', type=int, default=100, help="Number of notes compacted per transaction.")
+        parser.add_argument('--pause', type=float, default=0, help="Seconds to sleep between batches.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report what would be pruned.")
+        parser.add_argument('--vacuum', action='store_true', help="Run VACUUM on each shard afterwards.")
+        parser.add_argument('--analyze', action='store_true', help="Run ANALYZE on each shard afterwards.")
+
+    def handle(self, *args, **options):
+        if options['keep_days'] < 1:
+            raise CommandError("--keep-days must be at least 1.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1.")
+
+        now = timezone.now()
+        cutoff = now - timedelta(days=options['keep_days'])
+        archive_path = Path(options['archive_dir']) / f"versions-{now:%Y%m%dT%H%M%S}.ndjson.gz"
+
+        archive = None
+        if not options['dry_run']:
+            archive_path.parent.mkdir(parents=True, exist_ok=True)
+            archive = gzip.open(archive_path, 'wb')
+
+        archived = 0
+        try:
+            for alias in note_shards():
+                counts = compact_shard(
+                    alias, cutoff, archive,
+                    batch_size=options['batch_size'], pause=options['pause'], dry_run=options['dry_run'],
+                )
+                action = "Would archive" if options['dry_run'] else "Archived"
+                self.stdout.write(
+                    f"{alias}: {action} {counts['archived']} versions of {counts['notes']} notes "
+                    f"({counts['rebased']} snapshots rebuilt)."
+                )
+                archived += counts['archived']
+        finally:
+            if archive is not None:
+                archive.close()
+        if archive is not None and not archived:
+            archive_path.unlink()
+
+        if not options['dry_run'] and (options['vacuum'] or options['analyze']):
+            for alias in note_shards():
+                optimize_database(alias, vacuum=options['vacuum'], analyze=options['analyze'])
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS(f"Would archive {archived} versions."))
+        elif archived:
+            self.stdout.write(self.style.SUCCESS(f"Archived {archived} versions to {archive_path}."))
+        else:
+            self.stdout.write(self.style.SUCCESS("No versions archived."))
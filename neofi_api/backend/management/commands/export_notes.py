@@ -0,0 +1,27 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from backend.transfer import export_stream
+
+
+class Command(BaseCommand):
+    help = "Export a user's notes, with their versions and shares, as NDJSON or as a zip archive."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', required=True, help="Username of the owner of the notes.")
+        parser.add_argument('--output', required=True, help="File to write; a .zip name writes a zip archive.")
+        parser.add_argument('--format', choices=['ndjson', 'zip'], help="Export format; defaults from the --output suffix.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        format = options['format'] or ('zip' if options['output'].endswith('.zip') else 'ndjson')
+        size = 0
+        with open(options['output'], 'wb') as output:
+            for data in export_stream(user, format):
+                output.write(data)
+                size += len(data)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported the notes of {user.username} to {options['output']} ({size} bytes)."))
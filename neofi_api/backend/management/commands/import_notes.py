@@ -0,0 +1,29 @@
+import zipfile
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from backend.transfer import import_records, read_records
+
+
+class Command(BaseCommand):
+    help = "Import notes, with their versions and shares, from an export_notes file (NDJSON or zip) into a user's account."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Export file to import.")
+        parser.add_argument('--user', required=True, help="Username of the owner of the imported notes.")
+        parser.add_argument('--batch-size', type=int, help="Records inserted per transaction; defaults to NOTE_IMPORT_BATCH_SIZE.")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"User '{options['user']}' does not exist.")
+
+        try:
+            with open(options['path'], 'rb') as file:
+                counts = import_records(user, read_records(file), batch_size=options['batch_size'])
+        except (OSError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            raise CommandError(f"Cannot import {options['path']}: {e}")
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {counts['notes']} notes, {counts['versions']} versions and {counts['shares']} shares for {user.username}."
+        ))
@@ -0,0 +1,60 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from backend.models import UserShard
+from backend.sharding import hash_shard, is_sharded, move_user, note_shards, sync_directory
+
+
+class Command(BaseCommand):
+    help = (
+        "Sync the note shard directory, then move users whose notes are not on their hashed shard "
+        "(after shards were added), or move one user to a chosen shard."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help="Username of a single user to move.")
+        parser.add_argument('--to', help="Destination shard of --user; defaults to the user's hashed shard.")
+        parser.add_argument('--dry-run', action='store_true', help="Only report the moves.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of rows copied per query.")
+
+    def handle(self, *args, **options):
+        shards = note_shards()
+        if not is_sharded():
+            raise CommandError("Only one note shard is configured; set NEOFI_NOTE_SHARDS to shard notes.")
+        if options['to'] and options['to'] not in shards:
+            raise CommandError(f"Unknown shard '{options['to']}'; shards are {', '.join(shards)}.")
+
+        found = sync_directory(batch_size=options['batch_size'])
+        for user_id, aliases in found.items():
+            if len(aliases) > 1:
+                self.stderr.write(f"User {user_id} has notes on several shards: {', '.join(sorted(aliases))}.")
+
+        if options['user']:
+            try:
+                user = User.objects.get(username=options['user'])
+            except User.DoesNotExist:
+                raise CommandError(f"User '{options['user']}' does not exist.")
+            moves = [(user.pk, options['to'] or hash_shard(user.pk))]
+        else:
+            moves = [
+                (user_id, hash_shard(user_id))
+                for user_id, alias in UserShard.objects.order_by('user_id').values_list('user_id', 'alias')
+                if alias != hash_shard(user_id)
+            ]
+
+        placements = dict(UserShard.objects.filter(user_id__in=[user_id for user_id, _ in moves]).values_list('user_id', 'alias'))
+        moved = 0
+        for user_id, target in moves:
+            source = placements.get(user_id, target)
+            if source == target:
+                continue
+            if source not in connections:
+                raise CommandError(f"User {user_id} is placed on '{source}', which is not configured in DATABASES.")
+            if options['dry_run']:
+                self.stdout.write(f"Would move user {user_id} from {source} to {target}.")
+                continue
+            count = move_user(user_id, target, batch_size=options['batch_size'])
+            self.stdout.write(f"Moved {count} notes of user {user_id} from {source} to {target}.")
+            moved += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Moved {moved} users."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+from backend.search import rebuild_index
+from backend.sharding import note_shards
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index over note titles and contents, on every shard."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help="Number of notes indexed per batch.")
+
+    def handle(self, *args, **options):
+        count = 0
+        for alias in note_shards():
+            count += rebuild_index(batch_size=options['batch_size'], using=alias)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} notes."))
@@ -0,0 +1,90 @@
+import random
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.authtoken.models import Token
+from backend.models import Note, NoteVersion, SharedNoteUser
+from backend.search import index_notes
+from backend.sharding import allocate_note_ids, record_shared_shards, shard_for_user, sharded
+from backend.versions import apply_deltas, build_version
+
+
+class Command(BaseCommand):
+    help = "Seed users, notes, shares and versions at a configurable scale, for benchmarks."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10, help="Number of users (N).")
+        parser.add_argument('--notes', type=int, default=100, help="Notes owned by each user (M).")
+        parser.add_argument('--shares', type=int, default=2, help="Other users each note is shared with (S).")
+        parser.add_argument('--versions', type=int, default=5, help="Versions per note (V).")
+        parser.add_argument('--content-size', type=int, default=200, help="Length of the initial note content.")
+        parser.add_argument('--prefix', default='bench', help="Prefix of the seeded usernames.")
+        parser.add_argument('--password', default='benchmark', help="Password of every seeded user.")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible data.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Rows inserted per bulk query.")
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        prefix = options['prefix']
+
+        with transaction.atomic():
+            # Hash the password once; hashing per user would dominate the seeding time
+            password = make_password(options['password'])
+            users = User.objects.bulk_create([
+                User(username=f'{prefix}{index}', email=f'{prefix}{index}@example.com', password=password)
+                for index in range(options['users'])
+            ], batch_size=batch_size)
+            Token.objects.bulk_create([Token(user=user, key=Token.generate_key()) for user in users], batch_size=batch_size)
+            self.stdout.write(f"Created {len(users)} users with tokens.")
+
+        notes = 0
+        shares = 0
+        for user in users:
+            # Each user's notes, versions and shares go to the user's shard, in one transaction
+            note_ids = allocate_note_ids(user.pk, options['notes'])
+            shard = shard_for_user(user.pk)
+            with transaction.atomic(using=shard):
+                user_notes = sharded(Note, shard).bulk_create([
+                    Note(id=note_id, user=user, title=f'Note {index} of {user.username}', content=self._text(rng, options['content_size']))
+                    for index, note_id in enumerate(note_ids)
+                ], batch_size=batch_size)
+
+                others = [other for other in users if other.pk != user.pk]
+                user_shares = []
+                versions = []
+                for note in user_notes:
+                    for recipient in rng.sample(others, min(options['shares'], len(others))):
+                        user_shares.append(SharedNoteUser(note=note, user=recipient))
+
+                    # Build versions the same way update_note does, snapshots included
+                    for number in range(1, options['versions'] + 1):
+                        delta = self._text(rng, 40)
+                        note.content = apply_deltas(note.content, [delta])
+                        versions.append(build_version(note, user, number, delta))
+                    note.version = options['versions']
+
+                sharded(Note, shard).bulk_update(user_notes, ['content', 'version'], batch_size=batch_size)
+                sharded(NoteVersion, shard).bulk_create(versions, batch_size=batch_size)
+                sharded(SharedNoteUser, shard).bulk_create(user_shares, batch_size=batch_size, ignore_conflicts=True)
+                index_notes(user_notes, using=shard)
+
+            record_shared_shards(shard, {share.user_id for share in user_shares})
+            notes += len(user_notes)
+            shares += len(user_shares)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {notes} notes, {shares} shares and "
+            f"{notes * options['versions']} versions for users {prefix}0..{prefix}{len(users) - 1}."
+        ))
+
+    @staticmethod
+    def _text(rng, length):
+        words = []
+        size = 0
+        while size < length:
+            word = ''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(2, 9)))
+            words.append(word)
+            size += len(word) + 1
+        return ' '.join(words)[:length]
@@ -0,0 +1,101 @@
+import bisect
+import threading
+from django.http import HttpResponse
+
+# Bucket upper bounds of each histogram, in the metric's unit
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+
+class Histogram:
+    """
+    Thread-safe Prometheus-style histogram with one series per label set.
+
+    Args:
+        name (str): Metric name.
+        documentation (str): Help text of the metric.
+        labels (tuple): Names of the labels.
+        buckets (tuple): Sorted bucket upper bounds; a `+Inf` bucket is added.
+    """
+
+    def __init__(self, name, documentation, labels, buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, *label_values):
+        """
+        Record one observation for the series identified by `label_values`.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_values)
+            if series is None:
+                series = self._series[label_values] = {'counts': [0] * (len(self.buckets) + 1), 'sum': 0.0, 'count': 0}
+            series['counts'][index] += 1
+            series['sum'] += value
+            series['count'] += 1
+
+    def collect(self):
+        """
+        Render the histogram in the Prometheus text exposition format.
+
+        Returns:
+            list: The lines of the metric.
+        """
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = {labels: dict(values, counts=list(values['counts'])) for labels, values in self._series.items()}
+
+        for label_values, values in sorted(series.items()):
+            labels = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labels, label_values))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, '+Inf'), values['counts']):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{labels}}} {values["sum"]}')
+            lines.append(f'{self.name}_count{{{labels}}} {values["count"]}')
+        return lines
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Per-request metrics recorded by PerformanceMiddleware, labelled by route name and method
+REQUEST_DURATION = Histogram(
+    'neofi_request_duration_seconds', 'Wall time spent handling a request.', ('view', 'method'), DURATION_BUCKETS
+)
+DB_QUERIES = Histogram(
+    'neofi_request_db_queries', 'Database queries run while handling a request.', ('view', 'method'), QUERY_BUCKETS
+)
+DB_DURATION = Histogram(
+    'neofi_request_db_duration_seconds', 'Time spent in database queries while handling a request.', ('view', 'method'), DURATION_BUCKETS
+)
+RESPONSE_SIZE = Histogram(
+    'neofi_response_size_bytes', 'Size of the response body (streamed responses excluded).', ('view', 'method'), SIZE_BUCKETS
+)
+
+REGISTRY = (REQUEST_DURATION, DB_QUERIES, DB_DURATION, RESPONSE_SIZE)
+
+
+def metrics(request):
+    """
+    View exposing the request metrics of this process in the Prometheus text format.
+
+    Params:
+    - request: HTTP request object.
+
+    Returns:
+    - HttpResponse: The metrics, one histogram per recorded quantity.
+    """
+    lines = [line for histogram in REGISTRY for line in histogram.collect()]
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; version=0.0.4; charset=utf-8')
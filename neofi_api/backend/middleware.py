@@ -0,0 +1,80 @@
+import time
+from contextlib import ExitStack
+from django.db import connections
+from .metrics import DB_DURATION, DB_QUERIES, REQUEST_DURATION, RESPONSE_SIZE
+from .routers import unpin_primary
+
+
+class QueryRecorder:
+    """
+    Database execute wrapper counting queries and the time spent running them.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+
+
+class PerformanceMiddleware:
+    """
+    Record the wall time, database query count and time, and response size of each request.
+
+    The measurements are added to the response as a `Server-Timing` header and recorded
+    in the histograms served at `/metrics`, labelled with the route name of the view.
+    Place it first in `MIDDLEWARE` so the other middleware is included in the wall time.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder()
+        started = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.url_name or match.view_name) if match else 'unmatched'
+        labels = (view or 'unnamed', request.method)
+
+        REQUEST_DURATION.observe(duration, *labels)
+        DB_QUERIES.observe(recorder.count, *labels)
+        DB_DURATION.observe(recorder.duration, *labels)
+        if not response.streaming:
+            RESPONSE_SIZE.observe(len(response.content), *labels)
+
+        response['Server-Timing'] = (
+            f'app;dur={duration * 1000:.2f}, '
+            f'db;dur={recorder.duration * 1000:.2f};desc="{recorder.count} queries"'
+        )
+        return response
+
+
+class ReadYourWritesMiddleware:
+    """
+    Scope the read-your-writes pinning of PrimaryReplicaRouter to a single request.
+
+    Every request starts reading from the replica; once it writes, its remaining reads go to
+    the primary, and the next request starts over.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        unpin_primary()
+        try:
+            return self.get_response(request)
+        finally:
+            unpin_primary()
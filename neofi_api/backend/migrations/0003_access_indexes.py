@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-16 22:52
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0002_note_shared_with_alter_sharednoteuser_note'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='note',
+            name='shared_with',
+        ),
+        migrations.AlterField(
+            model_name='sharednoteuser',
+            name='note',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shared_users', to='backend.note'),
+        ),
+        migrations.AddIndex(
+            model_name='note',
+            index=models.Index(fields=['user', 'updated_at'], name='note_user_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='sharednoteuser',
+            index=models.Index(fields=['user', 'note'], name='sharednote_user_note_idx'),
+        ),
+    ]
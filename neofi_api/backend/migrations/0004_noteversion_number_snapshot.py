@@ -0,0 +1,61 @@
+from django.db import migrations, models
+
+# Snapshot interval in effect when existing versions are backfilled
+SNAPSHOT_INTERVAL = 50
+
+
+def backfill_versions(apps, schema_editor):
+    """
+    Number existing versions per note and store snapshots on the snapshot interval.
+
+    Updates only ever append "\n" + changes to a note, so the content after each
+    version is recovered by stripping the later deltas from the current content.
+    """
+    Note = apps.get_model('backend', 'Note')
+    NoteVersion = apps.get_model('backend', 'NoteVersion')
+    db_alias = schema_editor.connection.alias
+
+    note_ids = NoteVersion.objects.using(db_alias).values_list('note_id', flat=True).distinct()
+    for note_id in note_ids.iterator():
+        content = Note.objects.using(db_alias).filter(pk=note_id).values_list('content', flat=True).first()
+        versions = list(NoteVersion.objects.using(db_alias).filter(note_id=note_id).order_by('timestamp', 'id'))
+
+        for number, version in enumerate(versions, start=1):
+            version.number = number
+
+        # Walk back from the newest version, peeling off one delta at a time
+        for version in reversed(versions):
+            if content is None:
+                break
+            if (version.number - 1) % SNAPSHOT_INTERVAL == 0:
+                version.snapshot = content
+            suffix = "\n" + version.changes
+            content = content[:-len(suffix)] if content.endswith(suffix) else None
+
+        NoteVersion.objects.using(db_alias).bulk_update(versions, ['number', 'snapshot'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0003_access_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='noteversion',
+            name='number',
+            field=models.PositiveIntegerField(default=0),
+            preserve_default=False,
+        ),
+        migrations.AddField(
+            model_name='noteversion',
+            name='snapshot',
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.RunPython(backfill_versions, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='noteversion',
+            constraint=models.UniqueConstraint(fields=('note', 'number'), name='noteversion_note_number_uniq'),
+        ),
+    ]
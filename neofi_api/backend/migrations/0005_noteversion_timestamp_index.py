@@ -0,0 +1,19 @@
+# Generated by Django 5.0.14 on 2026-10-16 22:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0004_noteversion_number_snapshot'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='noteversion',
+            index=models.Index(fields=['note', 'timestamp'], name='noteversion_note_ts_idx'),
+        ),
+    ]
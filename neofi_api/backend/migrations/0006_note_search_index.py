@@ -0,0 +1,28 @@
+from django.db import migrations
+
+
+def create_search_index(apps, schema_editor):
+    """
+    Create the FTS5 table indexing note titles and contents, and fill it from existing notes.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("CREATE VIRTUAL TABLE IF NOT EXISTS backend_note_fts USING fts5(title, content)")
+        cursor.execute(
+            "INSERT INTO backend_note_fts (rowid, title, content) SELECT id, title, content FROM backend_note"
+        )
+
+
+def drop_search_index(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DROP TABLE IF EXISTS backend_note_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0005_noteversion_timestamp_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
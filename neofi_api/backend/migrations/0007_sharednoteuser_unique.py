@@ -0,0 +1,37 @@
+from django.db import migrations, models
+from django.db.models import Count, Min
+
+
+def remove_duplicate_shares(apps, schema_editor):
+    """
+    Keep only the oldest row of every duplicated (note, user) share before adding the unique constraint.
+    """
+    SharedNoteUser = apps.get_model('backend', 'SharedNoteUser')
+    db_alias = schema_editor.connection.alias
+
+    duplicates = (
+        SharedNoteUser.objects.using(db_alias)
+        .values('note_id', 'user_id')
+        .annotate(keep=Min('id'), rows=Count('id'))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates.iterator():
+        SharedNoteUser.objects.using(db_alias).filter(
+            note_id=duplicate['note_id'],
+            user_id=duplicate['user_id']
+        ).exclude(pk=duplicate['keep']).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0006_note_search_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicate_shares, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='sharednoteuser',
+            constraint=models.UniqueConstraint(fields=('note', 'user'), name='sharednoteuser_note_user_uniq'),
+        ),
+    ]
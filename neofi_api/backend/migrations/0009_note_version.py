@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-16 23:57
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def backfill_note_versions(apps, schema_editor):
+    """
+    Set the version counter of existing notes to the number of their latest version.
+    """
+    Note = apps.get_model('backend', 'Note')
+    NoteVersion = apps.get_model('backend', 'NoteVersion')
+    db_alias = schema_editor.connection.alias
+
+    latest = (
+        NoteVersion.objects.using(db_alias)
+        .filter(note_id=OuterRef('pk'))
+        .order_by('-number')
+        .values('number')[:1]
+    )
+    Note.objects.using(db_alias).update(version=Coalesce(Subquery(latest), 0))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0008_note_shards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_note_versions, migrations.RunPython.noop),
+    ]
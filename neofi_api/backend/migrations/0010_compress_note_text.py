@@ -0,0 +1,92 @@
+# Generated by Django 5.0.14 on 2026-10-17 00:02
+
+import backend.fields
+from django.conf import settings
+from django.db import migrations, transaction
+from django.db.models import BinaryField
+from django.db.models.functions import Cast, Length
+
+# Rows rewritten per transaction
+BATCH_SIZE = 500
+
+
+def compress_column(model, field, db_alias):
+    """
+    Rewrite the large values of a text column so they are stored compressed, in batches.
+
+    The historical model already uses CompressedTextField, so loading a row yields its
+    text and saving it back stores the compressed form.
+    """
+    queryset = (
+        model.objects.using(db_alias)
+        .annotate(stored_size=Length(Cast(field, BinaryField())))
+        .filter(stored_size__gte=settings.NOTE_COMPRESSION_MIN_SIZE)
+        .only('id', field)
+        .order_by('id')
+    )
+    last_id = 0
+    while True:
+        rows = list(queryset.filter(id__gt=last_id)[:BATCH_SIZE])
+        if not rows:
+            break
+        with transaction.atomic(using=db_alias):
+            model.objects.using(db_alias).bulk_update(rows, [field])
+        last_id = rows[-1].id
+
+
+def compress_note_text(apps, schema_editor):
+    """
+    Compress the existing note contents and version payloads above the size threshold.
+    """
+    Note = apps.get_model('backend', 'Note')
+    NoteVersion = apps.get_model('backend', 'NoteVersion')
+    db_alias = schema_editor.connection.alias
+
+    compress_column(Note, 'content', db_alias)
+    compress_column(NoteVersion, 'changes', db_alias)
+    compress_column(NoteVersion, 'snapshot', db_alias)
+
+
+def decompress_note_text(apps, schema_editor):
+    """
+    Store every note content and version payload as plain text again.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("UPDATE backend_note SET content = neofi_text(content) WHERE typeof(content) = 'blob'")
+        cursor.execute("UPDATE backend_noteversion SET changes = neofi_text(changes) WHERE typeof(changes) = 'blob'")
+        cursor.execute("UPDATE backend_noteversion SET snapshot = neofi_text(snapshot) WHERE typeof(snapshot) = 'blob'")
+
+
+class Migration(migrations.Migration):
+
+    # Each batch commits on its own, so large tables are not rewritten in one transaction
+    atomic = False
+
+    dependencies = [
+        ('backend', '0009_note_version'),
+    ]
+
+    operations = [
+        # The columns stay TEXT (SQLite keeps the compressed values as BLOBs in them), so only
+        # the model state changes and the tables are not rebuilt
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='note',
+                    name='content',
+                    field=backend.fields.CompressedTextField(),
+                ),
+                migrations.AlterField(
+                    model_name='noteversion',
+                    name='changes',
+                    field=backend.fields.CompressedTextField(),
+                ),
+                migrations.AlterField(
+                    model_name='noteversion',
+                    name='snapshot',
+                    field=backend.fields.CompressedTextField(blank=True, null=True),
+                ),
+            ],
+        ),
+        migrations.RunPython(compress_note_text, decompress_note_text),
+    ]
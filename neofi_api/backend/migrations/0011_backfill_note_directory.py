@@ -0,0 +1,53 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:10
+
+from django.db import migrations, router
+
+# Notes read per query
+BATCH_SIZE = 1000
+
+
+def backfill_note_directory(apps, schema_editor):
+    """
+    Record the existing notes in the note directory, and place their owners on this database.
+
+    Before sharding, every note sits on the default database. Without directory entries,
+    `allocate_note_ids` would hand out IDs those notes already use.
+    """
+    Note = apps.get_model('backend', 'Note')
+    NoteOwner = apps.get_model('backend', 'NoteOwner')
+    UserShard = apps.get_model('backend', 'UserShard')
+    db_alias = schema_editor.connection.alias
+    # The directory only lives on the default database; shards have no directory tables
+    if not router.allow_migrate_model(db_alias, NoteOwner):
+        return
+
+    user_ids = set()
+    last_id = 0
+    while True:
+        rows = list(
+            Note.objects.using(db_alias).filter(pk__gt=last_id).order_by('pk').values_list('id', 'user_id')[:BATCH_SIZE]
+        )
+        if not rows:
+            break
+        last_id = rows[-1][0]
+        NoteOwner.objects.using(db_alias).bulk_create(
+            [NoteOwner(id=note_id, user_id=user_id) for note_id, user_id in rows],
+            ignore_conflicts=True
+        )
+        user_ids.update(user_id for _, user_id in rows)
+
+    UserShard.objects.using(db_alias).bulk_create(
+        [UserShard(user_id=user_id, alias=db_alias) for user_id in user_ids],
+        ignore_conflicts=True
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0010_compress_note_text'),
+    ]
+
+    operations = [
+        migrations.RunPython(backfill_note_directory, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:20
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0011_backfill_note_directory'),
+    ]
+
+    operations = [
+        # The column itself is unchanged (Django applies the default in Python), so only the
+        # model state is altered: SQLite would otherwise rebuild the whole versions table
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.AlterField(
+                    model_name='noteversion',
+                    name='timestamp',
+                    field=models.DateTimeField(default=django.utils.timezone.now),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-17 02:40
+
+from django.db import migrations
+
+# Must match backend.search.SEGMENT_BITS
+SEGMENT_BITS = 32
+
+
+def index_segments(apps, schema_editor):
+    """
+    Re-key the search index by segment: each note becomes the full segment of its ID.
+    """
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DELETE FROM backend_note_fts")
+        cursor.execute(
+            "INSERT INTO backend_note_fts (rowid, title, content) "
+            f"SELECT id << {SEGMENT_BITS}, title, neofi_text(content) FROM backend_note"
+        )
+
+
+def index_notes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("DELETE FROM backend_note_fts")
+        cursor.execute(
+            "INSERT INTO backend_note_fts (rowid, title, content) SELECT id, title, neofi_text(content) FROM backend_note"
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0012_noteversion_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.RunPython(index_segments, index_notes),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-17 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('backend', '0013_note_search_segments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='note',
+            name='history_generation',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
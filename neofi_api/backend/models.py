@@ -1,37 +1,93 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.utils import timezone
+from .fields import CompressedTextField
 
 class Note(models.Model):
     """
     Model representing a note created by a user.
     """
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # User who created the note
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)  # User who created the note (users live on the default database, notes on the owner's shard)
     title = models.CharField(max_length=100)  # Title of the note
-    content = models.TextField()  # Content of the note
+    content = CompressedTextField()  # Content of the note, compressed when large
     created_at = models.DateTimeField(auto_now_add=True)  # Timestamp indicating when the note was created
     updated_at = models.DateTimeField(auto_now=True)  # Timestamp indicating when the note was last updated
+    version = models.PositiveIntegerField(default=0)  # Number of the note's latest version (0 before the first update), checked by If-Match
+    history_generation = models.PositiveIntegerField(default=0)  # Bumped when compaction removes versions of the note, for history ETags and cached diffs
 
     class Meta:
         app_label = 'backend'  # Define the app label for the model
+        indexes = [
+            models.Index(fields=['user', 'updated_at'], name='note_user_updated_idx'),  # Serves owner lookups and list ordering
+        ]
 
 class SharedNoteUser(models.Model):
     """
     Model representing a shared note between users.
     """
     note = models.ForeignKey(Note, related_name='shared_users', on_delete=models.CASCADE)  # The note being shared
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # The user with whom the note is shared
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)  # The user with whom the note is shared
 
     class Meta:
         app_label = 'backend'  # Define the app label for the model
+        indexes = [
+            models.Index(fields=['user', 'note'], name='sharednote_user_note_idx'),  # Serves "shared with" access checks
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['note', 'user'], name='sharednoteuser_note_user_uniq'),  # A note is shared at most once with each user
+        ]
 
 class NoteVersion(models.Model):
     """
     Model representing a version of a note.
     """
     note = models.ForeignKey(Note, related_name='versions', on_delete=models.CASCADE)  # The note associated with this version
-    timestamp = models.DateTimeField(auto_now_add=True)  # Timestamp indicating when the version was created
-    user = models.ForeignKey(User, on_delete=models.CASCADE)  # The user who created this version
-    changes = models.TextField()  # Changes made in this version
+    timestamp = models.DateTimeField(default=timezone.now)  # Timestamp indicating when the version was created; set when the version is built, so a queued version keeps the time of its update
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)  # The user who created this version
+    number = models.PositiveIntegerField()  # Sequential version number within the note, starting at 1
+    changes = CompressedTextField()  # Changes made in this version, stored as the appended text (delta), compressed when large
+    snapshot = CompressedTextField(null=True, blank=True)  # Full note content (compressed when large) after this version, kept every NOTE_VERSION_SNAPSHOT_INTERVAL versions
 
     class Meta:
         app_label = 'backend'  # Define the app label for the model
+        constraints = [
+            models.UniqueConstraint(fields=['note', 'number'], name='noteversion_note_number_uniq'),  # Also serves snapshot and delta lookups
+        ]
+        indexes = [
+            models.Index(fields=['note', 'timestamp'], name='noteversion_note_ts_idx'),  # Serves time-range filters and history pagination
+        ]
+
+class NoteOwner(models.Model):
+    """
+    Directory entry of a note, kept on the default database when notes are sharded.
+
+    Allocates note IDs that are unique across shards, and records each note's owner,
+    whose shard holds the note.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # Owner of the note with this ID
+
+    class Meta:
+        app_label = 'backend'  # Define the app label for the model
+
+class UserShard(models.Model):
+    """
+    Model recording the shard holding a user's notes, versions and shares.
+    """
+    user = models.OneToOneField(User, primary_key=True, on_delete=models.CASCADE)  # Owner of the notes
+    alias = models.CharField(max_length=100)  # Database alias of the shard
+
+    class Meta:
+        app_label = 'backend'  # Define the app label for the model
+
+class SharedShard(models.Model):
+    """
+    Model recording that a shard other than the user's own holds notes shared with the user.
+    """
+    user = models.ForeignKey(User, related_name='shared_shards', on_delete=models.CASCADE)  # The recipient
+    alias = models.CharField(max_length=100)  # Database alias of the shard holding the shared notes
+
+    class Meta:
+        app_label = 'backend'  # Define the app label for the model
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'alias'], name='sharedshard_user_alias_uniq'),  # Serves the list fan-out lookup
+        ]
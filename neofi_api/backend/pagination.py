@@ -0,0 +1,179 @@
+import base64
+import json
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+
+def encode_cursor(position, pk):
+    """
+    Encode a keyset position into an opaque, URL-safe cursor string.
+
+    Args:
+        position (datetime): Value of the ordering column for the last row of a page.
+        pk (int): Primary key of the last row of a page, used as the tie-breaker.
+
+    Returns:
+        str: The encoded cursor.
+    """
+    raw = json.dumps([position.isoformat(), pk], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    Decode a cursor produced by `encode_cursor`.
+
+    Args:
+        cursor (str): The encoded cursor.
+
+    Returns:
+        tuple: The (datetime, int) keyset position.
+
+    Raises:
+        ValidationError: If the cursor is malformed.
+    """
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        position, pk = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        position = parse_datetime(position)
+        if position is None or not isinstance(pk, int):
+            raise ValueError(cursor)
+    except (ValueError, TypeError):
+        raise ValidationError("Invalid cursor.")
+    return position, pk
+
+
+def get_datetime_param(request, name):
+    """
+    Read an optional ISO 8601 datetime from the query string.
+
+    Naive datetimes are interpreted in the current time zone.
+
+    Args:
+        request (Request): The incoming request.
+        name (str): Name of the query parameter.
+
+    Returns:
+        datetime: The parsed datetime, or None if the parameter is absent.
+
+    Raises:
+        ValidationError: If the parameter is not a valid datetime.
+    """
+    value = request.query_params.get(name)
+    if value is None:
+        return None
+
+    try:
+        parsed = parse_datetime(value)
+    except ValueError:
+        parsed = None
+    if parsed is None:
+        raise ValidationError(f"'{name}' must be an ISO 8601 datetime.")
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def get_page_size(request, default=None, maximum=None):
+    """
+    Read the requested page size from the query string, clamped to the configured maximum.
+
+    Args:
+        request (Request): The incoming request.
+        default (int): Page size used when none is requested. Defaults to `NOTES_PAGE_SIZE`.
+        maximum (int): Upper bound for the page size. Defaults to `NOTES_MAX_PAGE_SIZE`.
+
+    Returns:
+        int: The page size to use.
+
+    Raises:
+        ValidationError: If the requested page size is not a positive integer.
+    """
+    default = default or settings.NOTES_PAGE_SIZE
+    maximum = maximum or settings.NOTES_MAX_PAGE_SIZE
+
+    page_size = request.query_params.get('page_size')
+    if page_size is None:
+        return min(default, maximum)
+
+    try:
+        page_size = int(page_size)
+    except ValueError:
+        raise ValidationError("Page size must be an integer.")
+    if page_size < 1:
+        raise ValidationError("Page size must be positive.")
+    return min(page_size, maximum)
+
+
+def keyset_page(queryset, cursor, page_size, field, descending=True):
+    """
+    Return one page of `queryset` ordered on `(field, id)`, newest first by default.
+
+    The queryset must be a `.values()` queryset that includes `field` and `id`.
+    Rows are fetched with a `(field, id)` range condition past the cursor rather
+    than an OFFSET, so every page costs the same regardless of its depth.
+
+    Args:
+        queryset (QuerySet): The values queryset to paginate.
+        cursor (str): Cursor returned with the previous page, or None for the first page.
+        page_size (int): Maximum number of rows to return.
+        field (str): Name of the datetime column to order by.
+        descending (bool): Whether to return the newest rows first.
+
+    Returns:
+        tuple: The list of rows and the cursor for the next page (None on the last page).
+    """
+    lookup, prefix = ('lt', '-') if descending else ('gt', '')
+
+    if cursor:
+        position, pk = decode_cursor(cursor)
+        queryset = queryset.filter(
+            Q(**{f'{field}__{lookup}': position}) | Q(**{field: position, f'id__{lookup}': pk})
+        )
+
+    # Fetch one extra row to know whether another page follows
+    rows = list(queryset.order_by(f'{prefix}{field}', f'{prefix}id')[:page_size + 1])
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1][field], rows[-1]['id'])
+
+    return rows, next_cursor
+
+
+def merge_keyset_pages(pages, page_size, field, descending=True):
+    """
+    Merge keyset pages read with the same cursor from several databases into one page.
+
+    Each page holds the first `page_size` rows past the cursor on its own database, so the
+    first `page_size` rows of their merge are the first rows past the cursor overall. IDs
+    must be unique across the databases, as note IDs are across shards.
+
+    Args:
+        pages (list): The `(rows, next_cursor)` results of `keyset_page` on each database.
+        page_size (int): Maximum number of rows to return.
+        field (str): Name of the datetime column the pages are ordered by.
+        descending (bool): Whether the pages return the newest rows first.
+
+    Returns:
+        tuple: The list of rows and the cursor for the next page (None on the last page).
+    """
+    if len(pages) == 1:
+        return pages[0]
+
+    rows = sorted(
+        (row for page, _ in pages for row in page),
+        key=lambda row: (row[field], row['id']),
+        reverse=descending
+    )
+    has_more = len(rows) > page_size or any(next_cursor for _, next_cursor in pages)
+    rows = rows[:page_size]
+
+    next_cursor = None
+    if has_more and rows:
+        next_cursor = encode_cursor(rows[-1][field], rows[-1]['id'])
+    return rows, next_cursor
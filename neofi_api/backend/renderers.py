@@ -0,0 +1,106 @@
+import json
+from collections.abc import Sequence
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.settings import api_settings
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:  # orjson is an optional dependency (the "fast" extra)
+    orjson = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    """
+    JSON renderer encoding with orjson when it is installed.
+
+    Output matches `JSONRenderer` (compact separators, UTC datetimes ending in "Z",
+    Decimal and lazy strings through the REST framework encoder). Indented output for
+    the browsable API, and installs without orjson, fall back to `JSONRenderer`.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if orjson is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        return orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+        )
+
+
+class NDJSONRenderer(BaseRenderer):
+    """
+    Renderer for newline-delimited JSON (one JSON document per line).
+
+    Views that support NDJSON stream their rows themselves with `ndjson_lines`;
+    this renderer makes the format negotiable (`Accept: application/x-ndjson` or
+    `?format=ndjson`) and renders any non-streamed response, such as an error.
+    """
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if not isinstance(data, (list, tuple)):
+            data = [data]
+        return b''.join(ndjson_lines(data))
+
+
+class ZipRenderer(BaseRenderer):
+    """
+    Renderer making zip archives negotiable (`Accept: application/zip` or `?format=zip`).
+
+    Views stream the archive themselves; non-streamed responses, such as errors, are
+    rendered as JSON.
+    """
+    media_type = 'application/zip'
+    format = 'zip'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return JSONRenderer().render(data)
+
+
+class DefaultRenderersWith(Sequence):
+    """
+    Renderer classes for `@renderer_classes`: the default renderers plus extra ones.
+
+    The defaults are read from the REST framework settings each time the list is used,
+    so a view keeps following `DEFAULT_RENDERER_CLASSES` (and `override_settings`)
+    instead of the value it had when the view module was imported.
+    """
+
+    def __init__(self, *extra):
+        self.extra = extra
+
+    def resolve(self):
+        return [*api_settings.DEFAULT_RENDERER_CLASSES, *self.extra]
+
+    def __getitem__(self, index):
+        return self.resolve()[index]
+
+    def __len__(self):
+        return len(self.resolve())
+
+
+def ndjson_lines(rows):
+    """
+    Encode rows lazily as NDJSON lines.
+
+    Args:
+        rows (iterable): The rows to encode.
+
+    Yields:
+        bytes: One encoded line per row.
+    """
+    for row in rows:
+        yield json.dumps(row, cls=JSONEncoder, separators=(',', ':')).encode() + b'\n'
@@ -0,0 +1,121 @@
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from .sharding import SHARDED_MODELS, note_shards, shard_for_note, shard_for_user
+
+# Per-request (per-thread, per-task) routing state
+_state = Local()
+
+
+def pin_primary():
+    """
+    Send every following read of the current request to the primary database.
+    """
+    _state.pinned = True
+
+
+def unpin_primary():
+    """
+    Let reads go to the replica again; called when a request finishes.
+    """
+    _state.pinned = False
+
+
+def is_pinned():
+    """
+    Tell whether the current request has written and so reads from the primary.
+    """
+    return getattr(_state, 'pinned', False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Database router sending writes to the primary and reads to a read-only replica.
+
+    The replica is the `DATABASE_REPLICA_ALIAS` connection. Reads go to the primary instead:
+    - for the rest of a request once it has written (read-your-writes; see ReadYourWritesMiddleware),
+    - inside a transaction on the primary, so they see its uncommitted changes,
+    - when no replica is configured, or the replica is a test mirror (it shares the primary's
+      data but not the open transaction of a TestCase).
+    """
+
+    def replica_alias(self):
+        """
+        Return the alias of the replica connection, or None when reads must use the primary.
+        """
+        alias = getattr(settings, 'DATABASE_REPLICA_ALIAS', None)
+        if not alias or alias not in settings.DATABASES:
+            return None
+        # The test runner points a mirror at the primary's own database
+        if connections[alias].settings_dict['NAME'] == connections[DEFAULT_DB_ALIAS].settings_dict['NAME']:
+            return None
+        return alias
+
+    def db_for_read(self, model, **hints):
+        if is_pinned() or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return self.replica_alias() or DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        pin_primary()
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Both connections hold the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Only the primary is migrated; the replica follows it
+        return db == DEFAULT_DB_ALIAS
+
+
+class NoteShardRouter:
+    """
+    Database router sending notes, versions and shares to their owner's shard.
+
+    The shard comes from the `shard` hint (see `backend.sharding.sharded`), or from the
+    related instance Django passes as a hint. Queries on the default database are left
+    to the next router, so PrimaryReplicaRouter still splits them between primary and replica.
+    """
+
+    def _is_sharded_model(self, model):
+        return model._meta.app_label == 'backend' and model._meta.model_name in SHARDED_MODELS
+
+    def shard(self, model, hints):
+        """
+        Return the shard alias of a query on a sharded model, or None for other models.
+        """
+        if not self._is_sharded_model(model):
+            return None
+        if 'shard' in hints:
+            return hints['shard']
+
+        instance = hints.get('instance')
+        if instance is None:
+            return note_shards()[0]
+        if not self._is_sharded_model(type(instance)):
+            # A user's related notes, versions or shares
+            return shard_for_user(instance.pk)
+        if instance._state.db:
+            # Rows loaded from the replica are written to the primary
+            return DEFAULT_DB_ALIAS if instance._state.db == getattr(settings, 'DATABASE_REPLICA_ALIAS', None) else instance._state.db
+        if instance._meta.model_name == 'note':
+            return shard_for_user(instance.user_id)
+        return shard_for_note(instance.note_id)
+
+    def db_for_read(self, model, **hints):
+        shard = self.shard(model, hints)
+        return shard if shard != DEFAULT_DB_ALIAS else None
+
+    def db_for_write(self, model, **hints):
+        shard = self.shard(model, hints)
+        return shard if shard != DEFAULT_DB_ALIAS else None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in (DEFAULT_DB_ALIAS, getattr(settings, 'DATABASE_REPLICA_ALIAS', None)):
+            return None
+        # Every other alias is a note shard: only the sharded tables (and the app's data migrations)
+        return app_label == 'backend' and (model_name is None or model_name in SHARDED_MODELS)
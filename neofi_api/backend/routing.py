@@ -0,0 +1,9 @@
+from django.urls import path
+from .consumers import NoteConsumer
+
+websocket_urlpatterns = [
+    path(
+            route = 'ws/notes/', 
+            view = NoteConsumer.as_asgi()
+        ),
+]
@@ -0,0 +1,173 @@
+from django.db import DEFAULT_DB_ALIAS, connections, router, transaction
+from .models import Note
+from .sharding import user_shards
+
+# Name of the FTS5 virtual table indexing note titles and contents
+FTS_TABLE = 'backend_note_fts'
+
+# A note is indexed as segments: its title and content at the last full indexing, and each
+# text appended since. The rowid of a segment is the note ID shifted by SEGMENT_BITS, plus
+# 0 for the full segment and the version number for an appended one
+SEGMENT_BITS = 32
+
+# Ranks each note by its best matching segment, and keeps the notes where every term
+# matches some segment (see `search_notes` for the {every_term} filters)
+SEARCH_SQL = f"""
+    WITH matches AS MATERIALIZED (
+        SELECT {FTS_TABLE}.rowid >> {SEGMENT_BITS} AS note_id,
+               snippet({FTS_TABLE}, -1, '[', ']', '...', 16) AS snippet, bm25({FTS_TABLE}) AS rank
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH %s
+    )
+    SELECT n.id, n.title, m.snippet, MIN(m.rank) AS rank
+    FROM matches m
+    JOIN backend_note n ON n.id = m.note_id
+    WHERE (n.user_id = %s OR n.id IN (SELECT note_id FROM backend_sharednoteuser WHERE user_id = %s))
+      {{every_term}}
+    GROUP BY n.id
+    ORDER BY rank
+    LIMIT %s
+"""
+
+# Filter of SEARCH_SQL keeping the notes with a segment matching one term
+TERM_FILTER_SQL = f"AND n.id IN (SELECT rowid >> {SEGMENT_BITS} FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s)"
+
+# Deletes every segment of a note
+UNINDEX_SQL = f"DELETE FROM {FTS_TABLE} WHERE rowid BETWEEN %s AND %s"
+
+
+def build_match_terms(text):
+    """
+    Turn free text into safe FTS5 queries, one per term.
+
+    Each term is quoted, so characters with a meaning in the FTS5 query syntax
+    (quotes, parentheses, AND/OR/NOT, ...) are searched for literally.
+
+    Args:
+        text (str): The text typed by the user.
+
+    Returns:
+        list: The FTS5 query of each term; empty if the text has no terms.
+    """
+    return ['"{}"'.format(term.replace('"', '""')) for term in text.split()]
+
+
+def segment_range(note_id):
+    """
+    Return the first and last rowids of a note's segments in the search index.
+    """
+    return note_id << SEGMENT_BITS, ((note_id + 1) << SEGMENT_BITS) - 1
+
+
+def index_notes(notes, using=DEFAULT_DB_ALIAS):
+    """
+    Add or refresh notes in the search index, as a single full segment each.
+
+    Args:
+        notes (iterable): Notes with their `title` and `content` loaded.
+        using (str): Alias of the shard holding the notes; each shard indexes its own notes.
+    """
+    rows = [(note.pk << SEGMENT_BITS, note.title, note.content) for note in notes]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(UNINDEX_SQL, [segment_range(row[0] >> SEGMENT_BITS) for row in rows])
+        cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)", rows)
+
+
+def index_appends(appends, using=DEFAULT_DB_ALIAS):
+    """
+    Add text appended to notes to the search index, without reindexing the rest of the notes.
+
+    Each text becomes a segment of its own, so an append only tokenizes its delta.
+    `index_notes` and `rebuild_index` merge a note's segments again.
+
+    Args:
+        appends (iterable): `(note_id, number, changes)` tuples, with the number of the
+            version that appended the text.
+        using (str): Alias of the shard holding the notes.
+    """
+    rows = [((note_id << SEGMENT_BITS) + number, '', changes) for note_id, number, changes in appends]
+    if not rows:
+        return
+    with connections[using].cursor() as cursor:
+        cursor.executemany(f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (%s, %s, %s)", rows)
+
+
+def unindex_notes(note_ids, using=DEFAULT_DB_ALIAS):
+    """
+    Remove notes from the search index.
+
+    Args:
+        note_ids (iterable): IDs of the notes to remove.
+        using (str): Alias of the shard holding the notes.
+    """
+    with connections[using].cursor() as cursor:
+        cursor.executemany(UNINDEX_SQL, [segment_range(note_id) for note_id in note_ids])
+
+
+def rebuild_index(batch_size=1000, using=DEFAULT_DB_ALIAS):
+    """
+    Rebuild the whole search index of a shard from its notes table.
+
+    Args:
+        batch_size (int): Number of notes read and indexed per batch.
+        using (str): Alias of the shard.
+
+    Returns:
+        int: The number of notes indexed.
+    """
+    # Rebuild in one transaction so searches never see a partial index
+    with transaction.atomic(using=using):
+        with connections[using].cursor() as cursor:
+            cursor.execute(f"DELETE FROM {FTS_TABLE}")
+
+        count = 0
+        batch = []
+        for note in Note.objects.using(using).only('id', 'title', 'content').iterator(chunk_size=batch_size):
+            batch.append(note)
+            if len(batch) >= batch_size:
+                index_notes(batch, using=using)
+                count += len(batch)
+                batch = []
+        index_notes(batch, using=using)
+        count += len(batch)
+
+    # Merge the index segments written by the incremental inserts
+    with connections[using].cursor() as cursor:
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+    return count
+
+
+def search_notes(user, text, limit):
+    """
+    Search the notes a user can access, best matches first.
+
+    Every shard holding such notes is searched; bm25 ranks are comparable across
+    shards closely enough to merge their best matches.
+
+    Args:
+        user (User): The user searching.
+        text (str): The text to search for.
+        limit (int): Maximum number of results.
+
+    Returns:
+        list: Dicts with the `id`, `title`, `snippet` and `rank` of each match.
+    """
+    terms = build_match_terms(text)
+    if not terms:
+        return []
+    # Segments matching any term are ranked; with several terms, each must match the note somewhere
+    every_term = terms if len(terms) > 1 else []
+    sql = SEARCH_SQL.format(every_term='\n      '.join([TERM_FILTER_SQL] * len(every_term)))
+    params = [' OR '.join(terms), user.pk, user.pk, *every_term, limit]
+
+    results = []
+    for shard in user_shards(user.pk):
+        # A read: let the database routers pick the shard's replica or primary
+        with connections[router.db_for_read(Note, shard=shard)].cursor() as cursor:
+            cursor.execute(sql, params)
+            columns = [column[0] for column in cursor.description]
+            results.extend(dict(zip(columns, row)) for row in cursor.fetchall())
+
+    return sorted(results, key=lambda result: (result['rank'], result['id']))[:limit]
@@ -3,6 +3,22 @@ from django.contrib.auth.models import User
 from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 from .models import Note
+from datetime import timezone
+
+# Format of the timestamps returned by the note endpoints
+TIMESTAMP_FORMAT = '%Y-%m-%d, %H:%M UTC'
+
+def format_timestamp(value):
+    """
+    Format a datetime as "year-month-day, hours:minutes UTC".
+
+    Args:
+        value (datetime): An aware datetime, as read from the database.
+
+    Returns:
+        str: The formatted timestamp.
+    """
+    return value.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
 
 class AlphaNumericValidator:
     """
@@ -89,3 +105,21 @@ class NoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Note  # Specify the model to be serialized
         fields = ['id', 'user', 'title', 'content', 'created_at', 'updated_at']  # Define the fields to include in the serialization
+        read_only_fields = ['user']  # The owner is set by the view, so validation never looks the user up
+
+    def create(self, validated_data):
+        """
+        Create a new note instance.
+
+        The note is saved through the instance rather than the manager, so the database
+        router can place it on its owner's shard.
+
+        Args:
+            validated_data (dict): The validated data, including the owner.
+
+        Returns:
+            Note: The newly created note instance.
+        """
+        note = Note(**validated_data)
+        note.save(force_insert=True)
+        return note
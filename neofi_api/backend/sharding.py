@@ -0,0 +1,453 @@
+import zlib
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import caches
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Max
+from .cache import invalidate_note_lists
+from .models import Note, NoteOwner, NoteVersion, SharedNoteUser, SharedShard, UserShard
+
+# Models stored on their owner's shard; every other model lives on the default database
+SHARDED_MODELS = {'note', 'noteversion', 'sharednoteuser'}
+
+# Cache keys of the shard directory; placements only change when users are rebalanced
+USER_SHARD_KEY = 'notes:shard:user:{user_id}'
+NOTE_OWNER_KEY = 'notes:shard:note:{note_id}'
+
+# Shard lists whose notes were found in the directory by this process
+_checked_directories = set()
+
+
+def get_directory_cache():
+    """
+    Return the cache backend holding the shard directory.
+
+    Entries expire after `NOTE_SHARD_CACHE_TIMEOUT` seconds: a process that did not move a
+    user keeps routing them to their old shard until then, unless the cache is shared.
+
+    Returns:
+        BaseCache: The cache named by `NOTE_SHARD_CACHE_ALIAS`.
+    """
+    return caches[settings.NOTE_SHARD_CACHE_ALIAS]
+
+
+def note_shards():
+    """
+    Return the database aliases notes are partitioned across, from `NOTE_SHARDS`.
+
+    Returns:
+        list: The shard aliases; the first one is also used when a query names no shard.
+    """
+    return list(getattr(settings, 'NOTE_SHARDS', None) or [DEFAULT_DB_ALIAS])
+
+
+def is_sharded():
+    """
+    Tell whether notes are spread over more than one database.
+    """
+    return len(note_shards()) > 1
+
+
+def hash_shard(user_id, shards=None):
+    """
+    Return the shard a user is placed on by hashing their ID.
+
+    Args:
+        user_id (int): ID of the user.
+        shards (list): Shard aliases to choose from; defaults to `NOTE_SHARDS`.
+
+    Returns:
+        str: The shard alias.
+    """
+    shards = shards or note_shards()
+    return shards[zlib.crc32(str(user_id).encode()) % len(shards)]
+
+
+def sharded(model, alias):
+    """
+    Return the manager of a sharded model bound to a shard.
+
+    The shard is passed to the database routers as a hint rather than as a fixed alias,
+    so reads on the default database can still be served by the replica.
+
+    Args:
+        model (Model): Note, NoteVersion or SharedNoteUser.
+        alias (str): The shard alias.
+
+    Returns:
+        Manager: The model's manager for that shard.
+    """
+    return model.objects.db_manager(hints={'shard': alias})
+
+
+def shards_for_users(user_ids, place=False):
+    """
+    Return the shard holding the notes of each user.
+
+    Users are placed by `hash_shard` the first time they own a note, and the placement is
+    recorded (in `UserShard`) so that later changes to `NOTE_SHARDS` do not move them
+    implicitly; `rebalance_shards` moves them.
+
+    Args:
+        user_ids (iterable): IDs of the users.
+        place (bool): Record the placement of users that have none yet.
+
+    Returns:
+        dict: Maps each user ID to its shard alias.
+    """
+    user_ids = list(dict.fromkeys(user_ids))
+    if not is_sharded():
+        return {user_id: note_shards()[0] for user_id in user_ids}
+
+    cache = get_directory_cache()
+    keys = {USER_SHARD_KEY.format(user_id=user_id): user_id for user_id in user_ids}
+    shards = {keys[key]: alias for key, alias in cache.get_many(keys).items()}
+
+    missing = [user_id for user_id in user_ids if user_id not in shards]
+    if missing:
+        placed = dict(UserShard.objects.filter(user_id__in=missing).values_list('user_id', 'alias'))
+        unplaced = [user_id for user_id in missing if user_id not in placed]
+        if place and unplaced:
+            UserShard.objects.bulk_create(
+                [UserShard(user_id=user_id, alias=hash_shard(user_id)) for user_id in unplaced],
+                ignore_conflicts=True
+            )
+            placed.update(UserShard.objects.filter(user_id__in=unplaced).values_list('user_id', 'alias'))
+        # Only recorded placements are cached; unplaced users own no notes yet
+        cache.set_many(
+            {USER_SHARD_KEY.format(user_id=user_id): alias for user_id, alias in placed.items()},
+            timeout=settings.NOTE_SHARD_CACHE_TIMEOUT
+        )
+        shards.update(placed)
+        shards.update({user_id: hash_shard(user_id) for user_id in missing if user_id not in placed})
+
+    return shards
+
+
+def shard_for_user(user_id, place=False):
+    """
+    Return the shard holding a user's notes; see `shards_for_users`.
+    """
+    return shards_for_users([user_id], place=place)[user_id]
+
+
+def shards_for_notes(note_ids):
+    """
+    Group note IDs by the shard holding them, using the note directory.
+
+    Args:
+        note_ids (iterable): IDs of the notes.
+
+    Returns:
+        dict: Maps shard aliases to lists of note IDs. Unknown notes are left out
+        (without sharding, every ID is returned under the single shard).
+    """
+    note_ids = list(dict.fromkeys(note_ids))
+    if not is_sharded():
+        return {note_shards()[0]: note_ids} if note_ids else {}
+
+    cache = get_directory_cache()
+    keys = {NOTE_OWNER_KEY.format(note_id=note_id): note_id for note_id in note_ids}
+    owners = {keys[key]: user_id for key, user_id in cache.get_many(keys).items()}
+
+    missing = [note_id for note_id in note_ids if note_id not in owners]
+    if missing:
+        found = dict(NoteOwner.objects.filter(pk__in=missing).values_list('id', 'user_id'))
+        cache.set_many(
+            {NOTE_OWNER_KEY.format(note_id=note_id): user_id for note_id, user_id in found.items()},
+            timeout=settings.NOTE_SHARD_CACHE_TIMEOUT
+        )
+        owners.update(found)
+
+    shards = shards_for_users(set(owners.values()))
+    grouped = {}
+    for note_id in note_ids:
+        if note_id in owners:
+            grouped.setdefault(shards[owners[note_id]], []).append(note_id)
+    return grouped
+
+
+def shard_for_note(note_id):
+    """
+    Return the shard holding a note.
+
+    Raises:
+        Note.DoesNotExist: If the note is not in the directory.
+    """
+    grouped = shards_for_notes([note_id])
+    if not grouped:
+        raise Note.DoesNotExist("Note does not exist")
+    return next(iter(grouped))
+
+
+def user_shards(user_id):
+    """
+    Return the shards holding the notes a user can access.
+
+    That is the user's own shard, plus the shards of notes shared with the user from
+    another shard, so listing and searching only fan out for cross-shard shares.
+
+    Args:
+        user_id (int): ID of the user.
+
+    Returns:
+        list: The shard aliases, the user's own shard first.
+    """
+    own = shard_for_user(user_id)
+    if not is_sharded():
+        return [own]
+    others = SharedShard.objects.filter(user_id=user_id).exclude(alias=own).values_list('alias', flat=True)
+    return [own, *sorted(set(others))]
+
+
+def attach_usernames(rows, chunk_size=1000):
+    """
+    Replace the `user_id` of version rows read from a shard with the user's `user__username`.
+
+    Users live on the default database, so shards cannot join them; the names are read
+    with one query per chunk of rows instead.
+
+    Args:
+        rows (iterable): Version dicts with `id`, `number`, `timestamp`, `user_id` and `changes`.
+        chunk_size (int): Number of rows resolved per query.
+
+    Yields:
+        dict: The rows with `user__username` in place of `user_id`, in their original order.
+    """
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield from _with_usernames(chunk)
+            chunk = []
+    yield from _with_usernames(chunk)
+
+
+def _with_usernames(rows):
+    usernames = dict(User.objects.filter(pk__in={row['user_id'] for row in rows}).values_list('id', 'username'))
+    for row in rows:
+        yield {
+            'id': row['id'],
+            'number': row['number'],
+            'timestamp': row['timestamp'],
+            'user__username': usernames.get(row['user_id']),
+            'changes': row['changes'],
+        }
+
+
+def allocate_note_ids(user_id, count):
+    """
+    Reserve IDs for new notes of a user, unique across every shard.
+
+    Args:
+        user_id (int): ID of the owner.
+        count (int): Number of notes.
+
+    Returns:
+        list: The note IDs, or `count` Nones without sharding (the notes table assigns them).
+    """
+    if not is_sharded() or not count:
+        return [None] * count
+
+    check_directory()
+    shard_for_user(user_id, place=True)
+    owners = NoteOwner.objects.bulk_create([NoteOwner(user_id=user_id) for _ in range(count)])
+    get_directory_cache().set_many(
+        {NOTE_OWNER_KEY.format(note_id=owner.pk): user_id for owner in owners},
+        timeout=settings.NOTE_SHARD_CACHE_TIMEOUT
+    )
+    return [owner.pk for owner in owners]
+
+
+def check_directory():
+    """
+    Make sure the note directory knows every stored note before IDs are allocated from it.
+
+    Notes created while sharding was off have no directory entry, so the directory would
+    hand their IDs out again. The check runs once per process and shard list.
+
+    Raises:
+        ImproperlyConfigured: If a shard holds a note with an ID above every allocated one;
+        `rebalance_shards` (or `sync_directory`) records them.
+    """
+    shards = tuple(note_shards())
+    if shards in _checked_directories:
+        return
+    allocated = NoteOwner.objects.aggregate(last_id=Max('pk'))['last_id'] or 0
+    for alias in shards:
+        if Note.objects.using(alias).filter(pk__gt=allocated).exists():
+            raise ImproperlyConfigured(
+                f"Shard '{alias}' holds notes missing from the note directory; run rebalance_shards first."
+            )
+    _checked_directories.add(shards)
+
+
+def record_shared_shards(alias, user_ids):
+    """
+    Record that a shard holds notes shared with users placed on other shards.
+
+    Args:
+        alias (str): Shard of the shared notes.
+        user_ids (iterable): IDs of the recipients.
+    """
+    if not is_sharded():
+        return
+    SharedShard.objects.bulk_create(
+        [
+            SharedShard(user_id=user_id, alias=alias)
+            for user_id, own in shards_for_users(user_ids).items() if own != alias
+        ],
+        ignore_conflicts=True
+    )
+
+
+def sync_directory(batch_size=1000):
+    """
+    Fill the note directory and user placements from the notes stored on each shard.
+
+    Run it when sharding is turned on for existing data (every note then sits on the
+    first shard) and before rebalancing.
+
+    Args:
+        batch_size (int): Number of notes read per query.
+
+    Returns:
+        dict: Maps each user ID that owns notes to the shards holding them.
+    """
+    found = {}
+    for alias in note_shards():
+        last_id = 0
+        while True:
+            rows = list(
+                Note.objects.using(alias).filter(pk__gt=last_id).order_by('pk').values_list('id', 'user_id')[:batch_size]
+            )
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            NoteOwner.objects.bulk_create([NoteOwner(id=note_id, user_id=user_id) for note_id, user_id in rows], ignore_conflicts=True)
+            for _, user_id in rows:
+                found.setdefault(user_id, set()).add(alias)
+
+        UserShard.objects.bulk_create(
+            [UserShard(user_id=user_id, alias=alias) for user_id, aliases in found.items() if alias in aliases],
+            ignore_conflicts=True
+        )
+        # Shares held on this shard for recipients placed elsewhere
+        for user_ids in _batches(SharedNoteUser.objects.using(alias).values_list('user_id', flat=True).distinct(), batch_size):
+            record_shared_shards(alias, user_ids)
+
+    get_directory_cache().delete_many([USER_SHARD_KEY.format(user_id=user_id) for user_id in found])
+    return found
+
+
+def _batches(queryset, batch_size):
+    batch = []
+    for item in queryset.iterator(chunk_size=batch_size):
+        batch.append(item)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def move_user(user_id, target, batch_size=1000):
+    """
+    Move a user's notes, with their versions and shares, to another shard.
+
+    Rows are copied to the target in one transaction, `batch_size` notes at a time, the
+    placement is switched, then the rows are deleted from the source. Note IDs are kept;
+    version IDs are reassigned. Writes to the user's notes made while the move runs may be
+    lost, so run it off-peak. Processes with their own directory cache may keep routing the
+    user to the source for up to `NOTE_SHARD_CACHE_TIMEOUT` seconds after the switch, and
+    find the notes gone meanwhile.
+
+    Args:
+        user_id (int): ID of the user.
+        target (str): Alias of the destination shard.
+        batch_size (int): Number of rows copied per query.
+
+    Returns:
+        int: The number of notes moved.
+    """
+    source = shard_for_user(user_id)
+    if source == target:
+        return 0
+
+    note_ids = []
+    recipient_ids = set()
+
+    with transaction.atomic(using=target):
+        # Drop the leftovers of an interrupted move before copying again
+        Note.objects.using(target).filter(user_id=user_id).only('id').delete()
+
+        # Copy one page of notes at a time, so only a page of contents is held in memory
+        last_id = 0
+        while True:
+            page = list(
+                Note.objects.using(source).filter(user_id=user_id, pk__gt=last_id).order_by('pk')[:batch_size]
+            )
+            if not page:
+                break
+            last_id = page[-1].pk
+            note_ids.extend(note.pk for note in page)
+            recipient_ids.update(_copy_notes(page, source, target, batch_size))
+
+    UserShard.objects.update_or_create(user_id=user_id, defaults={'alias': target})
+    # Other processes pick the new placement up when their cached entry expires
+    get_directory_cache().delete(USER_SHARD_KEY.format(user_id=user_id))
+    record_shared_shards(target, recipient_ids)
+    # Notes shared with the user by owners on the source shard now sit on another shard
+    if SharedNoteUser.objects.using(source).filter(user_id=user_id).exists():
+        record_shared_shards(source, [user_id])
+
+    with transaction.atomic(using=source):
+        # Deleting the notes cascades to their versions and shares on the same shard, and unindexes them
+        for index in range(0, len(note_ids), batch_size):
+            Note.objects.using(source).filter(pk__in=note_ids[index:index + batch_size]).only('id').delete()
+
+    invalidate_note_lists([user_id, *recipient_ids])
+    return len(note_ids)
+
+
+def _copy_notes(notes, source, target, batch_size):
+    """
+    Copy a page of notes, with their versions and shares, from one shard to another.
+
+    Returns:
+        set: IDs of the users the notes are shared with.
+    """
+    from .search import index_notes  # search imports this module
+
+    # bulk_create applies auto_now(_add) to the copies; restore the original timestamps after
+    timestamps = [(note.created_at, note.updated_at) for note in notes]
+    Note.objects.using(target).bulk_create(notes, batch_size=batch_size)
+    for note, (created_at, updated_at) in zip(notes, timestamps):
+        note.created_at, note.updated_at = created_at, updated_at
+    Note.objects.using(target).bulk_update(notes, ['created_at', 'updated_at'], batch_size=batch_size)
+
+    note_ids = [note.pk for note in notes]
+    versions = NoteVersion.objects.using(source).filter(note_id__in=note_ids).order_by('pk')
+    last_id = 0
+    while True:
+        page = list(versions.filter(pk__gt=last_id)[:batch_size])
+        if not page:
+            break
+        last_id = page[-1].pk
+        timestamps = [version.timestamp for version in page]
+        for version in page:
+            version.pk = None
+        NoteVersion.objects.using(target).bulk_create(page, batch_size=batch_size)
+        for version, timestamp in zip(page, timestamps):
+            version.timestamp = timestamp
+        NoteVersion.objects.using(target).bulk_update(page, ['timestamp'], batch_size=batch_size)
+
+    shares = list(SharedNoteUser.objects.using(source).filter(note_id__in=note_ids).values_list('note_id', 'user_id'))
+    SharedNoteUser.objects.using(target).bulk_create(
+        [SharedNoteUser(note_id=note_id, user_id=recipient_id) for note_id, recipient_id in shares],
+        batch_size=batch_size
+    )
+
+    index_notes(notes, using=target)
+    return {recipient_id for _, recipient_id in shares}
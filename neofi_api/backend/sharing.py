@@ -0,0 +1,76 @@
+from django.contrib.auth.models import User
+from django.db import transaction
+from .models import Note, SharedNoteUser
+from .sharding import record_shared_shards, shard_for_user, sharded
+
+
+def get_list_param(data, key):
+    """
+    Read a list from request data sent either as JSON or as form fields.
+
+    Form values may be repeated (`usernames=a&usernames=b`) or comma-separated (`usernames=a,b`).
+
+    Args:
+        data (dict or QueryDict): The request data.
+        key (str): Name of the field.
+
+    Returns:
+        list: The values, without blanks or duplicates, in their original order.
+    """
+    if hasattr(data, 'getlist'):
+        values = data.getlist(key)
+    else:
+        values = data.get(key) or []
+        if not isinstance(values, (list, tuple)):
+            values = [values]
+
+    items = []
+    for value in values:
+        if isinstance(value, str):
+            items.extend(item.strip() for item in value.split(','))
+        else:
+            items.append(value)
+    return list(dict.fromkeys(item for item in items if item not in ('', None)))
+
+
+def share_notes(owner, note_ids, usernames):
+    """
+    Share several notes with several users in a single transaction.
+
+    Pairs that are already shared are skipped by the `(note, user)` unique constraint,
+    so the whole share is one bulk insert whatever the number of recipients. The shares
+    are stored with the notes on the owner's shard.
+
+    Args:
+        owner (User): The user sharing the notes; must own every note.
+        note_ids (list): IDs of the notes to share.
+        usernames (list): Usernames of the recipients.
+
+    Returns:
+        tuple: The IDs of the recipients found and the list of unknown usernames.
+
+    Raises:
+        Note.DoesNotExist: If a note does not exist or is not owned by `owner`.
+    """
+    shard = shard_for_user(owner.pk)
+    owned_ids = set(sharded(Note, shard).filter(pk__in=note_ids, user_id=owner.pk).values_list('id', flat=True))
+    if len(owned_ids) != len(set(note_ids)):
+        raise Note.DoesNotExist("Note does not exist or you do not have permission to share it")
+
+    recipients = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+    unknown_usernames = [username for username in usernames if username not in recipients]
+
+    with transaction.atomic(using=shard):
+        sharded(SharedNoteUser, shard).bulk_create(
+            [
+                SharedNoteUser(note_id=note_id, user_id=user_id)
+                for note_id in owned_ids
+                for user_id in recipients.values()
+            ],
+            ignore_conflicts=True
+        )
+
+    # Let recipients placed on other shards find these notes when listing theirs
+    record_shared_shards(shard, recipients.values())
+
+    return list(recipients.values()), unknown_usernames
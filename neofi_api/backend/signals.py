@@ -0,0 +1,54 @@
+from django.contrib.auth.models import User
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+from .authentication import token_cache
+from .db import configure_sqlite_connection
+from .models import Note
+from .search import index_notes, unindex_notes
+
+
+# Tune every new SQLite connection (WAL, busy timeout, ...) as configured in the settings
+connection_created.connect(configure_sqlite_connection, dispatch_uid='backend.configure_sqlite_connection')
+
+
+@receiver(post_save, sender=Note)
+def index_saved_note(sender, instance, using, **kwargs):
+    """
+    Keep the search index up to date whenever a note is created or updated.
+    """
+    index_notes([instance], using=using)
+
+
+@receiver(post_delete, sender=Note)
+def unindex_deleted_note(sender, instance, using, **kwargs):
+    """
+    Drop deleted notes from the search index.
+    """
+    unindex_notes([instance.pk], using=using)
+
+
+@receiver(post_delete, sender=Token)
+def uncache_deleted_token(sender, instance, **kwargs):
+    """
+    Stop authenticating deleted (or rotated) tokens from the token cache.
+    """
+    token_cache.invalidate_key(instance.key)
+
+
+@receiver(post_save, sender=Token)
+def uncache_saved_token(sender, instance, **kwargs):
+    """
+    Drop cached tokens of a user whose token was created or changed.
+    """
+    token_cache.invalidate_user(instance.user_id)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def uncache_user_tokens(sender, instance, **kwargs):
+    """
+    Drop cached tokens of a user that was changed (for example deactivated) or deleted.
+    """
+    token_cache.invalidate_user(instance.pk)
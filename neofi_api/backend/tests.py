@@ -1,7 +1,62 @@
-from django.test import TestCase
+import gzip
+import importlib
+import json
+import tempfile
+import time
+import zipfile
+import zlib
+from datetime import timedelta
+from decimal import Decimal
+from io import BytesIO, StringIO
+from pathlib import Path
+from unittest import mock
+
+from channels.db import database_sync_to_async
+from channels.routing import URLRouter
+from channels.testing import WebsocketCommunicator
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth.models import User
-from .models import Note, SharedNoteUser
-from .serializers import UserSerializer, NoteSerializer
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured, PermissionDenied
+from django.core.management import call_command
+from django.db import connections, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from neofi_api import settings_api, settings_asgi, settings_production
+from .access import get_accessible_note, with_access
+from .authentication import TokenAuthMiddleware, TokenCache, token_cache
+from .benchmarks import (
+    _sqlite_workload_connection, measure_request_overhead, run_compression_benchmark, run_settings_comparison,
+    run_sqlite_concurrency
+)
+from .cache import get_note_list_stats
+from .compaction import compact_shard
+from .db import begin_immediate
+from .diff import DiffCache, diff_cache
+from .fields import COMPRESSED_MARKER
+from .metrics import REGISTRY
+from .middleware import ReadYourWritesMiddleware
+from .models import Note, NoteOwner, NoteVersion, SharedNoteUser, SharedShard, UserShard
+from .renderers import FastJSONRenderer
+from .routers import PrimaryReplicaRouter, is_pinned
+from .routing import websocket_urlpatterns
+from .search import segment_range
+from .serializers import NoteSerializer, UserSerializer, format_timestamp
+from .sharding import (
+    USER_SHARD_KEY, get_directory_cache, move_user, shard_for_note, shard_for_user, sync_directory, user_shards
+)
+from .transfer import export_records, import_records
+from .urls import urlpatterns
+from .versions import append_to_note, apply_deltas, is_snapshot_number, materialize_version
+from .writebehind import VersionWriteBehind
 
 class NoteTestCase(TestCase):
     def setUp(self):
@@ -106,3 +161,1721 @@ class SerializerTestCase(TestCase):
         serializer = UserSerializer(data=invalid_data)
         self.assertFalse(serializer.is_valid())
         self.assertIn('username', serializer.errors)
+
+class ListNotesPaginationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user1 = User.objects.create_user(username='testuser1', password='password1')
+        self.user2 = User.objects.create_user(username='testuser2', password='password2')
+        self.client.force_authenticate(user=self.user1)
+
+        # Create notes owned by user1 and one note shared with user1 by user2
+        self.own_notes = [
+            Note.objects.create(user=self.user1, title=f'Note {i}', content='Content')
+            for i in range(5)
+        ]
+        self.shared_note = Note.objects.create(user=self.user2, title='Shared', content='Content')
+        SharedNoteUser.objects.create(note=self.shared_note, user=self.user1)
+        Note.objects.create(user=self.user2, title='Private', content='Content')
+
+    def test_list_notes_pages_cover_all_accessible_notes(self):
+        """Test if walking the cursor returns every accessible note exactly once."""
+        seen = []
+        cursor = None
+        while True:
+            params = {'page_size': 2}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.client.get('/notes/list/', params)
+            self.assertEqual(response.status_code, 200)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(note['id'] for note in response.data['results'])
+            cursor = response.data['next_cursor']
+            if cursor is None:
+                break
+
+        expected = {note.id for note in self.own_notes} | {self.shared_note.id}
+        self.assertEqual(len(seen), len(expected))
+        self.assertEqual(set(seen), expected)
+
+    def test_list_notes_newest_first(self):
+        """Test if the most recently updated note is listed first."""
+        self.own_notes[0].save()
+        response = self.client.get('/notes/list/')
+        self.assertEqual(response.data['results'][0]['id'], self.own_notes[0].id)
+
+    def test_list_notes_invalid_cursor(self):
+        """Test if a malformed cursor is rejected."""
+        response = self.client.get('/notes/list/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_list_notes_empty(self):
+        """Test if a user without notes gets a 404."""
+        user3 = User.objects.create_user(username='testuser3', password='password3')
+        self.client.force_authenticate(user=user3)
+        response = self.client.get('/notes/list/')
+        self.assertEqual(response.status_code, 404)
+
+class NoteAccessTestCase(APITestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.stranger = User.objects.create_user(username='stranger', password='password3')
+        self.note = Note.objects.create(user=self.owner, title='Test Note', content='Content')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+
+    def test_get_accessible_note_single_query(self):
+        """Test if owner and shared access are resolved in one query."""
+        for user in (self.owner, self.reader):
+            with self.assertNumQueries(1):
+                self.assertEqual(get_accessible_note(user, self.note.pk), self.note)
+
+    def test_get_accessible_note_denied(self):
+        """Test if users without access are rejected, and missing notes are reported."""
+        with self.assertNumQueries(1):
+            with self.assertRaises(PermissionDenied):
+                get_accessible_note(self.stranger, self.note.pk)
+        with self.assertRaises(Note.DoesNotExist):
+            get_accessible_note(self.owner, self.note.pk + 100)
+
+    def test_get_note_queries(self):
+        """Test if get_note needs a single query once the user is authenticated."""
+        self.client.force_authenticate(user=self.reader)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/notes/{self.note.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_version_history_queries(self):
+        """Test if the version history needs one access query and one versions query."""
+        self.client.force_authenticate(user=self.reader)
+        with self.assertNumQueries(2):
+            response = self.client.get(f'/notes/version-history/{self.note.pk}/')
+        self.assertEqual(response.status_code, 200)
+
+    def test_note_endpoints_forbidden(self):
+        """Test if every note endpoint answers 403 to users without access."""
+        self.client.force_authenticate(user=self.stranger)
+        self.assertEqual(self.client.get(f'/notes/{self.note.pk}/').status_code, 403)
+        self.assertEqual(self.client.get(f'/notes/version-history/{self.note.pk}/').status_code, 403)
+        response = self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More'})
+        self.assertEqual(response.status_code, 403)
+
+class NoteListCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.note = Note.objects.create(user=self.owner, title='Test Note', content='Content')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+
+    def list_titles(self, user):
+        self.client.force_authenticate(user=user)
+        response = self.client.get('/notes/list/')
+        if response.status_code != 200:
+            return []
+        return [note['title'] for note in response.data['results']]
+
+    def test_list_served_from_cache(self):
+        """Test if repeated list requests hit the cache instead of the database."""
+        self.list_titles(self.owner)
+        self.client.force_authenticate(user=self.owner)
+        with self.assertNumQueries(0):
+            self.client.get('/notes/list/')
+        self.assertEqual(get_note_list_stats(), {'hits': 1, 'misses': 1})
+
+    def test_create_invalidates_owner(self):
+        """Test if creating a note invalidates the owner's cached list."""
+        self.list_titles(self.owner)
+        self.client.post('/notes/create/', {'title': 'Second', 'content': 'Content'})
+        self.assertIn('Second', self.list_titles(self.owner))
+
+    def test_update_invalidates_owner_and_recipients(self):
+        """Test if updating a note reorders it for its owner and every recipient."""
+        other = Note.objects.create(user=self.owner, title='Other', content='Content')
+        SharedNoteUser.objects.create(note=other, user=self.reader)
+        self.assertEqual(self.list_titles(self.owner)[0], 'Other')
+        self.assertEqual(self.list_titles(self.reader)[0], 'Other')
+
+        self.client.force_authenticate(user=self.reader)
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More'})
+
+        self.assertEqual(self.list_titles(self.owner)[0], 'Test Note')
+        self.assertEqual(self.list_titles(self.reader)[0], 'Test Note')
+
+    def test_share_invalidates_recipients(self):
+        """Test if sharing a note invalidates the recipients' cached lists."""
+        recipient = User.objects.create_user(username='recipient', password='password3')
+        self.assertEqual(self.list_titles(recipient), [])
+
+        self.client.force_authenticate(user=self.owner)
+        self.client.post('/notes/share/', {'note_id': self.note.pk, 'usernames': ['recipient']}, format='json')
+
+        self.assertEqual(self.list_titles(recipient), ['Test Note'])
+
+@override_settings(NOTE_VERSION_SNAPSHOT_INTERVAL=3)
+class NoteVersionStorageTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content 0')
+
+        # Record the expected content after every update
+        self.expected = {}
+        for number in range(1, 8):
+            self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Content {number}'})
+            self.expected[number] = Note.objects.get(pk=self.note.pk).content
+
+    def test_versions_store_deltas_and_periodic_snapshots(self):
+        """Test if versions are numbered and only every K-th one keeps a snapshot."""
+        versions = NoteVersion.objects.filter(note=self.note).order_by('number')
+        self.assertEqual([version.number for version in versions], list(range(1, 8)))
+        self.assertEqual([version.changes for version in versions], [f'Content {n}' for n in range(1, 8)])
+        self.assertEqual(
+            [version.number for version in versions if version.snapshot is not None],
+            [1, 4, 7]
+        )
+
+    def test_materialize_every_version(self):
+        """Test if every historical version is rebuilt with a bounded number of queries."""
+        for number, content in self.expected.items():
+            with self.assertNumQueries(2):
+                self.assertEqual(materialize_version(self.note.pk, number), content)
+
+    def test_materialize_missing_version(self):
+        """Test if unknown versions are reported."""
+        with self.assertRaises(NoteVersion.DoesNotExist):
+            materialize_version(self.note.pk, 8)
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/0/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_get_note_version_endpoint(self):
+        """Test if the version endpoint returns the content at that version."""
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/5/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], self.expected[5])
+
+@override_settings(NOTE_VERSION_SNAPSHOT_INTERVAL=10)
+class NoteAppendTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content 0')
+
+    def test_update_returns_the_change(self):
+        """Test if an update appends the delta and returns the new version instead of the content."""
+        response = self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More bananas'})
+        self.assertEqual(response.status_code, 200)
+
+        version = NoteVersion.objects.get(note=self.note)
+        self.assertEqual(response.data['version_id'], version.pk)
+        self.assertEqual(response.data['version'], 1)
+        self.assertEqual(response.data['delta'], 'More bananas')
+        self.assertNotIn('updated_content', response.data)
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content, 'Content 0\nMore bananas')
+
+        # The search index follows the appended text
+        response = self.client.get('/notes/search/', {'q': 'bananas'})
+        self.assertEqual([note['id'] for note in response.data['results']], [self.note.pk])
+
+    def concurrent_append(self, changes):
+        # Another request appending to the note, committed before the current write
+        with transaction.atomic():
+            append_to_note(Note.objects.only('id', 'user_id').get(pk=self.note.pk), self.user, changes)
+
+    def test_update_does_not_read_content(self):
+        """Test if appending outside snapshot versions never reads the note content, alone or in a batch."""
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'Snapshot'})
+        with CaptureQueriesContext(connections['default']) as queries:
+            self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'Delta'})
+            self.client.put('/notes/batch/update/', {'notes': [{'id': self.note.pk, 'content': 'Batch'}]}, format='json')
+        reads = [query['sql'] for query in queries if query['sql'].startswith('SELECT')]
+        self.assertFalse([sql for sql in reads if '"backend_note"."content"' in sql])
+        self.assertEqual(materialize_version(self.note.pk, 3), 'Content 0\nSnapshot\nDelta\nBatch')
+
+    def test_concurrent_append_during_update(self):
+        """Test if an append committed between an update's access check and its write is kept."""
+        def check_then_append(*args, **kwargs):
+            note = get_accessible_note(*args, **kwargs)
+            self.concurrent_append('Concurrent')
+            return note
+
+        with mock.patch('backend.views.get_accessible_note', side_effect=check_then_append):
+            response = self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'Update'})
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content, 'Content 0\nConcurrent\nUpdate')
+        self.assertEqual(materialize_version(self.note.pk, 2), 'Content 0\nConcurrent\nUpdate')
+
+    def test_concurrent_append_during_batch_update(self):
+        """Test if an append committed between a batch update's access check and its writes is kept."""
+        def check_then_append(queryset, user):
+            notes = list(with_access(queryset, user))
+            self.concurrent_append('Concurrent')
+            return notes
+
+        with mock.patch('backend.batch.with_access', side_effect=check_then_append):
+            response = self.client.put('/notes/batch/update/', {'notes': [
+                {'id': self.note.pk, 'content': 'Batch 1'},
+                {'id': self.note.pk, 'content': 'Batch 2'},
+            ]}, format='json')
+        self.assertEqual([result['version'] for result in response.data['results']], [2, 3])
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content, 'Content 0\nConcurrent\nBatch 1\nBatch 2')
+        self.assertEqual(materialize_version(self.note.pk, 3), 'Content 0\nConcurrent\nBatch 1\nBatch 2')
+
+    def test_stale_instance_does_not_lose_appends(self):
+        """Test if appends made through different requests all survive."""
+        for number in range(3):
+            self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Line {number}'})
+        self.assertEqual(Note.objects.get(pk=self.note.pk).content, 'Content 0\nLine 0\nLine 1\nLine 2')
+
+    def test_update_requires_content(self):
+        """Test if an update without content is rejected."""
+        response = self.client.put(f'/notes/update/{self.note.pk}/', {})
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(NoteVersion.objects.exists())
+
+class OptimisticConcurrencyTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.note = Note.objects.create(user=self.owner, title='Test Note', content='Content')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+
+    def update(self, user, content, **headers):
+        self.client.force_authenticate(user=user)
+        return self.client.put(f'/notes/update/{self.note.pk}/', {'content': content}, **headers)
+
+    def test_version_counts_updates(self):
+        """Test if every update increments the note version and returns it as the ETag."""
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.get(f'/notes/{self.note.pk}/').data['version'], 0)
+
+        response = self.update(self.owner, 'One', HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((response.data['version'], response['ETag']), (1, '"1"'))
+        response = self.update(self.reader, 'Two', HTTP_IF_MATCH=response['ETag'])
+        self.assertEqual(response.data['version'], 2)
+        self.assertEqual(Note.objects.get(pk=self.note.pk).version, 2)
+
+    def test_stale_if_match_fails(self):
+        """Test if an update based on a stale version fails with 412 without writing."""
+        self.update(self.owner, 'One', HTTP_IF_MATCH='"0"')
+        response = self.update(self.reader, 'Two', HTTP_IF_MATCH='"0"')
+        self.assertEqual(response.status_code, 412)
+        self.assertEqual((response.data['version'], response['ETag']), (1, '"1"'))
+
+        note = Note.objects.get(pk=self.note.pk)
+        self.assertEqual((note.content, note.version), ('Content\nOne', 1))
+        self.assertEqual(NoteVersion.objects.filter(note=self.note).count(), 1)
+
+    def test_if_match_variants(self):
+        """Test if `*` and lists match, while weak and malformed tags never do."""
+        self.assertEqual(self.update(self.owner, 'One', HTTP_IF_MATCH='*').status_code, 200)
+        self.assertEqual(self.update(self.owner, 'Two', HTTP_IF_MATCH='"0", "1"').status_code, 200)
+        self.assertEqual(self.update(self.owner, 'Three', HTTP_IF_MATCH='W/"2"').status_code, 412)
+        self.assertEqual(self.update(self.owner, 'Three', HTTP_IF_MATCH='"abc"').status_code, 412)
+        self.assertEqual(self.update(self.owner, 'Three').status_code, 200)
+
+    def test_batch_update_keeps_counter(self):
+        """Test if batch updates advance the same version counter."""
+        self.update(self.owner, 'One')
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.put('/notes/batch/update/', {'notes': [{'id': self.note.pk, 'content': 'Two'}]}, format='json')
+        self.assertEqual(response.data['results'][0]['version'], 2)
+        self.assertEqual(self.update(self.owner, 'Three', HTTP_IF_MATCH='"2"').data['version'], 3)
+
+@override_settings(NOTE_COMPRESSION_MIN_SIZE=100, NOTE_VERSION_SNAPSHOT_INTERVAL=2)
+class CompressedTextTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.client.force_authenticate(user=self.user)
+        self.large = ' '.join(['apples and pears'] * 20)
+
+    def stored(self, table, column, row_id):
+        with connections['default'].cursor() as cursor:
+            cursor.execute(f"SELECT {column} FROM {table} WHERE id = %s", [row_id])
+            return cursor.fetchone()[0]
+
+    def test_large_values_stored_compressed(self):
+        """Test if large contents are stored compressed and small ones as text, both read back as text."""
+        large = Note.objects.create(user=self.user, title='Large', content=self.large)
+        small = Note.objects.create(user=self.user, title='Small', content='Short')
+
+        stored = self.stored('backend_note', 'content', large.pk)
+        self.assertIsInstance(stored, bytes)
+        self.assertTrue(stored.startswith(COMPRESSED_MARKER))
+        self.assertLess(len(stored), len(self.large))
+        self.assertEqual(self.stored('backend_note', 'content', small.pk), 'Short')
+
+        self.assertEqual(Note.objects.get(pk=large.pk).content, self.large)
+        self.assertEqual(Note.objects.filter(pk=large.pk).values_list('content', flat=True).get(), self.large)
+        self.assertEqual(self.client.get(f'/notes/{large.pk}/').data['content'], self.large)
+
+    def test_append_crosses_threshold(self):
+        """Test if appends in the database compress the content once it grows, and keep it searchable."""
+        note = Note.objects.create(user=self.user, title='Note', content='Short')
+        self.client.put(f'/notes/update/{note.pk}/', {'content': self.large})
+        self.client.put(f'/notes/update/{note.pk}/', {'content': 'bananas'})
+
+        expected = f'Short\n{self.large}\nbananas'
+        self.assertIsInstance(self.stored('backend_note', 'content', note.pk), bytes)
+        self.assertEqual(Note.objects.get(pk=note.pk).content, expected)
+        self.assertEqual(materialize_version(note.pk, 2), expected)
+        self.assertEqual(materialize_version(note.pk, 1), f'Short\n{self.large}')
+
+        response = self.client.get('/notes/search/', {'q': 'pears bananas'})
+        self.assertEqual([result['id'] for result in response.data['results']], [note.pk])
+
+    @override_settings(NOTE_VERSION_SNAPSHOT_INTERVAL=1000)
+    def test_append_cost_does_not_grow_with_note(self):
+        """Test if an append compresses and indexes only its delta, however large the note is."""
+        def append(note):
+            before = len(self.stored('backend_note', 'content', note.pk))
+            with mock.patch('zlib.compress', wraps=zlib.compress) as compress, \
+                    mock.patch('zlib.decompressobj', wraps=zlib.decompressobj) as decompressobj, \
+                    mock.patch('zlib.compressobj', wraps=zlib.compressobj) as compressobj:
+                self.client.put(f'/notes/update/{note.pk}/', {'content': 'bananas'})
+            with connections['default'].cursor() as cursor:
+                cursor.execute(
+                    "SELECT content FROM backend_note_fts WHERE rowid BETWEEN %s AND %s ORDER BY rowid",
+                    segment_range(note.pk)
+                )
+                indexed = [row[0] for row in cursor.fetchall()]
+            grown = len(self.stored('backend_note', 'content', note.pk)) - before
+            return compress.call_count, decompressobj.call_count, compressobj.call_count, grown, indexed[1:]
+
+        small = Note.objects.create(user=self.user, title='Small', content=self.large)
+        large = Note.objects.create(user=self.user, title='Large', content=self.large * 100)
+        for note in (small, large):
+            # Version 1 keeps a snapshot, which reads the content; measure version 2
+            self.client.put(f'/notes/update/{note.pk}/', {'content': 'apples'})
+
+        small_cost, large_cost = append(small), append(large)
+        self.assertEqual(small_cost, large_cost)
+        self.assertEqual(small_cost[:3], (0, 0, 1))  # Only the delta is compressed, nothing is decompressed
+        self.assertEqual(small_cost[4], ['apples', 'bananas'])
+        self.assertEqual(Note.objects.get(pk=large.pk).content, f'{self.large * 100}\napples\nbananas')
+
+    def test_migration_compresses_existing_rows(self):
+        """Test if the data migration compresses rows stored as plain text."""
+        migration = importlib.import_module('backend.migrations.0010_compress_note_text')
+        note = Note.objects.create(user=self.user, title='Note', content='Short')
+        with connections['default'].cursor() as cursor:
+            cursor.execute("UPDATE backend_note SET content = %s WHERE id = %s", [self.large, note.pk])
+
+        migration.compress_column(Note, 'content', 'default')
+        self.assertIsInstance(self.stored('backend_note', 'content', note.pk), bytes)
+        self.assertEqual(Note.objects.get(pk=note.pk).content, self.large)
+
+    def test_compression_benchmark(self):
+        """Test if the compression benchmark reports smaller compressed storage."""
+        with tempfile.TemporaryDirectory() as directory:
+            results = run_compression_benchmark(Path(directory), notes=5, versions=10, delta_size=50, reads=5)
+        self.assertLess(results['compressed']['database_bytes'], results['plain']['database_bytes'])
+        self.assertIn('p95', results['compressed']['version_read_ms'])
+
+class VersionWriteBehindTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        diff_cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content')
+
+    @override_settings(NOTE_VERSION_WRITE_BEHIND='sync')
+    def test_versions_written_at_commit(self):
+        """Test if queued versions are written once the update commits, and not before."""
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More'})
+            self.assertFalse(NoteVersion.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('version_id', response.data)
+        self.assertEqual(response.data['version'], 1)
+        version = NoteVersion.objects.get(note=self.note)
+        self.assertEqual((version.number, version.changes), (1, 'More'))
+        self.assertEqual(materialize_version(self.note.pk, 1), 'Content\nMore')
+
+    @override_settings(NOTE_VERSION_WRITE_BEHIND='sync', NOTE_VERSION_SNAPSHOT_INTERVAL=50)
+    def test_lost_version_forces_snapshot(self):
+        """Test if the version after one lost in a crash keeps a snapshot, so later versions can be rebuilt."""
+        for number in range(1, 5):
+            with self.captureOnCommitCallbacks() as callbacks:
+                self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Line {number}'})
+            # The process dies before version 2 leaves the queue
+            if number != 2:
+                for callback in callbacks:
+                    callback()
+
+        versions = NoteVersion.objects.filter(note=self.note).order_by('number')
+        self.assertEqual([(version.number, version.snapshot is not None) for version in versions], [(1, True), (3, True), (4, False)])
+        self.assertEqual(materialize_version(self.note.pk, 4), 'Content\nLine 1\nLine 2\nLine 3\nLine 4')
+        with self.assertRaises(NoteVersion.DoesNotExist):
+            materialize_version(self.note.pk, 2)
+
+        response = self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changes'][0]['added'], ['Line 2', 'Line 3', 'Line 4'])
+        self.assertEqual(self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 2}).status_code, 404)
+
+    @override_settings(NOTE_VERSION_WRITE_BEHIND=True)
+    @mock.patch.object(VersionWriteBehind, '_start')
+    def test_queued_version_is_not_a_gap(self, start):
+        """Test if a version still waiting in the queue does not force a snapshot on the next one."""
+        writer = VersionWriteBehind(interval=3600, synchronous=False)
+        with mock.patch('backend.writebehind.version_writer', writer):
+            for number in range(1, 3):
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Line {number}'})
+            self.assertEqual(len(writer), 2)
+            writer.close()
+
+        versions = NoteVersion.objects.filter(note=self.note).order_by('number')
+        self.assertEqual([version.snapshot is not None for version in versions], [True, False])
+
+    @override_settings(NOTE_VERSION_WRITE_BEHIND=True)
+    @mock.patch.object(VersionWriteBehind, '_start')
+    def test_queued_version_keeps_update_time(self, start):
+        """Test if a version flushed later is timestamped with its update, not with the flush."""
+        writer = VersionWriteBehind(interval=3600, synchronous=False)
+        with mock.patch('backend.writebehind.version_writer', writer):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More'})
+            queued_until = timezone.now()
+            writer.close()
+
+        version = NoteVersion.objects.get(note=self.note)
+        self.assertLess(version.timestamp, queued_until)
+        self.assertEqual(version.timestamp, Note.objects.get(pk=self.note.pk).updated_at)
+
+    @override_settings(NOTE_VERSION_WRITE_BEHIND=True)
+    @mock.patch.object(VersionWriteBehind, '_start')
+    def test_written_version_is_not_queried(self, start):
+        """Test if the gap check of an update trusts the queue that wrote the previous version."""
+        writer = VersionWriteBehind(interval=3600, synchronous=False)
+        with mock.patch('backend.writebehind.version_writer', writer):
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'Line 1'})
+            writer.flush()
+
+            with CaptureQueriesContext(connections['default']) as queries:
+                with self.captureOnCommitCallbacks(execute=True):
+                    self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'Line 2'})
+            self.assertFalse([query for query in queries.captured_queries if 'backend_noteversion' in query['sql']])
+            writer.close()
+
+        versions = NoteVersion.objects.filter(note=self.note).order_by('number')
+        self.assertEqual([version.snapshot is not None for version in versions], [True, False])
+
+    @mock.patch.object(VersionWriteBehind, '_start')
+    def test_flush_drops_only_failing_versions(self, start):
+        """Test if a version that cannot be inserted does not take the rest of its batch with it."""
+        NoteVersion.objects.create(note=self.note, user=self.user, number=2, changes='Stored')
+        writer = VersionWriteBehind(interval=3600, synchronous=False)
+        for number in range(1, 4):
+            writer.add('default', NoteVersion(note=self.note, user=self.user, number=number, changes=f'Delta {number}'))
+
+        with self.assertLogs('backend.writebehind', 'ERROR'):
+            self.assertEqual(writer.flush(), 2)
+        self.assertEqual(
+            list(NoteVersion.objects.filter(note=self.note).order_by('number').values_list('changes', flat=True)),
+            ['Delta 1', 'Stored', 'Delta 3']
+        )
+        self.assertFalse(writer.is_pending('default', self.note.pk, 2))
+        self.assertTrue(writer.is_written('default', self.note.pk, 3))
+
+    @mock.patch.object(VersionWriteBehind, '_start')
+    def test_flush_on_size_and_close(self, start):
+        """Test if a full queue is flushed by the caller, in batches, and the rest on close."""
+        writer = VersionWriteBehind(batch_size=2, interval=3600, max_pending=3, synchronous=False)
+        versions = [
+            NoteVersion(note=self.note, user=self.user, number=number, changes=f'Delta {number}')
+            for number in range(1, 5)
+        ]
+        for version in versions[:2]:
+            writer.add('default', version)
+        self.assertEqual((len(writer), NoteVersion.objects.count()), (2, 0))
+
+        with self.assertNumQueries(6):  # Two batch inserts, each in its own transaction (a savepoint in tests)
+            writer.add('default', versions[2])
+        self.assertEqual((len(writer), NoteVersion.objects.count()), (0, 3))
+
+        writer.add('default', versions[3])
+        writer.close()
+        self.assertEqual(NoteVersion.objects.count(), 4)
+        self.assertTrue(start.called)
+
+@override_settings(NOTE_VERSION_SNAPSHOT_INTERVAL=3)
+class VersionCompactionTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        diff_cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content 0')
+
+        self.expected = {}
+        for number in range(1, 8):
+            self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Content {number}'})
+            self.expected[number] = materialize_version(self.note.pk, number)
+
+        # Versions 1-3 are from one old day, 4-5 from the next one, 6-7 are recent
+        now = timezone.now()
+        for numbers, age in (((1, 2, 3), 40), ((4, 5), 39)):
+            NoteVersion.objects.filter(note=self.note, number__in=numbers).update(
+                timestamp=now - timedelta(days=age)
+            )
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.archive_dir = directory.name
+
+    def compact(self, *args):
+        out = StringIO()
+        call_command('compact_versions', '--archive-dir', self.archive_dir, *args, stdout=out)
+        return out.getvalue()
+
+    def test_keeps_latest_version_of_each_old_day(self):
+        """Test if old versions are thinned to one per day and the kept ones still materialize."""
+        self.compact('--keep-days', '30', '--batch-size', '1', '--analyze')
+
+        numbers = list(NoteVersion.objects.filter(note=self.note).order_by('number').values_list('number', flat=True))
+        self.assertEqual(numbers, [3, 5, 6, 7])
+        for number in numbers:
+            self.assertEqual(materialize_version(self.note.pk, number), self.expected[number])
+        with self.assertRaises(NoteVersion.DoesNotExist):
+            materialize_version(self.note.pk, 2)
+
+    def test_pruned_versions_are_archived(self):
+        """Test if pruned versions are written to a gzipped NDJSON archive before deletion."""
+        self.compact()
+
+        [archive] = Path(self.archive_dir).glob('versions-*.ndjson.gz')
+        with gzip.open(archive, 'rt') as lines:
+            rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['number'] for row in rows], [1, 2, 4])
+        self.assertEqual({row['shard'] for row in rows}, {'default'})
+        self.assertEqual([row['changes'] for row in rows], ['Content 1', 'Content 2', 'Content 4'])
+
+    def test_dry_run_changes_nothing(self):
+        """Test if a dry run only reports the versions it would prune."""
+        output = self.compact('--dry-run')
+
+        self.assertIn('Would archive 3 versions of 1 notes', output)
+        self.assertEqual(NoteVersion.objects.filter(note=self.note).count(), 7)
+        self.assertEqual(list(Path(self.archive_dir).iterdir()), [])
+
+    def test_cached_history_and_diffs_invalidated(self):
+        """Test if compaction changes the history ETag and stops serving cached diffs of pruned versions."""
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/')
+        etag = response['ETag']
+        self.assertEqual(self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 3}).status_code, 200)
+
+        self.compact()
+
+        # The generation is stored with the note, so processes that do not share a cache see it too
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.history_generation, 1)
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([version['number'] for version in response.data['results']], [3, 5, 6, 7])
+        self.assertEqual(self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 3}).status_code, 404)
+        self.assertEqual(self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 3, 'to': 5}).status_code, 200)
+
+    def test_full_batch(self):
+        """Test if a batch of 100 notes with two old versions a day over 15 days is compacted in one go."""
+        notes = Note.objects.bulk_create([Note(user=self.user, title=f'Note {index}', content='Content') for index in range(100)])
+        versions = []
+        for note in notes:
+            content = note.content
+            for number in range(1, 31):
+                content = apply_deltas(content, [f'Line {number}'])
+                versions.append(NoteVersion(
+                    note=note, user=self.user, number=number, changes=f'Line {number}',
+                    snapshot=content if is_snapshot_number(number) else None
+                ))
+        NoteVersion.objects.bulk_create(versions)
+        now = timezone.now()
+        for day in range(15):
+            NoteVersion.objects.filter(note__in=notes, number__in=[2 * day + 1, 2 * day + 2]).update(
+                timestamp=now - timedelta(days=60 - day)
+            )
+
+        counts = compact_shard('default', now - timedelta(days=30), archive=BytesIO())
+        self.assertEqual(counts, {'notes': 101, 'archived': 1503, 'rebased': 1002})
+        numbers = list(NoteVersion.objects.filter(note=notes[-1]).order_by('number').values_list('number', flat=True))
+        self.assertEqual(numbers, list(range(2, 31, 2)))
+        for number in numbers:
+            self.assertEqual(materialize_version(notes[-1].pk, number), 'Content\n' + '\n'.join(f'Line {n}' for n in range(1, number + 1)))
+
+@override_settings(NOTE_VERSION_SNAPSHOT_INTERVAL=3)
+class NoteDiffTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        diff_cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.stranger = User.objects.create_user(username='stranger', password='password3')
+        self.note = Note.objects.create(user=self.owner, title='Test Note', content='Content')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+        self.client.force_authenticate(user=self.owner)
+        for number in range(1, 5):
+            self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Line {number}'})
+
+    def test_structured_diff(self):
+        """Test if the diff lists the lines added between two versions."""
+        response = self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 4})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['changes'], [{
+            'op': 'insert',
+            'from_lines': [2, 2],
+            'to_lines': [2, 5],
+            'removed': [],
+            'added': ['Line 2', 'Line 3', 'Line 4'],
+        }])
+
+    def test_unified_diff(self):
+        """Test if style=unified returns a unified diff and reversed versions remove lines."""
+        response = self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 3, 'to': 2, 'style': 'unified'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['diff'].splitlines()[:3], ['--- version 3', '+++ version 2', '@@ -1,4 +1,3 @@'])
+        self.assertIn('-Line 3', response.data['diff'])
+
+    def test_diff_is_cached(self):
+        """Test if a repeated diff only checks access."""
+        self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 3})
+        self.client.force_authenticate(user=self.reader)
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/notes/{self.note.pk}/diff/', {'from': 1, 'to': 3})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual((diff_cache.hits, diff_cache.misses), (1, 1))
+
+    def test_diff_cache_is_bounded(self):
+        """Test if the least recently used diff is evicted."""
+        limited = DiffCache(max_size=2)
+        for key in ('a', 'b', 'a', 'c'):
+            limited.set(key, [])
+        self.assertEqual((limited.get('a'), limited.get('b'), len(limited)), ([], None, 2))
+
+    def test_diff_access_and_errors(self):
+        """Test if strangers, unknown versions and bad parameters are rejected."""
+        url = f'/notes/{self.note.pk}/diff/'
+        self.assertEqual(self.client.get(url, {'from': 1, 'to': 9}).status_code, 404)
+        self.assertEqual(self.client.get(url, {'from': 1}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'from': 1, 'to': 2, 'style': 'side'}).status_code, 400)
+        self.assertEqual(self.client.get('/notes/999/diff/', {'from': 1, 'to': 2}).status_code, 404)
+
+        # A cached diff is not served to users without access
+        self.client.get(url, {'from': 1, 'to': 2})
+        self.client.force_authenticate(user=self.stranger)
+        self.assertEqual(self.client.get(url, {'from': 1, 'to': 2}).status_code, 403)
+
+class NoteVersionHistoryTestCase(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.client.force_authenticate(user=self.user)
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content 0')
+        for number in range(1, 6):
+            self.client.put(f'/notes/update/{self.note.pk}/', {'content': f'Content {number}'})
+        self.versions = list(NoteVersion.objects.filter(note=self.note).order_by('number'))
+
+    def test_history_pages_in_order(self):
+        """Test if walking the cursor returns every version once, oldest first."""
+        numbers = []
+        params = {'page_size': 2}
+        while True:
+            response = self.client.get(f'/notes/version-history/{self.note.pk}/', params)
+            self.assertEqual(response.status_code, 200)
+            numbers.extend(version['number'] for version in response.data['results'])
+            if response.data['next_cursor'] is None:
+                break
+            params['cursor'] = response.data['next_cursor']
+        self.assertEqual(numbers, [1, 2, 3, 4, 5])
+
+    def test_history_time_range(self):
+        """Test if since/until restrict the history to a time range."""
+        # Spread the versions one minute apart
+        for version in self.versions:
+            version.timestamp = self.versions[0].timestamp + timedelta(minutes=version.number)
+            version.save()
+
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/', {
+            'since': self.versions[1].timestamp.isoformat(),
+            'until': self.versions[3].timestamp.isoformat()
+        })
+        self.assertEqual([version['number'] for version in response.data['results']], [2, 3])
+
+    def test_history_invalid_time_range(self):
+        """Test if malformed datetimes are rejected."""
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/', {'since': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+
+    @override_settings(NOTE_HISTORY_STREAM_CHUNK_SIZE=2)
+    def test_history_ndjson_stream(self):
+        """Test if the NDJSON mode streams one version per line."""
+        response = self.client.get(
+            f'/notes/version-history/{self.note.pk}/',
+            HTTP_ACCEPT='application/x-ndjson'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+
+        lines = b''.join(response.streaming_content).splitlines()
+        rows = [json.loads(line) for line in lines]
+        self.assertEqual([row['number'] for row in rows], [1, 2, 3, 4, 5])
+        self.assertEqual(rows[0]['changes'], 'Content 1')
+
+    def test_history_renderers_follow_settings(self):
+        """Test if the history view reads the default renderers per request, not at import."""
+        response = self.client.get(f'/notes/version-history/{self.note.pk}/', {'format': 'api'})
+        self.assertEqual(response.status_code, 200)
+
+        with override_settings(REST_FRAMEWORK=settings_api.REST_FRAMEWORK):
+            response = self.client.get(f'/notes/version-history/{self.note.pk}/', {'format': 'api'})
+            self.assertEqual(response.status_code, 404)
+            response = self.client.get(f'/notes/version-history/{self.note.pk}/', {'format': 'ndjson'})
+            self.assertEqual(response.status_code, 200)
+
+class NoteSearchTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.stranger = User.objects.create_user(username='stranger', password='password3')
+        self.note = Note.objects.create(user=self.owner, title='Groceries', content='Buy apples and pears')
+        Note.objects.create(user=self.owner, title='Work', content='Quarterly report')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+
+    def search(self, user, text):
+        self.client.force_authenticate(user=user)
+        return self.client.get('/notes/search/', {'q': text})
+
+    def test_search_title_and_content(self):
+        """Test if notes are found by title and by content, with a snippet."""
+        response = self.search(self.owner, 'groceries')
+        self.assertEqual([note['id'] for note in response.data['results']], [self.note.pk])
+
+        response = self.search(self.owner, 'apples')
+        self.assertEqual(response.data['results'][0]['id'], self.note.pk)
+        self.assertIn('[apples]', response.data['results'][0]['snippet'])
+
+    def test_search_respects_access(self):
+        """Test if search only returns notes the user can access."""
+        self.assertEqual(len(self.search(self.reader, 'apples').data['results']), 1)
+        self.assertEqual(len(self.search(self.reader, 'report').data['results']), 0)
+        self.assertEqual(len(self.search(self.stranger, 'apples').data['results']), 0)
+
+    def test_search_index_follows_updates(self):
+        """Test if appended content becomes searchable and deleted notes disappear."""
+        self.client.force_authenticate(user=self.reader)
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'and bananas'})
+        self.assertEqual(len(self.search(self.owner, 'bananas').data['results']), 1)
+
+        self.note.delete()
+        self.assertEqual(len(self.search(self.owner, 'bananas').data['results']), 0)
+
+    def test_search_terms_across_appends(self):
+        """Test if every term must appear in a note, whether in its content or in appended text."""
+        self.client.force_authenticate(user=self.owner)
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'and bananas'})
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'and cherries'})
+
+        response = self.search(self.owner, 'pears bananas cherries')
+        self.assertEqual([note['id'] for note in response.data['results']], [self.note.pk])
+        self.assertEqual(len(self.search(self.owner, 'bananas report').data['results']), 0)
+
+        # Rebuilding merges the appended segments back into the note's own
+        call_command('rebuild_search_index', stdout=StringIO())
+        response = self.search(self.owner, 'pears cherries')
+        self.assertEqual([note['id'] for note in response.data['results']], [self.note.pk])
+
+    def test_search_query_syntax_is_literal(self):
+        """Test if FTS5 operators in the query do not cause errors."""
+        response = self.search(self.owner, 'apples" OR (')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.search(self.owner, '').status_code, 400)
+
+    def test_rebuild_search_index(self):
+        """Test if the management command rebuilds the index from the notes table."""
+        call_command('rebuild_search_index', stdout=StringIO())
+        self.assertEqual(len(self.search(self.owner, 'report').data['results']), 1)
+
+class BulkShareTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.recipients = [
+            User.objects.create_user(username=f'recipient{i}', password='password2')
+            for i in range(3)
+        ]
+        self.notes = [
+            Note.objects.create(user=self.owner, title=f'Note {i}', content='Content')
+            for i in range(2)
+        ]
+        self.client.force_authenticate(user=self.owner)
+
+    def test_share_many_notes_with_many_users(self):
+        """Test if every note is shared with every known user, reporting unknown usernames."""
+        response = self.client.post('/notes/share/', {
+            'note_ids': [note.pk for note in self.notes],
+            'usernames': ['recipient0', 'recipient1', 'recipient2', 'ghost']
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['unknown_usernames'], ['ghost'])
+        self.assertEqual(SharedNoteUser.objects.count(), 6)
+
+    def test_share_skips_existing_pairs(self):
+        """Test if sharing twice does not duplicate shares."""
+        SharedNoteUser.objects.create(note=self.notes[0], user=self.recipients[0])
+        for _ in range(2):
+            response = self.client.post('/notes/share/', {
+                'note_id': self.notes[0].pk,
+                'usernames': ['recipient0', 'recipient1']
+            }, format='json')
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(SharedNoteUser.objects.filter(note=self.notes[0]).count(), 2)
+
+    def test_share_form_encoded_usernames(self):
+        """Test if comma-separated form usernames are accepted."""
+        response = self.client.post('/notes/share/', {
+            'note_id': self.notes[0].pk,
+            'usernames': 'recipient0,recipient1'
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(SharedNoteUser.objects.filter(note=self.notes[0]).count(), 2)
+
+    def test_share_queries_do_not_grow_with_recipients(self):
+        """Test if sharing uses a constant number of queries."""
+        with self.assertNumQueries(5):
+            self.client.post('/notes/share/', {
+                'note_ids': [note.pk for note in self.notes],
+                'usernames': ['recipient0', 'recipient1', 'recipient2']
+            }, format='json')
+
+    def test_share_requires_ownership_of_every_note(self):
+        """Test if nothing is shared when one of the notes belongs to someone else."""
+        foreign = Note.objects.create(user=self.recipients[0], title='Foreign', content='Content')
+        response = self.client.post('/notes/share/', {
+            'note_ids': [self.notes[0].pk, foreign.pk],
+            'usernames': ['recipient1']
+        }, format='json')
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(SharedNoteUser.objects.exists())
+
+class NoteBatchTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.stranger = User.objects.create_user(username='stranger', password='password3')
+        self.note = Note.objects.create(user=self.owner, title='Test Note', content='Content')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+
+    def test_batch_create(self):
+        """Test if valid notes are created and invalid ones are reported individually."""
+        self.client.force_authenticate(user=self.owner)
+        response = self.client.post('/notes/batch/create/', [
+            {'title': 'First', 'content': 'Content 1'},
+            {'title': 'Second'},
+            {'title': 'Third', 'content': 'Content 3'},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [201, 400, 201])
+        self.assertIn('content', results[1]['errors'])
+        self.assertEqual(Note.objects.get(pk=results[2]['id']).title, 'Third')
+        self.assertEqual(Note.objects.filter(user=self.owner).count(), 3)
+
+    def test_batch_create_queries_do_not_grow(self):
+        """Test if the number of queries does not depend on the batch size."""
+        self.client.force_authenticate(user=self.owner)
+        for size in (2, 20):
+            with self.assertNumQueries(5):
+                self.client.post('/notes/batch/create/', [
+                    {'title': f'Note {i}', 'content': 'Content'} for i in range(size)
+                ], format='json')
+
+    def test_batch_update(self):
+        """Test if updates append content, create versions and report failures individually."""
+        foreign = Note.objects.create(user=self.stranger, title='Foreign', content='Content')
+        self.client.force_authenticate(user=self.reader)
+        response = self.client.put('/notes/batch/update/', {'notes': [
+            {'id': self.note.pk, 'content': 'More 1'},
+            {'id': foreign.pk, 'content': 'More'},
+            {'id': self.note.pk + 100, 'content': 'More'},
+            {'id': self.note.pk},
+            {'id': self.note.pk, 'content': 'More 2'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results], [200, 403, 404, 400, 200])
+        self.assertEqual([results[0]['version'], results[4]['version']], [1, 2])
+
+        self.note.refresh_from_db()
+        self.assertEqual(self.note.content, 'Content\nMore 1\nMore 2')
+        self.assertEqual(materialize_version(self.note.pk, 1), 'Content\nMore 1')
+        self.assertEqual(NoteVersion.objects.filter(note=foreign).count(), 0)
+
+    @override_settings(NOTE_VERSION_SNAPSHOT_INTERVAL=2)
+    def test_batch_update_snapshots_within_batch(self):
+        """Test if a note appended to several times in one batch gets the snapshots of its own versions."""
+        self.client.force_authenticate(user=self.owner)
+        self.client.put('/notes/batch/update/', [
+            {'id': self.note.pk, 'content': f'More {number}'} for number in range(1, 5)
+        ], format='json')
+
+        versions = NoteVersion.objects.filter(note=self.note).order_by('number')
+        self.assertEqual(
+            [(version.number, version.snapshot) for version in versions],
+            [(1, 'Content\nMore 1'), (2, None), (3, 'Content\nMore 1\nMore 2\nMore 3'), (4, None)]
+        )
+        self.assertEqual(materialize_version(self.note.pk, 4), 'Content\nMore 1\nMore 2\nMore 3\nMore 4')
+
+    def test_batch_update_queries_do_not_grow(self):
+        """Test if the number of queries of a batch update does not depend on the batch size."""
+        notes = Note.objects.bulk_create([
+            Note(user=self.owner, title=f'Note {i}', content='Content') for i in range(20)
+        ])
+        self.client.force_authenticate(user=self.owner)
+        for size in (2, 20):
+            # Access check, UPDATE, version and content reads, version insert, index and share lookup
+            with self.assertNumQueries(9):
+                response = self.client.put('/notes/batch/update/', [
+                    {'id': note.pk, 'content': f'More {size}'} for note in notes[:size]
+                ], format='json')
+            self.assertEqual([result['status'] for result in response.data['results']], [200] * size)
+
+        self.assertEqual(NoteVersion.objects.filter(note__in=notes).count(), 22)
+        self.assertEqual(materialize_version(notes[1].pk, 2), 'Content\nMore 2\nMore 20')
+
+    def test_batch_requires_list(self):
+        """Test if a body that is not a list of notes is rejected."""
+        self.client.force_authenticate(user=self.owner)
+        self.assertEqual(self.client.post('/notes/batch/create/', {'title': 'x'}, format='json').status_code, 400)
+        self.assertEqual(self.client.put('/notes/batch/update/', [], format='json').status_code, 400)
+
+class NoteExportImportTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.client.force_authenticate(user=self.owner)
+        for index in range(3):
+            self.client.post('/notes/create/', {'title': f'Note {index}', 'content': f'Content {index}'})
+        self.notes = list(Note.objects.filter(user=self.owner).order_by('pk'))
+        for number in range(1, 3):
+            self.client.put(f'/notes/update/{self.notes[0].pk}/', {'content': f'Line {number}'})
+        SharedNoteUser.objects.create(note=self.notes[1], user=self.reader)
+
+    def export(self, url='/notes/export/'):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_ndjson(self):
+        """Test if the export streams each note followed, per chunk, by its versions and shares."""
+        response, body = self.export()
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        records = [json.loads(line) for line in body.splitlines()]
+
+        self.assertEqual([record['type'] for record in records], ['note'] * 3 + ['version'] * 2 + ['share'])
+        self.assertEqual(records[0]['content'], 'Content 0\nLine 1\nLine 2')
+        self.assertEqual(records[0]['version'], 2)
+        self.assertEqual(
+            [(record['note'], record['number'], record['user']) for record in records[3:5]],
+            [(self.notes[0].pk, 1, 'owner'), (self.notes[0].pk, 2, 'owner')]
+        )
+        self.assertEqual(records[5], {'type': 'share', 'note': self.notes[1].pk, 'user': 'reader'})
+
+    def test_export_in_chunks(self):
+        """Test if small chunks yield the same records, interleaved per chunk."""
+        records = list(export_records(self.owner, chunk_size=1))
+        self.assertEqual([record['type'] for record in records], ['note', 'version', 'version', 'note', 'share', 'note'])
+
+    def test_export_zip(self):
+        """Test if the zip export holds the NDJSON export."""
+        _, ndjson = self.export()
+        response, body = self.export('/notes/export/?format=zip')
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        self.assertIn('notes.zip', response['Content-Disposition'])
+        with zipfile.ZipFile(BytesIO(body)) as archive:
+            self.assertEqual(archive.read('notes.ndjson'), ndjson)
+
+    def test_export_requires_authentication(self):
+        """Test if anonymous users cannot export."""
+        self.client.force_authenticate(user=None)
+        self.assertIn(self.client.get('/notes/export/').status_code, (401, 403))
+
+    def test_import_round_trip(self):
+        """Test if an imported export recreates the notes, their history and their shares."""
+        _, body = self.export('/notes/export/?format=zip')
+        importer = User.objects.create_user(username='importer', password='password3')
+        with tempfile.NamedTemporaryFile(suffix='.zip') as export:
+            export.write(body)
+            export.flush()
+            call_command('import_notes', export.name, '--user', 'importer', '--batch-size', '2', stdout=StringIO())
+
+        exported = Note.objects.filter(user=self.owner).order_by('pk')
+        imported = list(Note.objects.filter(user=importer).order_by('pk'))
+        self.assertEqual(
+            [(note.title, note.content, note.version, note.created_at, note.updated_at) for note in imported],
+            [(note.title, note.content, note.version, note.created_at, note.updated_at) for note in exported]
+        )
+        self.assertEqual(materialize_version(imported[0].pk, 2), 'Content 0\nLine 1\nLine 2')
+        self.assertEqual(NoteVersion.objects.get(note=imported[0], number=1).user, self.owner)
+        self.assertTrue(SharedNoteUser.objects.filter(note=imported[1], user=self.reader).exists())
+        self.client.force_authenticate(user=importer)
+        results = self.client.get('/notes/search/', {'q': 'Line'}).data['results']
+        self.assertEqual([result['id'] for result in results], [imported[0].pk])
+
+    def test_import_rejects_orphan_records(self):
+        """Test if versions of notes missing from the import are reported."""
+        with self.assertRaises(ValueError):
+            import_records(self.reader, [{'type': 'share', 'note': 999, 'user': 'owner'}])
+
+class NoteConsumerTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.owner = User.objects.create_user(username='owner', password='password1')
+        self.reader = User.objects.create_user(username='reader', password='password2')
+        self.note = Note.objects.create(user=self.owner, title='Test Note', content='Content')
+        self.private_note = Note.objects.create(user=self.owner, title='Private', content='Content')
+        SharedNoteUser.objects.create(note=self.note, user=self.reader)
+        self.application = TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+
+    async def connect(self, user):
+        token = await database_sync_to_async(Token.objects.create)(user=user)
+        communicator = WebsocketCommunicator(self.application, f'/ws/notes/?token={token.key}')
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+        return communicator
+
+    def request(self, user, method, *args, **kwargs):
+        # Run the view and the on_commit publishing it schedules
+        self.client.force_authenticate(user=user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return getattr(self.client, method)(*args, **kwargs)
+
+    async def test_anonymous_connection_rejected(self):
+        """Test if connections without a valid token are closed."""
+        communicator = WebsocketCommunicator(self.application, '/ws/notes/?token=invalid')
+        connected, code = await communicator.connect()
+        self.assertFalse(connected)
+        self.assertEqual(code, 4001)
+
+    async def test_subscribe_only_accessible_notes(self):
+        """Test if subscriptions are limited to the notes the user can access."""
+        communicator = await self.connect(self.reader)
+        await communicator.send_json_to({'action': 'subscribe', 'note_ids': [self.note.pk, self.private_note.pk]})
+        self.assertEqual(await communicator.receive_json_from(), {'type': 'subscribed', 'note_ids': [self.note.pk]})
+        await communicator.disconnect()
+
+    async def test_update_pushes_change(self):
+        """Test if updating a note pushes the delta and version to its subscribers."""
+        communicator = await self.connect(self.reader)
+        await communicator.send_json_to({'action': 'subscribe', 'note_ids': [self.note.pk]})
+        await communicator.receive_json_from()
+
+        await database_sync_to_async(self.request)(
+            self.owner, 'put', f'/notes/update/{self.note.pk}/', {'content': 'More'}
+        )
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'note.changed',
+            'note_id': self.note.pk,
+            'version': 1,
+            'delta': 'More',
+            'user': 'owner',
+        })
+        await communicator.disconnect()
+
+    async def test_share_notifies_recipients(self):
+        """Test if sharing a note notifies the recipients."""
+        communicator = await self.connect(self.reader)
+        await database_sync_to_async(self.request)(
+            self.owner, 'post', '/notes/share/',
+            {'note_id': self.private_note.pk, 'usernames': ['reader']}, format='json'
+        )
+        self.assertEqual(await communicator.receive_json_from(), {
+            'type': 'note.shared',
+            'note_ids': [self.private_note.pk],
+            'user': 'owner',
+        })
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.token = Token.objects.create(user=self.user)
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def get_note(self):
+        return self.client.get(f'/notes/{self.note.pk}/')
+
+    def test_cached_token_skips_auth_query(self):
+        """Test if only the first request pays for the token lookup."""
+        with self.assertNumQueries(2):
+            self.assertEqual(self.get_note().status_code, 200)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.get_note().status_code, 200)
+
+    def test_deleted_token_rejected(self):
+        """Test if deleting a token invalidates it immediately."""
+        self.get_note()
+        self.token.delete()
+        self.assertEqual(self.get_note().status_code, 401)
+
+    def test_deactivated_user_rejected(self):
+        """Test if deactivating a user invalidates their cached tokens."""
+        self.get_note()
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.get_note().status_code, 401)
+
+    @override_settings(TOKEN_AUTH_CACHE_TTL=60)
+    def test_token_cache_expiry_and_eviction(self):
+        """Test if cached entries expire after the TTL and the LRU stays bounded."""
+        lru = TokenCache(max_size=2)
+        lru.set('a', (self.user, self.token))
+        lru.set('b', (self.user, self.token))
+        lru.get('a')
+        lru.set('c', (self.user, self.token))
+        self.assertIsNone(lru.get('b'))
+        self.assertIsNotNone(lru.get('a'))
+
+        with mock.patch('backend.authentication.time.monotonic', return_value=10 ** 9):
+            self.assertIsNone(lru.get('a'))
+        self.assertEqual(len(lru), 1)
+
+class FastResponseTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def test_note_responses_format_timestamps(self):
+        """Test if note responses keep their fields and timestamp format."""
+        response = self.client.get(f'/notes/{self.note.pk}/')
+        self.assertEqual(response.json(), {
+            'title': 'Test Note',
+            'content': 'Content',
+            'created_at': self.note.created_at.strftime('%Y-%m-%d, %H:%M UTC'),
+            'updated_at': self.note.updated_at.strftime('%Y-%m-%d, %H:%M UTC'),
+            'version': 0,
+        })
+
+        response = self.client.post('/notes/create/', {'title': 'Second', 'content': 'Content'})
+        note = Note.objects.get(pk=response.json()['id'])
+        self.assertEqual(response.json()['created_at'], format_timestamp(note.created_at))
+
+    def test_fast_renderer_matches_json_renderer(self):
+        """Test if the fast renderer produces the same JSON as the REST framework renderer."""
+        data = {
+            'title': 'Test Note',
+            'timestamp': self.note.created_at,
+            'amount': Decimal('1.50'),
+            'items': [1, None, True],
+        }
+        self.assertEqual(
+            json.loads(FastJSONRenderer().render(data)),
+            json.loads(JSONRenderer().render(data))
+        )
+
+class ConditionalGetTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.stranger = User.objects.create_user(username='stranger', password='password2')
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def test_get_note_not_modified(self):
+        """Test if a matching If-None-Match gets a 304 from a single metadata query."""
+        response = self.client.get(f'/notes/{self.note.pk}/')
+        etag = response['ETag']
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/notes/{self.note.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(f'/notes/{self.note.pk}/', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_get_note_modified_after_update(self):
+        """Test if the ETag changes once the note is updated."""
+        etag = self.client.get(f'/notes/{self.note.pk}/')['ETag']
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More'})
+        response = self.client.get(f'/notes/{self.note.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_version_history_not_modified(self):
+        """Test if the version history supports conditional GET, per query string."""
+        self.client.put(f'/notes/update/{self.note.pk}/', {'content': 'More'})
+        etag = self.client.get(f'/notes/version-history/{self.note.pk}/')['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/notes/version-history/{self.note.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        response = self.client.get(
+            f'/notes/version-history/{self.note.pk}/', {'page_size': 1}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, 200)
+
+    def test_conditional_get_checks_access_first(self):
+        """Test if users without access get a 403 even with a matching ETag."""
+        etag = self.client.get(f'/notes/{self.note.pk}/')['ETag']
+        self.client.force_authenticate(user=self.stranger)
+        response = self.client.get(f'/notes/{self.note.pk}/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 403)
+
+class PerformanceMetricsTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        for histogram in REGISTRY:
+            histogram.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+    def test_server_timing_header(self):
+        """Test if responses report their wall time, database time and query count."""
+        response = self.client.get(f'/notes/{self.note.pk}/')
+        self.assertRegex(response['Server-Timing'], r'^app;dur=[\d.]+, db;dur=[\d.]+;desc="1 queries"$')
+
+    def test_metrics_by_route_name(self):
+        """Test if /metrics exposes histograms labelled with the route names."""
+        self.client.get(f'/notes/{self.note.pk}/')
+        self.client.get(f'/notes/{self.note.pk}/')
+        self.client.get('/does-not-exist/')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        body = response.content.decode()
+        self.assertIn('# TYPE neofi_request_duration_seconds histogram', body)
+        self.assertIn('neofi_request_duration_seconds_count{view="get_note",method="GET"} 2', body)
+        self.assertIn('neofi_request_db_queries_sum{view="get_note",method="GET"} 2.0', body)
+        self.assertIn('neofi_request_db_queries_bucket{view="get_note",method="GET",le="1"} 2', body)
+        self.assertIn('neofi_response_size_bytes_count{view="get_note",method="GET"} 2', body)
+        self.assertIn('neofi_request_duration_seconds_count{view="unmatched",method="GET"} 1', body)
+
+@override_settings(
+    SQLITE_PRAGMAS=settings_production.SQLITE_PRAGMAS,
+    SQLITE_IMMEDIATE_TRANSACTIONS=settings_production.SQLITE_IMMEDIATE_TRANSACTIONS
+)
+class SQLiteProductionModeTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+
+    def test_pragmas_applied_to_new_connections(self):
+        """Test if every new connection gets WAL journaling, the tuned pragmas and immediate transactions."""
+        db = _sqlite_workload_connection(Path(self.directory.name) / 'db.sqlite3', {})
+        with db.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        self.assertIn(begin_immediate, db.execute_wrappers)
+        db.close()
+
+        self.assertEqual(pragmas, {
+            'journal_mode': 'wal',
+            'synchronous': 1,  # NORMAL
+            'busy_timeout': 5000,
+            'cache_size': -64000,
+            'mmap_size': 268435456,
+        })
+
+    def test_read_only_connection(self):
+        """Test if a read-only handle on the database skips the pragmas that write to the file."""
+        path = Path(self.directory.name) / 'db.sqlite3'
+        primary = _sqlite_workload_connection(path, {})
+        with primary.cursor() as cursor:
+            cursor.execute('CREATE TABLE note (id INTEGER PRIMARY KEY)')
+        replica = _sqlite_workload_connection(f'file:{path}?mode=ro', {})
+        with replica.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+        self.assertNotIn(begin_immediate, replica.execute_wrappers)
+        replica.close()
+        primary.close()
+
+    def test_production_profile_reuses_connections(self):
+        """Test if the production profile keeps checked connections open across requests."""
+        for database in settings_production.DATABASES.values():
+            self.assertGreater(database['CONN_MAX_AGE'], 0)
+            self.assertTrue(database['CONN_HEALTH_CHECKS'])
+        self.assertIsNot(settings_production.DATABASES['default'], settings.DATABASES['default'])
+
+    def test_asgi_profile_closes_connections(self):
+        """Test if the ASGI profile closes connections after each request."""
+        for database in settings_asgi.DATABASES.values():
+            self.assertEqual(database['CONN_MAX_AGE'], 0)
+        self.assertGreater(settings_production.DATABASES['default']['CONN_MAX_AGE'], 0)
+
+    def test_concurrent_reads_and_writes(self):
+        """Test if concurrent read-then-write transactions all succeed in production mode."""
+        results = run_sqlite_concurrency(
+            Path(self.directory.name) / 'db.sqlite3',
+            options=settings_production.DATABASES['default']['OPTIONS'],
+            writers=4, readers=4, operations=25
+        )
+        self.assertEqual(results['journal_mode'], 'wal')
+        self.assertEqual((results['writes'], results['write_errors']), (100, 0))
+        self.assertEqual((results['reads'], results['read_errors']), (100, 0))
+
+    def test_concurrent_writes_over_shards(self):
+        """Test if the workload spreads its writers over one file per shard."""
+        results = run_sqlite_concurrency(
+            Path(self.directory.name) / 'db.sqlite3',
+            options=settings_production.DATABASES['default']['OPTIONS'],
+            writers=4, readers=0, operations=10, shards=2
+        )
+        self.assertEqual((results['writes'], results['write_errors']), (40, 0))
+        self.assertTrue((Path(self.directory.name) / 'db.shard1.sqlite3').exists())
+
+class APIOnlySettingsTestCase(APITestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='testuser1', password='password1')
+
+    def test_profile_drops_unused_components(self):
+        """Test if the API-only profile loads no admin, sessions, messages, static files or templates."""
+        for app in ('admin', 'sessions', 'messages', 'staticfiles'):
+            self.assertNotIn(f'django.contrib.{app}', settings_api.INSTALLED_APPS)
+        self.assertFalse(any('session' in name or 'csrf' in name or 'messages' in name for name in settings_api.MIDDLEWARE))
+        self.assertEqual(settings_api.TEMPLATES, [])
+        self.assertEqual(settings_api.REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'], ['backend.renderers.FastJSONRenderer'])
+
+    def test_signin_skips_session(self):
+        """Test if token sign-in writes no session with the API-only profile, and one by default."""
+        credentials = {'username': 'testuser1', 'password': 'password1'}
+        with override_settings(MIDDLEWARE=settings_api.MIDDLEWARE, SIGNIN_SESSION_LOGIN=False):
+            response = self.client.post('/login/', credentials)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['token'], Token.objects.get(user=self.user).key)
+        self.assertFalse(Session.objects.exists())
+
+        # A new client loads the default middleware again
+        self.client_class().post('/login/', credentials)
+        self.assertEqual(Session.objects.count(), 1)
+
+    def test_request_overhead_measurement(self):
+        """Test if the overhead scenarios run and leave no data behind."""
+        results = measure_request_overhead(requests=2)
+        self.assertEqual(
+            {name: result['status'] for name, result in results.items()},
+            {'login/': {'200': 2}, 'notes/list/ (cached)': {'404': 2}, 'notes/list/ (anonymous)': {'401': 2}}
+        )
+        self.assertEqual(User.objects.count(), 1)
+
+    def test_startup_comparison(self):
+        """Test if the API-only profile starts in a fresh interpreter with fewer modules than the default settings."""
+        results = run_settings_comparison(
+            profiles=['neofi_api.settings', 'neofi_api.settings_api'], startup_runs=1, requests=0
+        )
+        self.assertLess(results['neofi_api.settings_api']['modules'], results['neofi_api.settings']['modules'])
+        self.assertGreater(results['neofi_api.settings_api']['startup_ms']['median'], 0)
+
+class PrimaryReplicaRouterTestCase(SimpleTestCase):
+    def setUp(self):
+        self.router = PrimaryReplicaRouter()
+        self.middleware = ReadYourWritesMiddleware(self.view)
+        self.reads = []
+        # Tests run against a mirror of the primary, which the router would not use
+        self.replica = mock.patch.object(PrimaryReplicaRouter, 'replica_alias', return_value='replica')
+        self.replica.start()
+        self.addCleanup(mock.patch.stopall)
+
+    def view(self, request):
+        self.reads.append(self.router.db_for_read(Note))
+        if request.method == 'POST':
+            self.router.db_for_write(Note)
+            self.reads.append(self.router.db_for_read(Note))
+        return HttpResponse()
+
+    def test_reads_and_writes(self):
+        """Test if reads go to the replica and writes to the primary."""
+        self.middleware(RequestFactory().get('/'))
+        self.assertEqual(self.reads, ['replica'])
+        self.assertEqual(self.router.db_for_write(Note), 'default')
+        self.assertFalse(self.router.allow_migrate('replica', 'backend'))
+        self.assertTrue(self.router.allow_migrate('default', 'backend'))
+
+    def test_read_your_writes(self):
+        """Test if reads after a write use the primary until the end of the request only."""
+        self.middleware(RequestFactory().post('/'))
+        self.assertEqual(self.reads, ['replica', 'default'])
+        self.assertFalse(is_pinned())
+
+        self.middleware(RequestFactory().get('/'))
+        self.assertEqual(self.reads, ['replica', 'default', 'replica'])
+
+    def test_reads_in_transaction(self):
+        """Test if reads inside a transaction on the primary stay on the primary."""
+        with mock.patch.object(connections['default'], 'in_atomic_block', True):
+            self.assertEqual(self.router.db_for_read(Note), 'default')
+
+    def test_test_mirror(self):
+        """Test if a replica mirroring the primary's database is not used."""
+        self.replica.stop()
+        self.assertIsNone(self.router.replica_alias())
+        self.middleware(RequestFactory().get('/'))
+        self.assertEqual(self.reads, ['default'])
+
+class ReplicaReadsTestCase(APITransactionTestCase):
+    databases = {'default', 'replica'}
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='owner', password='password1')
+        self.note = Note.objects.create(user=self.user, title='Test Note', content='Content')
+        self.client.force_authenticate(user=self.user)
+
+        # The test mirror is its own connection to the primary's database: make it read-only
+        # and let the router use it, so requests really read through a second connection
+        self.replica = connections['replica']
+        with self.replica.cursor() as cursor:
+            cursor.execute('PRAGMA query_only = ON')
+        self.addCleanup(self.replica.close)
+        patcher = mock.patch.object(PrimaryReplicaRouter, 'replica_alias', return_value='replica')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reads_use_replica(self):
+        """Test if a read-only request is served from the replica connection."""
+        with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(self.replica) as replica:
+            response = self.client.get(f'/notes/{self.note.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['content'], 'Content')
+        self.assertTrue(replica.captured_queries)
+        self.assertFalse(primary.captured_queries)
+
+    def test_read_your_writes(self):
+        """Test if reads after a write come from the primary, and the next request sees the write through the replica."""
+        def view(request):
+            note = Note.objects.create(user=self.user, title='Second', content='New content')
+            return HttpResponse(Note.objects.get(pk=note.pk).content)
+
+        with CaptureQueriesContext(self.replica) as replica:
+            response = ReadYourWritesMiddleware(view)(RequestFactory().post('/'))
+        self.assertEqual(response.content, b'New content')
+        self.assertFalse(replica.captured_queries)
+        self.assertFalse(is_pinned())
+
+        note_id = Note.objects.using('default').get(title='Second').pk
+        with CaptureQueriesContext(self.replica) as replica:
+            response = self.client.get(f'/notes/{note_id}/')
+        self.assertEqual(response.data['content'], 'New content')
+        self.assertTrue(replica.captured_queries)
+
+@override_settings(NOTE_SHARDS=['default', 'shard1'])
+class NoteShardingTestCase(APITestCase):
+    databases = {'default', 'shard1'}
+
+    def setUp(self):
+        cache.clear()
+        get_directory_cache().clear()
+        token_cache.clear()
+        # Place the users explicitly rather than by hash, so each test knows where notes go
+        self.alice = User.objects.create_user(username='alice', password='password1')
+        self.bob = User.objects.create_user(username='bob', password='password2')
+        self.carol = User.objects.create_user(username='carol', password='password3')
+        UserShard.objects.create(user=self.alice, alias='shard1')
+        UserShard.objects.create(user=self.bob, alias='default')
+        UserShard.objects.create(user=self.carol, alias='shard1')
+
+    def create_note(self, user, title, content='Content'):
+        self.client.force_authenticate(user=user)
+        response = self.client.post('/notes/create/', {'title': title, 'content': content})
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def share(self, owner, note_id, *usernames):
+        self.client.force_authenticate(user=owner)
+        response = self.client.post('/notes/share/', {'note_id': note_id, 'usernames': list(usernames)}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    def test_notes_stored_on_owner_shard(self):
+        """Test if notes go to their owner's shard with IDs unique across shards."""
+        alice_note = self.create_note(self.alice, 'Alice')
+        bob_note = self.create_note(self.bob, 'Bob')
+
+        self.assertNotEqual(alice_note, bob_note)
+        self.assertTrue(Note.objects.using('shard1').filter(pk=alice_note).exists())
+        self.assertFalse(Note.objects.using('default').filter(pk=alice_note).exists())
+        self.assertTrue(Note.objects.using('default').filter(pk=bob_note).exists())
+        self.assertEqual(shard_for_note(alice_note), 'shard1')
+        self.assertEqual(NoteOwner.objects.get(pk=alice_note).user_id, self.alice.pk)
+
+    def test_shared_shards_recorded_for_cross_shard_shares_only(self):
+        """Test if only shares with users on another shard make their listings fan out."""
+        note_id = self.create_note(self.alice, 'Alice')
+        self.share(self.alice, note_id, 'bob', 'carol')
+
+        self.assertEqual(SharedNoteUser.objects.using('shard1').filter(note_id=note_id).count(), 2)
+        self.assertEqual(list(SharedShard.objects.values_list('user__username', 'alias')), [('bob', 'shard1')])
+        self.assertEqual(user_shards(self.bob.pk), ['default', 'shard1'])
+        self.assertEqual(user_shards(self.carol.pk), ['shard1'])
+
+    def test_cross_shard_share(self):
+        """Test if a note shared from another shard can be listed, read, updated, searched and its history read."""
+        shared_id = self.create_note(self.alice, 'Shared plans', 'Shared content')
+        own_id = self.create_note(self.bob, 'Own plans', 'Own content')
+        self.share(self.alice, shared_id, 'bob')
+
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.get('/notes/list/')
+        self.assertEqual([note['id'] for note in response.data['results']], [own_id, shared_id])
+
+        self.assertEqual(self.client.get(f'/notes/{shared_id}/').data['title'], 'Shared plans')
+        response = self.client.put(f'/notes/update/{shared_id}/', {'content': 'More'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(NoteVersion.objects.using('shard1').filter(note_id=shared_id).count(), 1)
+
+        response = self.client.get(f'/notes/version-history/{shared_id}/')
+        self.assertEqual([version['number'] for version in response.data['results']], [1])
+        self.assertEqual(response.data['results'][0]['user__username'], 'bob')
+
+        response = self.client.get('/notes/search/', {'q': 'plans'})
+        self.assertEqual({note['id'] for note in response.data['results']}, {own_id, shared_id})
+
+        # The owner's other users see nothing of it
+        self.client.force_authenticate(user=self.carol)
+        self.assertEqual(self.client.get(f'/notes/{shared_id}/').status_code, 403)
+
+    def test_batch_update_across_shards(self):
+        """Test if a batch update writes each note on its own shard."""
+        shared_id = self.create_note(self.alice, 'Alice')
+        own_id = self.create_note(self.bob, 'Bob')
+        self.share(self.alice, shared_id, 'bob')
+
+        self.client.force_authenticate(user=self.bob)
+        response = self.client.put('/notes/batch/update/', {'notes': [
+            {'id': shared_id, 'content': 'More'},
+            {'id': own_id, 'content': 'More'},
+        ]}, format='json')
+        self.assertEqual([result['status'] for result in response.data['results']], [200, 200])
+        self.assertEqual(Note.objects.using('shard1').get(pk=shared_id).content, 'Content\nMore')
+        self.assertEqual(Note.objects.using('default').get(pk=own_id).content, 'Content\nMore')
+
+    def test_rebalance_moves_user(self):
+        """Test if rebalancing moves a user's notes, versions and shares while the API keeps serving them."""
+        note_id = self.create_note(self.alice, 'Alice')
+        self.client.put(f'/notes/update/{note_id}/', {'content': 'More'})
+        self.share(self.alice, note_id, 'carol')
+
+        call_command('rebalance_shards', user='alice', to='default', stdout=StringIO(), stderr=StringIO())
+
+        self.assertFalse(Note.objects.using('shard1').filter(pk=note_id).exists())
+        self.assertEqual(shard_for_note(note_id), 'default')
+        self.assertEqual(NoteVersion.objects.using('default').filter(note_id=note_id).count(), 1)
+        self.assertEqual(user_shards(self.carol.pk), ['shard1', 'default'])
+
+        self.client.force_authenticate(user=self.carol)
+        self.assertEqual(self.client.get(f'/notes/{note_id}/').data['content'], 'Content\nMore')
+        response = self.client.get('/notes/list/')
+        self.assertEqual([note['id'] for note in response.data['results']], [note_id])
+
+    def test_move_user_in_pages(self):
+        """Test if moving a user reads their notes a page at a time."""
+        note_ids = [self.create_note(self.alice, f'Alice {index}') for index in range(5)]
+
+        with CaptureQueriesContext(connections['shard1']) as queries:
+            self.assertEqual(move_user(self.alice.pk, 'default', batch_size=2), 5)
+
+        note_reads = [
+            query['sql'] for query in queries.captured_queries
+            if query['sql'].startswith('SELECT') and '"backend_note"."content"' in query['sql']
+        ]
+        self.assertEqual(len(note_reads), 4)
+        self.assertTrue(all('LIMIT 2' in sql for sql in note_reads))
+        self.assertEqual(
+            list(Note.objects.using('default').filter(user=self.alice).values_list('id', flat=True).order_by('id')),
+            note_ids
+        )
+        self.assertFalse(Note.objects.using('shard1').filter(user=self.alice).exists())
+
+    def test_allocation_requires_synced_directory(self):
+        """Test if note IDs are not allocated while stored notes are missing from the directory."""
+        # A note created while sharding was off has no directory entry
+        Note.objects.using('default').create(id=1000, title='Old', content='Content', user=self.bob)
+
+        with mock.patch('backend.sharding._checked_directories', set()):
+            with self.assertRaises(ImproperlyConfigured):
+                self.create_note(self.bob, 'New')
+            sync_directory()
+            self.assertGreater(self.create_note(self.bob, 'New'), 1000)
+
+    def test_migration_backfills_directory(self):
+        """Test if the directory migration records the notes already stored on the default database."""
+        migration = importlib.import_module('backend.migrations.0011_backfill_note_directory')
+        dave = User.objects.create_user(username='dave', password='password4')
+        Note.objects.using('default').create(id=1000, title='Old', content='Content', user=dave)
+
+        migration.backfill_note_directory(apps, mock.Mock(connection=connections['default']))
+        self.assertEqual(NoteOwner.objects.get(pk=1000).user_id, dave.pk)
+        self.assertEqual(shard_for_note(1000), 'default')
+
+    @override_settings(NOTE_SHARD_CACHE_TIMEOUT=60)
+    def test_directory_cache_expires(self):
+        """Test if a placement changed by another process is picked up once the cached one expires."""
+        self.assertEqual(shard_for_user(self.alice.pk), 'shard1')
+        # Another process moved alice: its cache was updated, not this one
+        UserShard.objects.filter(user=self.alice).update(alias='default')
+        self.assertEqual(shard_for_user(self.alice.pk), 'shard1')
+
+        with mock.patch('time.time', return_value=time.time() + 61):
+            self.assertEqual(shard_for_user(self.alice.pk), 'default')
+        # The directory is not in the note-list cache, where pages could evict it
+        self.assertNotIn(USER_SHARD_KEY.format(user_id=self.alice.pk), cache)
+
+class BenchmarkCommandsTestCase(TestCase):
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        call_command(
+            'seed_data', users=3, notes=4, shares=1, versions=3, prefix='seed', stdout=StringIO()
+        )
+
+    def test_seed_data_scale(self):
+        """Test if seeding creates the requested numbers of users, notes, shares and versions."""
+        self.assertEqual(User.objects.filter(username__startswith='seed').count(), 3)
+        self.assertEqual(Token.objects.count(), 3)
+        self.assertEqual(Note.objects.count(), 12)
+        self.assertEqual(SharedNoteUser.objects.count(), 12)
+        self.assertEqual(NoteVersion.objects.count(), 36)
+
+        note = Note.objects.first()
+        self.assertEqual(materialize_version(note.pk, 3), note.content)
+
+    def test_benchmark_covers_every_route(self):
+        """Test if the benchmark runs every route and writes its results as JSON."""
+        with tempfile.NamedTemporaryFile(suffix='.json') as output:
+            call_command(
+                'benchmark', requests=2, prefix='seed', password='benchmark',
+                output=output.name, stdout=StringIO()
+            )
+            results = json.load(open(output.name))
+
+        self.assertEqual(set(results['routes']), {str(pattern.pattern) for pattern in urlpatterns})
+        for route, result in results['routes'].items():
+            self.assertEqual(result['requests'], 2)
+            self.assertTrue(all(code.startswith('2') for code in result['status_codes']), route)
+            self.assertLessEqual(result['latency_ms']['p50'], result['latency_ms']['p99'])
@@ -0,0 +1,274 @@
+import json
+import zipfile
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.utils.dateparse import parse_datetime
+from .cache import invalidate_note_lists
+from .models import Note, NoteVersion, SharedNoteUser
+from .renderers import ndjson_lines
+from .search import index_notes
+from .sharding import allocate_note_ids, record_shared_shards, shard_for_user, sharded
+
+# Name of the NDJSON file inside zip exports
+EXPORT_MEMBER = 'notes.ndjson'
+
+
+def export_records(user, chunk_size=None):
+    """
+    Yield the notes owned by a user, with their versions and shares, as export records.
+
+    Notes are read `chunk_size` at a time in ID order, and each chunk's notes are followed
+    by their versions and shares, so memory use does not grow with the number of notes.
+    Records are dicts with a `type` of `note`, `version` or `share`; versions and shares
+    refer to their note by its exported `id` and to users by username.
+
+    Args:
+        user (User): The owner of the notes.
+        chunk_size (int): Number of notes read per query; defaults to `NOTE_EXPORT_CHUNK_SIZE`.
+
+    Yields:
+        dict: The records.
+    """
+    chunk_size = chunk_size or settings.NOTE_EXPORT_CHUNK_SIZE
+    shard = shard_for_user(user.pk)
+    notes = sharded(Note, shard).filter(user_id=user.pk).order_by('pk')
+    last_id = 0
+    while True:
+        chunk = list(
+            notes.filter(pk__gt=last_id).values('id', 'title', 'content', 'created_at', 'updated_at', 'version')[:chunk_size]
+        )
+        if not chunk:
+            return
+        last_id = chunk[-1]['id']
+        note_ids = [note['id'] for note in chunk]
+        for note in chunk:
+            yield {'type': 'note', **note}
+
+        # Users live on the default database: resolve the chunk's authors and recipients at once
+        versions = sharded(NoteVersion, shard).filter(note_id__in=note_ids)
+        shares = list(sharded(SharedNoteUser, shard).filter(note_id__in=note_ids).order_by('pk').values_list('note_id', 'user_id'))
+        user_ids = {*versions.values_list('user_id', flat=True).distinct(), *(user_id for _, user_id in shares)}
+        usernames = dict(User.objects.filter(pk__in=user_ids).values_list('id', 'username'))
+
+        rows = versions.order_by('note_id', 'number').values('note_id', 'number', 'timestamp', 'user_id', 'changes', 'snapshot')
+        for row in rows.iterator(chunk_size=chunk_size):
+            yield {
+                'type': 'version',
+                'note': row['note_id'],
+                'number': row['number'],
+                'timestamp': row['timestamp'],
+                'user': usernames.get(row['user_id']),
+                'changes': row['changes'],
+                'snapshot': row['snapshot'],
+            }
+        for note_id, user_id in shares:
+            yield {'type': 'share', 'note': note_id, 'user': usernames.get(user_id)}
+
+
+class _StreamBuffer:
+    """
+    Write-only file object collecting what `zipfile` writes, so it can be streamed out.
+
+    It has no `tell` or `seek`, so `zipfile` writes entries with data descriptors instead
+    of seeking back to patch their headers.
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def zip_stream(lines, name=EXPORT_MEMBER):
+    """
+    Compress lines into a zip archive holding a single file, as they are produced.
+
+    Args:
+        lines (iterable): The file's content, as bytes.
+        name (str): Name of the file in the archive.
+
+    Yields:
+        bytes: The archive, piece by piece.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        # The size is unknown up front: allow the file to exceed 4 GiB
+        with archive.open(name, 'w', force_zip64=True) as member:
+            for line in lines:
+                member.write(line)
+                data = buffer.drain()
+                if data:
+                    yield data
+    yield buffer.drain()
+
+
+def export_stream(user, format='ndjson'):
+    """
+    Encode a user's export records as NDJSON, or as a zip archive of that NDJSON.
+
+    Args:
+        user (User): The owner of the notes.
+        format (str): `ndjson` or `zip`.
+
+    Returns:
+        iterator: The export, as bytes.
+    """
+    lines = ndjson_lines(export_records(user))
+    return zip_stream(lines) if format == 'zip' else lines
+
+
+def read_records(file):
+    """
+    Read the records of an export, as NDJSON or as a zip archive (told apart by its header).
+
+    Args:
+        file (file): Seekable binary file holding the export.
+
+    Yields:
+        dict: The records, in order.
+    """
+    zipped = file.read(4) == b'PK\x03\x04'
+    file.seek(0)
+    if zipped:
+        with zipfile.ZipFile(file) as archive, archive.open(EXPORT_MEMBER) as member:
+            yield from _parse_lines(member)
+    else:
+        yield from _parse_lines(file)
+
+
+def _parse_lines(lines):
+    for line in lines:
+        if line.strip():
+            yield json.loads(line)
+
+
+def import_records(user, records, batch_size=None):
+    """
+    Create notes owned by a user, with their versions and shares, from export records.
+
+    Records are inserted `batch_size` at a time with `bulk_create`, each batch in its own
+    transaction on the user's shard. Notes get new IDs; their timestamps, version counter
+    and versions are kept. Versions by users that do not exist here are attributed to
+    `user`, and shares with unknown users (or with `user`) are skipped. Only the mapping
+    from exported to new note IDs is kept across batches.
+
+    Args:
+        user (User): The owner of the imported notes.
+        records (iterable): Records as produced by `export_records`, notes before their versions and shares.
+        batch_size (int): Number of records per transaction; defaults to `NOTE_IMPORT_BATCH_SIZE`.
+
+    Returns:
+        dict: The number of notes, versions and shares created.
+
+    Raises:
+        ValueError: If a record has an unknown type or refers to a note not imported before it.
+            Batches committed before it are kept.
+    """
+    batch_size = batch_size or settings.NOTE_IMPORT_BATCH_SIZE
+    shard = shard_for_user(user.pk, place=True)
+    note_ids = {}
+    recipient_ids = set()
+    counts = {'notes': 0, 'versions': 0, 'shares': 0}
+
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            _import_batch(user, shard, batch, note_ids, recipient_ids, counts)
+            batch = []
+    if batch:
+        _import_batch(user, shard, batch, note_ids, recipient_ids, counts)
+
+    if counts['notes'] or recipient_ids:
+        invalidate_note_lists([user.pk, *recipient_ids])
+    return counts
+
+
+def _import_batch(user, shard, records, note_ids, recipient_ids, counts):
+    grouped = {'note': [], 'version': [], 'share': []}
+    for record in records:
+        if record.get('type') not in grouped:
+            raise ValueError(f"Unknown record type: {record.get('type')!r}")
+        grouped[record['type']].append(record)
+
+    usernames = {record['user'] for record in grouped['version'] + grouped['share']}
+    users = dict(User.objects.filter(username__in=usernames).values_list('username', 'id'))
+
+    new_ids = allocate_note_ids(user.pk, len(grouped['note']))
+    with transaction.atomic(using=shard):
+        notes = [
+            Note(id=new_id, user=user, title=record['title'], content=record['content'], version=record['version'])
+            for new_id, record in zip(new_ids, grouped['note'])
+        ]
+        # bulk_create applies auto_now(_add); restore the exported timestamps after
+        sharded(Note, shard).bulk_create(notes)
+        for note, record in zip(notes, grouped['note']):
+            note_ids[record['id']] = note.pk
+            note.created_at = parse_datetime(record['created_at'])
+            note.updated_at = parse_datetime(record['updated_at'])
+        _restore_timestamps(shard, notes, ['created_at', 'updated_at'])
+        index_notes(notes, using=shard)
+
+        versions = [
+            NoteVersion(
+                note_id=_new_note_id(note_ids, record),
+                user_id=users.get(record['user'], user.pk),
+                number=record['number'],
+                changes=record['changes'],
+                snapshot=record['snapshot'],
+            )
+            for record in grouped['version']
+        ]
+        sharded(NoteVersion, shard).bulk_create(versions)
+        for version, record in zip(versions, grouped['version']):
+            version.timestamp = parse_datetime(record['timestamp'])
+        _restore_timestamps(shard, versions, ['timestamp'])
+
+        shares = [
+            SharedNoteUser(note_id=_new_note_id(note_ids, record), user_id=users[record['user']])
+            for record in grouped['share']
+            if users.get(record['user']) not in (None, user.pk)
+        ]
+        sharded(SharedNoteUser, shard).bulk_create(shares, ignore_conflicts=True)
+
+    batch_recipients = {share.user_id for share in shares}
+    record_shared_shards(shard, batch_recipients)
+    recipient_ids.update(batch_recipients)
+    counts['notes'] += len(notes)
+    counts['versions'] += len(versions)
+    counts['shares'] += len(shares)
+
+
+def _restore_timestamps(alias, objs, fields):
+    # One executemany UPDATE: bulk_update's CASE expressions cost more than the inserts at this size
+    if not objs:
+        return
+    connection = connections[alias]
+    meta = objs[0]._meta
+    assignments = ', '.join(f'{connection.ops.quote_name(meta.get_field(field).column)} = %s' for field in fields)
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'UPDATE {connection.ops.quote_name(meta.db_table)} SET {assignments} WHERE id = %s',
+            [
+                [*(connection.ops.adapt_datetimefield_value(getattr(obj, field)) for field in fields), obj.pk]
+                for obj in objs
+            ]
+        )
+
+
+def _new_note_id(note_ids, record):
+    try:
+        return note_ids[record['note']]
+    except KeyError:
+        raise ValueError(f"{record['type'].capitalize()} of note {record['note']} comes before the note")
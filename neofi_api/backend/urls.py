@@ -1,5 +1,5 @@
 from django.urls import path
-from .views import signup, signin, create_note, list_notes,get_note, share_note, update_note, get_note_version_history
+from .views import signup, signin, create_note, list_notes,get_note, share_note, update_note, get_note_version_history, get_note_version, search, batch_create_note, batch_update_note, export_notes, get_note_diff
 
 urlpatterns = [
     path(
@@ -9,30 +9,67 @@ urlpatterns = [
         ),
     path(
             route = 'login/',
-            view = signin
+            view = signin,
+            name = 'signin'
         ),
     path(
             route = 'notes/create/', 
-            view= create_note
+            view= create_note,
+            name = 'create_note'
+        ),
+    path(
+            route = 'notes/batch/create/', 
+            view= batch_create_note,
+            name = 'batch_create_note'
+        ),
+    path(
+            route = 'notes/batch/update/', 
+            view= batch_update_note,
+            name = 'batch_update_note'
         ),
     path(
             route = 'notes/list/', 
-            view = list_notes
+            view = list_notes,
+            name = 'list_notes'
         ),
     path(
             route = 'notes/<int:id>/', 
-            view = get_note
+            view = get_note,
+            name = 'get_note'
+        ),
+    path(
+            route = 'notes/<int:id>/diff/', 
+            view = get_note_diff,
+            name = 'get_note_diff'
+        ),
+    path(
+            route = 'notes/search/', 
+            view = search,
+            name = 'search'
+        ),
+    path(
+            route = 'notes/export/', 
+            view = export_notes,
+            name = 'export_notes'
         ),
     path(
             route = 'notes/share/', 
-            view = share_note
+            view = share_note,
+            name = 'share_note'
         ),
     path(
             route = 'notes/version-history/<int:id>/', 
-            view= get_note_version_history
+            view= get_note_version_history,
+            name = 'get_note_version_history'
+        ),
+    path(
+            route = 'notes/version-history/<int:id>/<int:number>/', 
+            view= get_note_version,
+            name = 'get_note_version'
         ),
     path(
         route='notes/update/<int:id>/',  # Define the route for update_note with <int:id> parameter
-        view=update_note  # Assign the update_note view to the defined route
+        view=update_note,  # Assign the update_note view to the defined route
+        name='update_note'  # Route name, also used as the metrics label
     )
 ]
\ No newline at end of file
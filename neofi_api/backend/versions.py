@@ -0,0 +1,252 @@
+from django.conf import settings
+from django.db import router
+from django.db.models import Case, F, Func, PositiveIntegerField, Value, When
+from django.utils import timezone
+from .fields import CompressedTextField
+from .models import Note, NoteVersion
+from .search import index_appends
+from .sharding import shard_for_note, sharded
+from .writebehind import previous_versions_missing, save_versions
+
+# Separator placed between the existing note content and each appended delta
+DELTA_SEPARATOR = "\n"
+
+
+class VersionConflict(Exception):
+    """
+    Raised when a note is no longer at the version a write was based on.
+
+    Args:
+        current_version (int): The note's current version.
+    """
+
+    def __init__(self, current_version):
+        super().__init__(f"Note is at version {current_version}")
+        self.current_version = current_version
+
+
+def is_snapshot_number(number, interval=None):
+    """
+    Tell whether the version with the given number stores a full snapshot.
+
+    Snapshots are kept for versions 1, K + 1, 2K + 1, ... where K is
+    `NOTE_VERSION_SNAPSHOT_INTERVAL`, so every version has a snapshot at most K - 1 versions before it.
+
+    Args:
+        number (int): The version number, starting at 1.
+        interval (int): Snapshot interval; defaults to `NOTE_VERSION_SNAPSHOT_INTERVAL`.
+
+    Returns:
+        bool: True if the version stores a snapshot.
+    """
+    interval = interval or settings.NOTE_VERSION_SNAPSHOT_INTERVAL
+    return (number - 1) % interval == 0
+
+
+def apply_deltas(content, deltas):
+    """
+    Rebuild note content by appending deltas in order.
+
+    Args:
+        content (str): The content to start from.
+        deltas (iterable): The appended texts, oldest first.
+
+    Returns:
+        str: The resulting content.
+    """
+    return content + "".join(DELTA_SEPARATOR + delta for delta in deltas)
+
+
+def build_version(note, user, number, changes):
+    """
+    Build an unsaved version of a note whose content has just been updated.
+
+    The version keeps only the appended text as its delta, plus a snapshot of the
+    full note content when its number falls on the snapshot interval.
+
+    Args:
+        note (Note): The note, with its content already updated.
+        user (User): The user who made the change.
+        number (int): The version number.
+        changes (str): The text appended to the note.
+
+    Returns:
+        NoteVersion: The unsaved version.
+    """
+    return NoteVersion(
+        note=note,
+        user=user,
+        number=number,
+        changes=changes,
+        snapshot=note.content if is_snapshot_number(number) else None
+    )
+
+
+def append_to_note(note, user, changes, expected_versions=None):
+    """
+    Append text to a note inside the database and store the new version.
+
+    A single-note `append_to_notes`: see it for how the append is written.
+
+    With `expected_versions`, the UPDATE only matches the note at one of those versions, so a
+    write based on a stale copy fails without locking the row between the client's read and its write.
+
+    Call this inside a transaction on the note's shard.
+
+    Args:
+        note (Note): The note; only its `id` and `user_id` need to be loaded. Its
+            `updated_at` and `version` are set to those of the change.
+        user (User): The user who made the change.
+        changes (str): The text appended to the note.
+        expected_versions (list): Versions the change may be based on; None appends to any version.
+
+    Returns:
+        NoteVersion: The created version.
+
+    Raises:
+        VersionConflict: If the note is at none of `expected_versions`.
+    """
+    shard = router.db_for_write(Note, instance=note)
+    [version] = append_to_notes(shard, user, [(note, changes)], expected_versions)
+    return version
+
+
+def append_to_notes(shard, user, appends, expected_versions=None):
+    """
+    Append text to notes of one shard inside the database and store the new versions.
+
+    The contents are extended by a single UPDATE appending each note's deltas and incrementing
+    its version counter, so the existing contents are neither read nor written back by the
+    application, and concurrent appends cannot overwrite each other. The versions are then
+    inserted with one `bulk_create` and the notes reindexed together, so the number of
+    queries does not depend on the number of appends. Contents are only read for versions
+    that keep a snapshot: once every `NOTE_VERSION_SNAPSHOT_INTERVAL` versions, and after a
+    version lost by the write-behind queue (see `previous_versions_missing`).
+
+    Apart from snapshots, an append costs time proportional to its delta, not to the size of
+    the note: `neofi_append_text` compresses the delta alone onto a compressed content (see
+    `backend.fields.append_text`), and `index_appends` indexes it as a segment of its own.
+
+    Call this inside a transaction on the shard.
+
+    Args:
+        shard (str): Alias of the shard holding the notes.
+        user (User): The user who made the changes.
+        appends (list): `(note, changes)` pairs, in order. A note appearing several times gets
+            consecutive versions. Only the notes' `id` and `user_id` need to be loaded; their
+            `updated_at` and `version` are set to those of their last change.
+        expected_versions (list): Versions every note must be at; None appends to any version.
+
+    Returns:
+        list: The created versions, one per append, in order.
+
+    Raises:
+        VersionConflict: If a note is at none of `expected_versions`.
+    """
+    deltas = {}
+    for note, changes in appends:
+        deltas.setdefault(note.pk, []).append(changes)
+
+    notes = sharded(Note, shard).filter(pk__in=deltas)
+    updated_at = timezone.now()
+    target = notes if expected_versions is None else notes.filter(version__in=expected_versions)
+    # Appending first takes the write lock, so the counters read below are these appends' versions
+    updated = target.update(
+        # neofi_append_text appends to plain and compressed contents alike (see backend.fields.append_text)
+        content=Case(*[
+            When(pk=note_id, then=Func(
+                F('content'), Value(apply_deltas('', note_deltas)),
+                function='neofi_append_text', output_field=CompressedTextField()
+            ))
+            for note_id, note_deltas in deltas.items()
+        ], output_field=CompressedTextField()),
+        updated_at=updated_at,
+        version=Case(*[
+            When(pk=note_id, then=F('version') + len(note_deltas))
+            for note_id, note_deltas in deltas.items()
+        ], output_field=PositiveIntegerField())
+    )
+    current = dict(notes.values_list('id', 'version'))
+    if updated != len(deltas):
+        raise VersionConflict(current[next(iter(deltas))])
+
+    # Number of each note's first new version
+    first = {note_id: current[note_id] - len(note_deltas) + 1 for note_id, note_deltas in deltas.items()}
+    # After a lost version, a snapshot lets the versions from this one on be rebuilt
+    missing = previous_versions_missing(first, shard)
+    snapshots = {
+        note_id for note_id in deltas
+        if note_id in missing or any(is_snapshot_number(number) for number in range(first[note_id], current[note_id] + 1))
+    }
+    contents = dict(sharded(Note, shard).filter(pk__in=snapshots).values_list('id', 'content')) if snapshots else {}
+
+    versions = []
+    positions = {}
+    for note, changes in appends:
+        note.updated_at = updated_at
+        note.version = current[note.pk]
+        position = positions.get(note.pk, 0)
+        positions[note.pk] = position + 1
+        number = first[note.pk] + position
+        snapshot = None
+        if is_snapshot_number(number) or (position == 0 and note.pk in missing):
+            # The content after this version is the current one without the later deltas
+            later = len(apply_deltas('', deltas[note.pk][position + 1:]))
+            snapshot = contents[note.pk][:len(contents[note.pk]) - later]
+        versions.append(NoteVersion(
+            note=note,
+            user=user,
+            number=number,
+            # Timestamped with the update, even when write-behind inserts it later
+            timestamp=updated_at,
+            changes=changes,
+            snapshot=snapshot
+        ))
+
+    # Inserted now, or queued until the transaction commits with NOTE_VERSION_WRITE_BEHIND
+    save_versions(versions, shard)
+    # update() skips the save signals, so index the appended texts here
+    index_appends([(version.note_id, version.number, version.changes) for version in versions], using=shard)
+    return versions
+
+
+def materialize_version(note_id, number, shard=None):
+    """
+    Rebuild the full content of a note as it was right after the given version.
+
+    Reads the closest snapshot at or before the version and replays at most
+    `NOTE_VERSION_SNAPSHOT_INTERVAL - 1` deltas, so the cost does not depend on the total
+    number of versions.
+
+    Args:
+        note_id (int): ID of the note.
+        number (int): The version number to materialize.
+        shard (str): Alias of the shard holding the note; looked up when omitted.
+
+    Returns:
+        str: The note content at that version.
+
+    Raises:
+        NoteVersion.DoesNotExist: If the version does not exist.
+    """
+    versions = sharded(NoteVersion, shard or shard_for_note(note_id))
+    base = (
+        versions
+        .filter(note_id=note_id, number__lte=number, snapshot__isnull=False)
+        .order_by('-number')
+        .values('number', 'snapshot')
+        .first()
+    )
+    if base is None:
+        raise NoteVersion.DoesNotExist("Version does not exist")
+
+    deltas = list(
+        versions
+        .filter(note_id=note_id, number__gt=base['number'], number__lte=number)
+        .order_by('number')
+        .values_list('changes', flat=True)
+    )
+    if base['number'] + len(deltas) != number:
+        raise NoteVersion.DoesNotExist("Version does not exist")
+
+    return apply_deltas(base['snapshot'], deltas)
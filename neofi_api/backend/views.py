@@ -1,14 +1,29 @@
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, renderer_classes
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.authtoken.models import Token
 from rest_framework import status
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
-from django.core.exceptions import ValidationError
-from .models import Note, NoteVersion, SharedNoteUser
-from .serializers import UserSerializer, NoteSerializer
-from datetime import datetime
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.db import DEFAULT_DB_ALIAS, router, transaction
+from django.http import StreamingHttpResponse
+from .models import Note, NoteVersion
+from .serializers import UserSerializer, NoteSerializer, format_timestamp
+from .pagination import get_datetime_param, get_page_size, keyset_page, merge_keyset_pages
+from .renderers import DefaultRenderersWith, NDJSONRenderer, ZipRenderer, ndjson_lines
+from .access import accessible_notes, get_accessible_note, get_accessible_note_values
+from .cache import get_note_list_page, invalidate_note_lists
+from .versions import VersionConflict, append_to_note, materialize_version
+from .search import search_notes
+from .sharing import get_list_param, share_notes
+from .batch import batch_create_notes, batch_update_notes
+from .transfer import export_stream
+from .diff import DIFF_STYLES, diff_versions
+from .conditional import get_if_match_versions, get_validators, is_conditional, not_modified_response, set_validators, version_etag
+from .events import publish_note_changes, publish_note_shares
+from .sharding import allocate_note_ids, attach_usernames, shard_for_note, sharded, user_shards
 
 @api_view(['POST'])
 def signup(request):
@@ -84,7 +99,9 @@ def signin(request):
     )
 
     if user is not None:
-        login(request, user)
+        # API clients only use the token; skip the session write when sessions are not used
+        if settings.SIGNIN_SESSION_LOGIN:
+            login(request, user)
         token, _ = Token.objects.get_or_create(user=user)
 
         return Response(
@@ -123,19 +140,17 @@ def create_note(request):
     )
 
     if serializer.is_valid():
-        serializer.save(user=user)
+        # The note ID comes from the note directory when notes are sharded
+        note = serializer.save(user=user, id=allocate_note_ids(user.pk, 1)[0])
+        invalidate_note_lists([user.pk])
         
-        # Format and return response data
-        utc_timestamp = serializer.data['created_at']
-        utc_datetime = datetime.strptime(utc_timestamp, '%Y-%m-%dT%H:%M:%S.%fZ')
-        formatted_local_time = utc_datetime.strftime('%Y-%m-%d, %H:%M UTC')
-
+        # Format and return response data straight from the saved instance
         return Response(
             data={
                 "message": "Note created successfully!",
-                "id": serializer.data['id'],
-                "title": serializer.data['title'],
-                "created_at": formatted_local_time
+                "id": note.id,
+                "title": note.title,
+                "created_at": format_timestamp(note.created_at)
             },
             status=status.HTTP_201_CREATED
         )
@@ -149,10 +164,10 @@ def create_note(request):
 @permission_classes([IsAuthenticated])
 def list_notes(request):
     """
-    View to list all notes accessible to the authenticated user.
+    View to list all notes accessible to the authenticated user, one keyset page at a time.
 
     Params:
-    - request: HTTP request object.
+    - request: HTTP request object. Accepts optional `cursor` and `page_size` query parameters.
 
     Returns:
     - Response: HTTP response containing list of notes or appropriate error message.
@@ -160,36 +175,46 @@ def list_notes(request):
     try:
         user = request.user
 
-        # Get all notes created by the authenticated user
-        user_notes = Note.objects.filter(user=user)
-
-        # Get all notes shared with the authenticated user
-        shared_note_ids = SharedNoteUser.objects.filter(user=user).values_list('note_id', flat=True)
-
-        # Combine user's own notes and shared notes
-        all_notes = user_notes | Note.objects.filter(pk__in=shared_note_ids)
+        cursor = request.query_params.get('cursor')
+        page_size = get_page_size(request)
+
+        def fetch_page():
+            # Fetch a single keyset page ordered by (updated_at, id) from the user's own shard,
+            # and from the shards of notes shared with the user from elsewhere, if any
+            pages = [
+                keyset_page(
+                    # Combine user's own notes and shared notes, without loading the note bodies
+                    queryset=accessible_notes(user, shard).values('id', 'title', 'updated_at'),
+                    cursor=cursor,
+                    page_size=page_size,
+                    field='updated_at'
+                )
+                for shard in user_shards(user.pk)
+            ]
+            notes, next_cursor = merge_keyset_pages(pages, page_size, 'updated_at')
+            return [{'id': note['id'], 'title': note['title']} for note in notes], next_cursor
+
+        # Serve the page from the per-user cache when possible
+        notes_data, next_cursor = get_note_list_page(user.pk, cursor, page_size, fetch_page)
 
         # If no notes are found, return an empty list
-        if not all_notes:
+        if not notes_data and not cursor:
             return Response(
                 data={'message': 'No notes found'},
                 status=status.HTTP_404_NOT_FOUND
             )
 
-        # Serialize the notes data
-        serializer = NoteSerializer(all_notes, many=True)
-
-        # Extract id and title fields from each note
-        notes_data = [{'id': note.id, 'title': note.title} for note in all_notes]
-
         return Response(
-            data=notes_data,
+            data={
+                'results': notes_data,
+                'next_cursor': next_cursor
+            },
             status=status.HTTP_200_OK
         )
-    except Note.DoesNotExist:
+    except ValidationError as e:
         return Response(
-            data={'error': 'No notes found for the user'},
-            status=status.HTTP_404_NOT_FOUND
+            data={'error': e.messages[0]},
+            status=status.HTTP_400_BAD_REQUEST
         )
     except Exception as e:
         return Response(
@@ -203,43 +228,53 @@ def get_note(request, id):
     View to retrieve a specific note by its ID.
 
     Params:
-    - request: HTTP request object.
+    - request: HTTP request object. Supports `If-None-Match` and `If-Modified-Since`.
     - id: ID of the note to retrieve.
 
     Returns:
-    - Response: HTTP response containing the requested note's details or an error message.
+    - Response: HTTP response containing the requested note's details, a 304 if the client's copy
+      is current, or an error message.
     """
     try:
-        note = Note.objects.get(pk=id)
-
-        if note.user == request.user or SharedNoteUser.objects.filter(note=note, user=request.user).exists():
-            serializer = NoteSerializer(note)
-
-            # Parse the UTC timestamp from serializer.data['created_at']
-            created_datetime = datetime.strptime(serializer.data['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-            updated_datetime = datetime.strptime(serializer.data['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-
-            # Format local time as "year-month-day hours:minutes"
-            frmt_created = created_datetime.strftime('%Y-%m-%d, %H:%M UTC')
-            frmt_updated = updated_datetime.strftime('%Y-%m-%d, %H:%M UTC')
-        
-            return Response(
-                data={
-                    'title': serializer.data['title'],
-                    'content': serializer.data['content'],
-                    'created_at': frmt_created,
-                    'updated_at': frmt_updated
-                },
+        if is_conditional(request):
+            # Check the validators with a metadata query that skips the content column
+            metadata = get_accessible_note_values(request.user, id, ['updated_at'], with_latest_version=True)
+            etag, last_modified = get_validators(request, id, metadata)
+            not_modified = not_modified_response(request, etag, last_modified)
+            if not_modified is not None:
+                return not_modified
+
+        # Read the note row and check owner/shared access in a single query
+        note = get_accessible_note_values(
+            request.user, id, ['title', 'content', 'created_at', 'updated_at', 'version'], with_latest_version=True
+        )
+        etag, last_modified = get_validators(request, id, note)
+
+        # Format timestamps as "year-month-day, hours:minutes UTC"
+        response_data = {
+            'title': note['title'],
+            'content': note['content'],
+            'created_at': format_timestamp(note['created_at']),
+            'updated_at': format_timestamp(note['updated_at']),
+            # The version to send in If-Match when updating the note
+            'version': note['version']
+        }
+    
+        return set_validators(
+            Response(
+                data=response_data,
                 status=status.HTTP_200_OK
-            )
-        
-        else:
-            return Response(
-                data={
-                    'error': 'Unauthorized access'
-                },
-                status=status.HTTP_403_FORBIDDEN
-            )
+            ),
+            etag,
+            last_modified
+        )
+    except PermissionDenied:
+        return Response(
+            data={
+                'error': 'Unauthorized access'
+            },
+            status=status.HTTP_403_FORBIDDEN
+        )
     except Note.DoesNotExist:
         return Response(
             data={
@@ -252,27 +287,32 @@ def get_note(request, id):
 @permission_classes([IsAuthenticated])
 def share_note(request):
     """
-    View to share a note with other users.
+    View to share one or more notes with other users.
 
     Params:
-    - request: HTTP request object containing note ID and list of usernames to share with.
+    - request: HTTP request object containing a note ID (`note_id`) or a list of note IDs (`note_ids`),
+      and the list of usernames to share with.
 
     Returns:
-    - Response: HTTP response indicating success or failure of note sharing.
+    - Response: HTTP response indicating success or failure of note sharing, and the unknown usernames.
     """
     try:
-        note_id = request.data.get('note_id')
-        username_list = request.data.get('usernames')
+        note_ids = get_list_param(request.data, 'note_ids') or get_list_param(request.data, 'note_id')
+        username_list = get_list_param(request.data, 'usernames')
         
-        # Ensure note_id is provided and valid
-        if not note_id:
+        # Ensure note IDs are provided and valid
+        if not note_ids:
             return Response(
                 data={'error': 'Note ID is required'}, 
                 status=status.HTTP_400_BAD_REQUEST
             )
-        
-        # Ensure the note exists and the authenticated user has access to it
-        note = Note.objects.get(pk=note_id, user=request.user)
+        try:
+            note_ids = [int(note_id) for note_id in note_ids]
+        except (TypeError, ValueError):
+            return Response(
+                data={'error': 'Note IDs must be integers'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
         
         # Ensure usernames list is provided and not empty
         if not username_list:
@@ -281,15 +321,18 @@ def share_note(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Get users to share with
-        users_to_share_with = User.objects.filter(username__in=username_list)
-        
-        # Share the note with each user
-        for user in users_to_share_with:
-            shared_user, created = SharedNoteUser.objects.get_or_create(note=note, user=user)
+        # Share every note with every known user in one bulk insert
+        recipient_ids, unknown_usernames = share_notes(request.user, note_ids, username_list)
+
+        # The notes now appear in the recipients' lists
+        invalidate_note_lists(recipient_ids)
+        publish_note_shares(note_ids, recipient_ids, request.user)
         
         return Response(
-            data={'message': 'Note shared successfully'}, 
+            data={
+                'message': 'Note shared successfully',
+                'unknown_usernames': unknown_usernames
+            }, 
             status=status.HTTP_200_OK
         )
     except Note.DoesNotExist:
@@ -307,52 +350,74 @@ def share_note(request):
 @permission_classes([IsAuthenticated])
 def update_note(request, id):
     """
-    View to update a note's content.
+    View to append content to a note.
 
     Params:
-    - request: HTTP request object containing updated note content.
+    - request: HTTP request object containing the `content` to append to the note. An optional
+      `If-Match` header with the note version the change is based on (e.g. `"3"`) makes the
+      update fail with 412 if another update came first.
     - id: ID of the note to update.
 
     Returns:
-    - Response: HTTP response indicating success or failure of note update.
+    - Response: HTTP response with the new version's ID, number and delta, or an error message.
     """
     try:
-        note = Note.objects.get(pk=id)
-        # Check if the user is the note owner or a shared user
-        if note.user == request.user or SharedNoteUser.objects.filter(note=note, user=request.user).exists():
-            # Save current note version with timestamp
-            NoteVersion.objects.create(note=note, user=request.user, changes=request.data.get('content'))
-            # Update note content
-            new_content = request.data.get('content')
-            note.content += "\n" + new_content
-            # Save the updated note
-            note.save()
-            serializer = NoteSerializer(note)
-
-            # Parse the UTC timestamp from serializer.data['created_at']
-            created_datetime = datetime.strptime(serializer.data['created_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-            updated_datetime = datetime.strptime(serializer.data['updated_at'], '%Y-%m-%dT%H:%M:%S.%fZ')
-
-            # Format local time as "year-month-day hours:minutes"
-            frmt_created = created_datetime.strftime('%Y-%m-%d, %H:%M UTC')
-            frmt_updated = updated_datetime.strftime('%Y-%m-%d, %H:%M UTC')
-
-            return Response(
-                data={
-                    'title': serializer.data['title'],
-                    'updated_content': serializer.data['content'],
-                    'created_at': frmt_created,
-                    'updated_at': frmt_updated
-                }, 
-                status=status.HTTP_200_OK
-            )
-        else:
+        # Validate the appended text the same way as the content of a new note
+        serializer = NoteSerializer(data={'content': request.data.get('content')}, partial=True)
+        if not serializer.is_valid():
             return Response(
-                data={
-                    'error': 'Unauthorized access'
-                }, 
-                status=status.HTTP_403_FORBIDDEN
+                data=serializer.errors,
+                status=status.HTTP_400_BAD_REQUEST
             )
+        new_content = serializer.validated_data['content']
+
+        # Check if the user is the note owner or a shared user, without loading the content
+        note = get_accessible_note(request.user, id, fields=['id', 'user_id'])
+        # The transaction runs on the shard holding the note
+        shard = router.db_for_write(Note, instance=note)
+        with transaction.atomic(using=shard):
+            # Append the delta in the database and save it as a new version, with a periodic full snapshot;
+            # with If-Match, only if the note is still at the version the client read
+            version = append_to_note(note, request.user, new_content, get_if_match_versions(request))
+            # Push the change to the subscribed collaborators once committed
+            publish_note_changes([version], using=shard)
+        # The new updated_at reorders the note in the owner's and every recipient's list
+        invalidate_note_lists(
+            [note.user_id, *note.shared_users.values_list('user_id', flat=True)]
+        )
+
+        # Return the change only; the full content is available from notes/<id>/
+        data = {
+            'id': note.pk,
+            'version_id': version.pk,
+            'version': version.number,
+            'delta': version.changes,
+            'updated_at': format_timestamp(note.updated_at)
+        }
+        if version.pk is None:
+            # Queued by the write-behind writer: the version has no ID yet, only its number
+            del data['version_id']
+        response = Response(data=data, status=status.HTTP_200_OK)
+        # The ETag to send in If-Match with the next update
+        response['ETag'] = version_etag(version.number)
+        return response
+    except VersionConflict as e:
+        response = Response(
+            data={
+                'error': 'Note was changed by another update',
+                'version': e.current_version
+            },
+            status=status.HTTP_412_PRECONDITION_FAILED
+        )
+        response['ETag'] = version_etag(e.current_version)
+        return response
+    except PermissionDenied:
+        return Response(
+            data={
+                'error': 'Unauthorized access'
+            }, 
+            status=status.HTTP_403_FORBIDDEN
+        )
     except Note.DoesNotExist:
         return Response(
             data={
@@ -362,32 +427,96 @@ def update_note(request, id):
         )
 
 @api_view(['GET'])
+@renderer_classes(DefaultRenderersWith(NDJSONRenderer))
 def get_note_version_history(request, id):
     """
-    View to retrieve the version history of a note.
+    View to retrieve the version history of a note, oldest first.
 
     Params:
-    - request: HTTP request object.
+    - request: HTTP request object. Accepts optional `since` and `until` datetimes, and
+      `cursor` and `page_size` for pagination. With `Accept: application/x-ndjson` or
+      `?format=ndjson`, the whole filtered history is streamed instead, one version per line.
+      Supports `If-None-Match` and `If-Modified-Since`.
     - id: ID of the note to retrieve version history for.
 
     Returns:
     - Response: HTTP response containing the version history of the note or an error message.
     """
     try:
-        note = Note.objects.get(pk=id)
-        if note.user == request.user or SharedNoteUser.objects.filter(note=note, user=request.user).exists():
-            versions = NoteVersion.objects.filter(note=note).values('timestamp', 'user__username', 'changes')
-            return Response(
-                data=versions, 
-                status=status.HTTP_200_OK
+        # Check access and read the validators with a metadata query that skips the content column
+        metadata = get_accessible_note_values(
+            request.user, id, ['updated_at', 'history_generation'], with_latest_version=True
+        )
+        # Compaction removes old versions without touching updated_at: the generation tells
+        etag, last_modified = get_validators(request, id, metadata, str(metadata['history_generation']))
+        not_modified = not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+
+        shard = shard_for_note(id)
+        versions = sharded(NoteVersion, shard).filter(note_id=id)
+
+        # Restrict the history to a time range, served by the (note, timestamp) index
+        since = get_datetime_param(request, 'since')
+        until = get_datetime_param(request, 'until')
+        if since is not None:
+            versions = versions.filter(timestamp__gte=since)
+        if until is not None:
+            versions = versions.filter(timestamp__lt=until)
+
+        # Users live on the default database: other shards return user IDs, resolved to names below
+        joins_users = shard == DEFAULT_DB_ALIAS
+        versions = versions.values('id', 'number', 'timestamp', 'user__username' if joins_users else 'user_id', 'changes')
+
+        if request.accepted_renderer.format == 'ndjson':
+            # Stream every version, reading rows from the database in bounded chunks
+            rows = versions.order_by('timestamp', 'id').iterator(
+                chunk_size=settings.NOTE_HISTORY_STREAM_CHUNK_SIZE
             )
-        else:
-            return Response(
-                data={
-                    'error': 'Unauthorized access'
-                }, 
-                status=status.HTTP_403_FORBIDDEN
+            if not joins_users:
+                rows = attach_usernames(rows, settings.NOTE_HISTORY_STREAM_CHUNK_SIZE)
+            return set_validators(
+                StreamingHttpResponse(
+                    ndjson_lines(rows),
+                    content_type=NDJSONRenderer.media_type
+                ),
+                etag,
+                last_modified
             )
+
+        # Fetch a single keyset page ordered by (timestamp, id)
+        page, next_cursor = keyset_page(
+            queryset=versions,
+            cursor=request.query_params.get('cursor'),
+            page_size=get_page_size(request),
+            field='timestamp',
+            descending=False
+        )
+        if not joins_users:
+            page = list(attach_usernames(page))
+        return set_validators(
+            Response(
+                data={
+                    'results': page,
+                    'next_cursor': next_cursor
+                },
+                status=status.HTTP_200_OK
+            ),
+            etag,
+            last_modified
+        )
+    except ValidationError as e:
+        return Response(
+            data={'error': e.messages[0]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    except PermissionDenied:
+        return Response(
+            data={
+                'error': 'Unauthorized access'
+            }, 
+            status=status.HTTP_403_FORBIDDEN
+        )
     except Note.DoesNotExist:
         return Response(
             data={
@@ -396,3 +525,236 @@ def get_note_version_history(request, id):
             status=status.HTTP_404_NOT_FOUND
         )
 
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_note_version(request, id, number):
+    """
+    View to retrieve the full content of a note as it was right after a given version.
+
+    Params:
+    - request: HTTP request object.
+    - id: ID of the note.
+    - number: Version number to materialize.
+
+    Returns:
+    - Response: HTTP response containing the note content at that version or an error message.
+    """
+    try:
+        # Only the primary key is needed to check access
+        note = get_accessible_note(request.user, id, fields=['id'])
+        return Response(
+            data={
+                'number': number,
+                'content': materialize_version(note.pk, number)
+            },
+            status=status.HTTP_200_OK
+        )
+    except PermissionDenied:
+        return Response(
+            data={
+                'error': 'Unauthorized access'
+            },
+            status=status.HTTP_403_FORBIDDEN
+        )
+    except Note.DoesNotExist:
+        return Response(
+            data={
+                'error': 'Note does not exist'
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except NoteVersion.DoesNotExist:
+        return Response(
+            data={
+                'error': 'Version does not exist'
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def get_note_diff(request, id):
+    """
+    View to compare the content of a note at two versions.
+
+    Params:
+    - request: HTTP request object. Expects the version numbers in the `from` and `to` query
+      parameters, and accepts `style=unified` for a unified diff instead of a list of changes.
+    - id: ID of the note.
+
+    Returns:
+    - Response: HTTP response containing the diff or an error message.
+    """
+    try:
+        from_number = int(request.query_params['from'])
+        to_number = int(request.query_params['to'])
+    except (KeyError, ValueError):
+        return Response(
+            data={'error': 'from and to must be version numbers'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+    style = request.query_params.get('style', 'structured')
+    if style not in DIFF_STYLES:
+        return Response(
+            data={'error': f"style must be one of: {', '.join(DIFF_STYLES)}"},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        # Check access before serving a cached diff; only the key and history generation are needed
+        note = get_accessible_note(request.user, id, fields=['id', 'history_generation'])
+        return Response(
+            data={
+                'id': note.pk,
+                'from': from_number,
+                'to': to_number,
+                'diff' if style == 'unified' else 'changes': diff_versions(
+                    note.pk, from_number, to_number, style, generation=note.history_generation
+                )
+            },
+            status=status.HTTP_200_OK
+        )
+    except PermissionDenied:
+        return Response(
+            data={
+                'error': 'Unauthorized access'
+            },
+            status=status.HTTP_403_FORBIDDEN
+        )
+    except Note.DoesNotExist:
+        return Response(
+            data={
+                'error': 'Note does not exist'
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+    except NoteVersion.DoesNotExist:
+        return Response(
+            data={
+                'error': 'Version does not exist'
+            },
+            status=status.HTTP_404_NOT_FOUND
+        )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def search(request):
+    """
+    View to search the titles and contents of the notes accessible to the authenticated user.
+
+    Params:
+    - request: HTTP request object. Expects the search text in the `q` query parameter and
+      accepts an optional `page_size` limiting the number of results.
+
+    Returns:
+    - Response: HTTP response containing the matching notes, best matches first, or an error message.
+    """
+    text = request.query_params.get('q', '').strip()
+    if not text:
+        return Response(
+            data={'error': 'Search query is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        results = search_notes(request.user, text, limit=get_page_size(request))
+        return Response(
+            data={'results': results},
+            status=status.HTTP_200_OK
+        )
+    except ValidationError as e:
+        return Response(
+            data={'error': e.messages[0]},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+@renderer_classes([NDJSONRenderer, ZipRenderer])
+def export_notes(request):
+    """
+    View to export the notes owned by the authenticated user, with their versions and shares.
+
+    Params:
+    - request: HTTP request object. The export is NDJSON, one record per line, or with
+      `Accept: application/zip` or `?format=zip`, a zip archive holding that NDJSON file.
+
+    Returns:
+    - StreamingHttpResponse: The export, streamed as it is read from the database in bounded chunks.
+    """
+    format = request.accepted_renderer.format
+    response = StreamingHttpResponse(
+        export_stream(request.user, format),
+        content_type=request.accepted_renderer.media_type
+    )
+    response['Content-Disposition'] = f'attachment; filename="notes.{format}"'
+    return response
+
+def get_batch_items(request):
+    """
+    Extract the list of batch items from a request body.
+
+    The body may be a JSON list, or a JSON object with the list under `notes`.
+
+    Params:
+    - request: HTTP request object.
+
+    Returns:
+    - list: The items, or None if the body is not a non-empty list of objects within `NOTES_MAX_BATCH_SIZE`.
+    """
+    items = request.data
+    if isinstance(items, dict):
+        items = items.get('notes')
+    if not isinstance(items, list) or not items or len(items) > settings.NOTES_MAX_BATCH_SIZE:
+        return None
+    if not all(isinstance(item, dict) for item in items):
+        return None
+    return items
+
+@api_view(['POST'])
+@permission_classes([IsAuthenticated])
+def batch_create_note(request):
+    """
+    View to create many notes at once for the authenticated user.
+
+    Params:
+    - request: HTTP request object containing a list of notes with their `title` and `content`.
+
+    Returns:
+    - Response: HTTP response containing one result per note, so invalid notes do not fail the batch.
+    """
+    items = get_batch_items(request)
+    if items is None:
+        return Response(
+            data={'error': f'A list of at most {settings.NOTES_MAX_BATCH_SIZE} notes is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(
+        data={'results': batch_create_notes(request.user, items)},
+        status=status.HTTP_200_OK
+    )
+
+@api_view(['PUT'])
+@permission_classes([IsAuthenticated])
+def batch_update_note(request):
+    """
+    View to append content to many notes at once.
+
+    Params:
+    - request: HTTP request object containing a list of updates with the note `id` and the `content` to append.
+
+    Returns:
+    - Response: HTTP response containing one result per update, so failed updates do not fail the batch.
+    """
+    items = get_batch_items(request)
+    if items is None:
+        return Response(
+            data={'error': f'A list of at most {settings.NOTES_MAX_BATCH_SIZE} updates is required'},
+            status=status.HTTP_400_BAD_REQUEST
+        )
+
+    return Response(
+        data={'results': batch_update_notes(request.user, items)},
+        status=status.HTTP_200_OK
+    )
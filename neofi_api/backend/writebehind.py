@@ -0,0 +1,282 @@
+import atexit
+import logging
+import threading
+from collections import OrderedDict
+from django.conf import settings
+from django.db import OperationalError, connections, transaction
+from .models import NoteVersion
+from .sharding import sharded
+
+logger = logging.getLogger(__name__)
+
+# Notes whose last written version number the queue remembers, to answer gap checks without a query
+WRITTEN_NOTES_LIMIT = 10000
+
+
+class VersionWriteBehind:
+    """
+    In-process queue of note versions, inserted into their shards in batches.
+
+    Versions are queued once the note update that created them commits, and written with
+    one `bulk_create` per shard and batch, by a background thread that wakes up every
+    `interval` seconds or as soon as `batch_size` versions are waiting. A caller that finds
+    `max_pending` versions waiting flushes them itself, which bounds both the memory used and
+    the versions lost if the process dies; the queue is also flushed at interpreter exit.
+
+    In synchronous mode every queued version is written at once by the caller, through the
+    same batch path, which keeps tests deterministic.
+    """
+
+    def __init__(self, batch_size=None, interval=None, max_pending=None, synchronous=None):
+        self._batch_size = batch_size
+        self._interval = interval
+        self._max_pending = max_pending
+        self._synchronous = synchronous
+        self._pending = {}
+        self._queued = set()
+        self._written = OrderedDict()
+        self._count = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self._registered = False
+
+    @property
+    def batch_size(self):
+        return self._batch_size or settings.NOTE_VERSION_WRITE_BEHIND_BATCH_SIZE
+
+    @property
+    def interval(self):
+        return self._interval if self._interval is not None else settings.NOTE_VERSION_WRITE_BEHIND_INTERVAL
+
+    @property
+    def max_pending(self):
+        return self._max_pending or settings.NOTE_VERSION_WRITE_BEHIND_MAX_PENDING
+
+    @property
+    def synchronous(self):
+        if self._synchronous is not None:
+            return self._synchronous
+        return settings.NOTE_VERSION_WRITE_BEHIND == 'sync'
+
+    def add(self, alias, version):
+        """
+        Queue an unsaved version for insertion into a shard.
+
+        Args:
+            alias (str): Alias of the shard holding the version's note.
+            version (NoteVersion): The version to insert.
+        """
+        self.add_many(alias, [version])
+
+    def add_many(self, alias, versions):
+        """
+        Queue unsaved versions for insertion into a shard; see `add`.
+        """
+        with self._lock:
+            self._pending.setdefault(alias, []).extend(versions)
+            self._queued.update(_queue_key(alias, version) for version in versions)
+            self._count += len(versions)
+            count = self._count
+
+        if self.synchronous or count >= self.max_pending:
+            self.flush()
+            return
+        self._start()
+        if count >= self.batch_size:
+            self._wakeup.set()
+
+    def flush(self):
+        """
+        Insert every queued version, one transaction per shard and batch.
+
+        Batches that fail because the database is busy are queued again for the next flush.
+        A batch failing for any other reason, such as a version number already stored, is
+        inserted again one version per transaction, so only the failing versions are logged
+        and dropped.
+
+        Returns:
+            int: The number of versions inserted.
+        """
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._count = self._pending, {}, 0
+
+            written = 0
+            for alias, versions in pending.items():
+                for start in range(0, len(versions), self.batch_size):
+                    batch = versions[start:start + self.batch_size]
+                    try:
+                        with transaction.atomic(using=alias):
+                            sharded(NoteVersion, alias).bulk_create(batch)
+                        stored, requeued = batch, []
+                    except OperationalError:
+                        logger.warning("Requeueing %d note versions for %s: database busy", len(batch), alias)
+                        stored, requeued = [], batch
+                    except Exception:
+                        stored, requeued = self._insert_each(alias, batch)
+                    written += len(stored)
+                    self._settle(alias, batch, stored, requeued)
+            return written
+
+    def _insert_each(self, alias, versions):
+        stored, requeued = [], []
+        for version in versions:
+            try:
+                with transaction.atomic(using=alias):
+                    sharded(NoteVersion, alias).bulk_create([version])
+                stored.append(version)
+            except OperationalError:
+                requeued.append(version)
+            except Exception:
+                logger.exception("Dropping version %d of note %d for %s", version.number, version.note_id, alias)
+        if requeued:
+            logger.warning("Requeueing %d note versions for %s: database busy", len(requeued), alias)
+        return stored, requeued
+
+    def _settle(self, alias, batch, stored, requeued):
+        with self._lock:
+            if requeued:
+                self._pending.setdefault(alias, []).extend(requeued)
+                self._count += len(requeued)
+            # Requeued versions are still waiting; the others are stored or dropped
+            waiting = {_queue_key(alias, version) for version in requeued}
+            self._queued.difference_update({_queue_key(alias, version) for version in batch} - waiting)
+            for version in stored:
+                key = (alias, version.note_id)
+                self._written[key] = max(version.number, self._written.get(key, 0))
+                self._written.move_to_end(key)
+            while len(self._written) > WRITTEN_NOTES_LIMIT:
+                self._written.popitem(last=False)
+
+    def is_pending(self, alias, note_id, number):
+        """
+        Tell whether a version is queued, or being written, and not stored yet.
+
+        Args:
+            alias (str): Alias of the shard holding the note.
+            note_id (int): ID of the note.
+            number (int): The version number.
+
+        Returns:
+            bool: True if the version is waiting in this process.
+        """
+        with self._lock:
+            return (alias, note_id, number) in self._queued
+
+    def is_written(self, alias, note_id, number):
+        """
+        Tell whether this process wrote a version as the latest one of its note.
+
+        Only the latest written version of the `WRITTEN_NOTES_LIMIT` most recently written
+        notes is remembered, so False means "unknown", not "missing".
+
+        Args:
+            alias (str): Alias of the shard holding the note.
+            note_id (int): ID of the note.
+            number (int): The version number.
+
+        Returns:
+            bool: True if the version was inserted by this process's queue.
+        """
+        with self._lock:
+            return self._written.get((alias, note_id)) == number
+
+    def __len__(self):
+        return self._count
+
+    def close(self):
+        """
+        Stop the background thread and write what is still queued.
+        """
+        self._stopped.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+        self._stopped.clear()
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='note-version-writer', daemon=True)
+                self._thread.start()
+                if not self._registered:
+                    atexit.register(self.close)
+                    self._registered = True
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.wait(self.interval)
+            self._wakeup.clear()
+            self.flush()
+        # The thread's database connections are its own
+        connections.close_all()
+
+
+def _queue_key(alias, version):
+    return (alias, version.note_id, version.number)
+
+
+# Process-wide queue used by save_versions
+version_writer = VersionWriteBehind()
+
+
+def previous_versions_missing(numbers, using):
+    """
+    Find the notes whose version before a new one is lost, so the new one must keep a snapshot.
+
+    Only write-behind loses versions: those still queued when a process died, and versions
+    dropped by a failed flush. Without a snapshot, none of the versions after the gap up to
+    the next scheduled snapshot could be rebuilt. A version still queued by another process
+    also counts as missing, which only costs an extra snapshot. The shard is only queried,
+    once for all notes, about the versions this process neither holds nor wrote last.
+
+    Args:
+        numbers (dict): Maps note IDs to the number of their new version.
+        using (str): Alias of the shard holding the notes.
+
+    Returns:
+        set: IDs of the notes whose version `number - 1` is neither stored nor queued in this process.
+    """
+    if not settings.NOTE_VERSION_WRITE_BEHIND:
+        return set()
+    # The queue knows the versions it holds or wrote last; only ask the shard about the others
+    previous = {
+        note_id: number - 1 for note_id, number in numbers.items()
+        if number > 1
+        and not version_writer.is_pending(using, note_id, number - 1)
+        and not version_writer.is_written(using, note_id, number - 1)
+    }
+    if not previous:
+        return set()
+    stored = set(
+        sharded(NoteVersion, using)
+        .filter(note_id__in=previous, number__in=set(previous.values()))
+        .values_list('note_id', 'number')
+    )
+    return {note_id for note_id, number in previous.items() if (note_id, number) not in stored}
+
+
+def save_versions(versions, using):
+    """
+    Store new note versions, right away or through the write-behind queue.
+
+    With `NOTE_VERSION_WRITE_BEHIND` off, the versions are inserted in the current transaction
+    with one `bulk_create`. Otherwise they are queued when that transaction commits, and get
+    their IDs only once written; until then they are missing from the history, and they are
+    lost if the process dies first.
+
+    Args:
+        versions (list): The unsaved versions.
+        using (str): Alias of the shard holding the versions' notes.
+    """
+    if not settings.NOTE_VERSION_WRITE_BEHIND:
+        sharded(NoteVersion, using).bulk_create(versions)
+        return
+    transaction.on_commit(lambda: version_writer.add_many(using, versions), using=using)
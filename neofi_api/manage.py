@@ -6,7 +6,9 @@ import sys
 
 def main():
     """Run administrative tasks."""
-    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neofi_api.settings')
+    # The test suite needs a second note shard, which only the test settings define
+    test = sys.argv[1:2] == ['test']
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neofi_api.settings_test' if test else 'neofi_api.settings')
     try:
         from django.core.management import execute_from_command_line
     except ImportError as exc:
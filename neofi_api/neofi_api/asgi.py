@@ -2,6 +2,8 @@
 ASGI config for neofi_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+HTTP requests are served by Django, and WebSocket connections by the Channels
+consumers routed in ``backend.routing``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.0/howto/deployment/asgi/
@@ -13,4 +15,17 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'neofi_api.settings')
 
-application = get_asgi_application()
+# Initialize Django before importing anything that touches the ORM
+django_asgi_app = get_asgi_application()
+
+from channels.routing import ProtocolTypeRouter, URLRouter  # noqa: E402
+from channels.security.websocket import AllowedHostsOriginValidator  # noqa: E402
+from backend.authentication import TokenAuthMiddleware  # noqa: E402
+from backend.routing import websocket_urlpatterns  # noqa: E402
+
+application = ProtocolTypeRouter({
+    'http': django_asgi_app,
+    'websocket': AllowedHostsOriginValidator(
+        TokenAuthMiddleware(URLRouter(websocket_urlpatterns))
+    ),
+})
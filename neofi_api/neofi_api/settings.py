@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import os
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -43,6 +44,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'backend.middleware.PerformanceMiddleware',
+    'backend.middleware.ReadYourWritesMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,9 +83,34 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    },
+    # Read-only handle on the same file, used for reads (see backend.routers.PrimaryReplicaRouter).
+    # Point it at a real replica when moving off SQLite.
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': f"file:{BASE_DIR / 'db.sqlite3'}?mode=ro",
+        'TEST': {
+            'MIRROR': 'default',
+        },
+    },
 }
 
+# Notes, their versions and their shares are partitioned by owner across NOTE_SHARDS
+# (see backend.sharding); users, tokens and the note directory stay on the default database.
+NOTE_SHARD_COUNT = int(os.environ.get('NEOFI_NOTE_SHARDS', '1'))
+for index in range(1, NOTE_SHARD_COUNT):
+    DATABASES[f'shard{index}'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / f'db.shard{index}.sqlite3',
+    }
+NOTE_SHARDS = ['default', *(f'shard{index}' for index in range(1, NOTE_SHARD_COUNT))]
+
+DATABASE_ROUTERS = ['backend.routers.NoteShardRouter', 'backend.routers.PrimaryReplicaRouter']
+DATABASE_REPLICA_ALIAS = 'replica'  # Connection serving reads; None sends every query to the primary
+
+SQLITE_PRAGMAS = {}  # Pragmas run on every new SQLite connection; see settings_production for a tuned set
+SQLITE_IMMEDIATE_TRANSACTIONS = False  # Start SQLite transactions with BEGIN IMMEDIATE instead of BEGIN
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -128,6 +156,68 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'backend.authentication.CachedTokenAuthentication',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
     ],
 }
+
+TOKEN_AUTH_CACHE_SIZE = 10000  # Maximum number of tokens cached by CachedTokenAuthentication
+TOKEN_AUTH_CACHE_TTL = 60  # Seconds a cached token stays valid without being checked against the database
+SIGNIN_SESSION_LOGIN = True  # signin also logs the user into a session (one database write); the API itself only uses the token
+
+# Notes settings
+NOTES_PAGE_SIZE = 100  # Default number of notes returned per page by list endpoints
+NOTES_MAX_PAGE_SIZE = 1000  # Upper bound for the `page_size` query parameter
+
+# Cache settings
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'neofi-api',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # The shard directory has its own cache, so note-list pages never evict it (see backend.sharding)
+    'shard-directory': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'neofi-api-shard-directory',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
+NOTES_LIST_CACHE_ALIAS = 'default'  # Cache used for per-user note lists
+NOTES_LIST_CACHE_TIMEOUT = 300  # Seconds a cached note-list page stays valid
+NOTE_SHARD_CACHE_ALIAS = 'shard-directory'  # Cache holding user placements and note owners; share it between processes
+NOTE_SHARD_CACHE_TIMEOUT = 60  # Seconds a cached placement may still point at a user's old shard after a move
+NOTE_VERSION_SNAPSHOT_INTERVAL = 50  # A full note snapshot is stored every this many versions
+NOTE_HISTORY_STREAM_CHUNK_SIZE = 500  # Versions read from the database per chunk when streaming history as NDJSON
+NOTE_DIFF_CACHE_SIZE = 1000  # Version diffs kept per process in an LRU cache
+NOTE_EXPORT_CHUNK_SIZE = 500  # Notes read per query when exporting a user's notes
+NOTE_IMPORT_BATCH_SIZE = 1000  # Export records inserted per transaction when importing notes
+NOTES_MAX_BATCH_SIZE = 1000  # Maximum number of notes accepted by the batch create and update endpoints
+NOTE_VERSION_WRITE_BEHIND = False  # True queues note versions and inserts them in background batches; 'sync' writes each batch at commit (tests)
+NOTE_VERSION_WRITE_BEHIND_BATCH_SIZE = 500  # Queued versions that trigger a flush, and rows per bulk insert
+NOTE_VERSION_WRITE_BEHIND_INTERVAL = 1.0  # Seconds between background flushes
+NOTE_VERSION_WRITE_BEHIND_MAX_PENDING = 5000  # Queued versions at which the request flushes itself; bounds what a crash can lose
+NOTE_COMPRESSION_MIN_SIZE = 512  # Note contents and version payloads from this many bytes are stored zlib-compressed
+NOTE_COMPRESSION_LEVEL = 6  # zlib compression level of stored note contents and version payloads
+
+# Channels settings
+# https://channels.readthedocs.io/en/latest/topics/channel_layers.html
+
+ASGI_APPLICATION = 'neofi_api.asgi.application'
+
+CHANNEL_LAYERS = {
+    'default': {
+        # In-process layer for tests and single-node deployments; use channels_redis across several nodes
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
@@ -0,0 +1,40 @@
+"""
+API-only settings for neofi_api.
+
+Extends the production settings for serving the token-authenticated JSON API alone:
+the admin, sessions, messages, static files and the template engine are not loaded,
+requests skip the session, CSRF, authentication (DRF authenticates the token itself),
+message and clickjacking middleware, and `signin` does not write a session. Responses
+are JSON only (no browsable API). Select it with
+`DJANGO_SETTINGS_MODULE=neofi_api.settings_api`; `python manage.py benchmark_settings`
+compares its startup time and per-request overhead with the default settings.
+"""
+
+from .settings_production import *  # noqa: F401,F403
+from .settings_production import REST_FRAMEWORK
+
+INSTALLED_APPS = [
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'rest_framework',
+    'rest_framework.authtoken',
+    'backend',
+]
+
+MIDDLEWARE = [
+    'backend.middleware.PerformanceMiddleware',
+    'backend.middleware.ReadYourWritesMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.middleware.common.CommonMiddleware',
+]
+
+TEMPLATES = []
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': [
+        'backend.renderers.FastJSONRenderer',
+    ],
+}
+
+SIGNIN_SESSION_LOGIN = False
@@ -0,0 +1,19 @@
+"""
+ASGI production settings for neofi_api.
+
+Extends the production settings for ASGI servers such as daphne, which also serve the
+WebSocket notifications. Sync views run there in executor threads that Django's
+end-of-request cleanup does not reach, so persistent connections would pile up, one per
+thread, and hold their WAL read snapshots open: connections are closed after each request
+instead. Select it with `DJANGO_SETTINGS_MODULE=neofi_api.settings_asgi`.
+"""
+
+import copy
+
+from .settings_production import *  # noqa: F401,F403
+from .settings_production import DATABASES
+
+# Copy, so importing this module never changes the production settings
+DATABASES = copy.deepcopy(DATABASES)
+for database in DATABASES.values():
+    database['CONN_MAX_AGE'] = 0
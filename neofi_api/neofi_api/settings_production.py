@@ -0,0 +1,49 @@
+"""
+Production settings for neofi_api.
+
+Extends the default settings with a SQLite setup tuned for concurrent requests:
+WAL journaling and tuned pragmas applied to every new connection, and persistent
+connections for WSGI servers (see settings_asgi for ASGI). Select it with `DJANGO_SETTINGS_MODULE=neofi_api.settings_production`
+(or `--settings neofi_api.settings_production`).
+"""
+
+import copy
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, SECRET_KEY
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', 'localhost').split(',') if host]
+
+
+# Database
+# https://docs.djangoproject.com/en/5.0/ref/databases/#sqlite-notes
+
+# Copy, so importing this module never changes the default settings
+DATABASES = copy.deepcopy(DATABASES)
+for database in DATABASES.values():
+    database.update({
+        # Keep connections open across requests, so a WSGI worker opens its connection (and
+        # runs the pragmas below) once; settings_asgi closes them after each request instead
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,  # Check a reused connection before the request and reopen it if it failed
+        'OPTIONS': {
+            'timeout': 5,  # Seconds sqlite3 waits for a lock (its busy handler), matching busy_timeout below
+        },
+    })
+
+# Pragmas run on every new SQLite connection (see backend.db.configure_sqlite_connection)
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers never block the writer and the writer never blocks readers
+    'synchronous': 'NORMAL',  # fsync on checkpoints only; safe from corruption in WAL mode
+    'busy_timeout': 5000,  # Milliseconds to wait for the write lock instead of failing with "database is locked"
+    'cache_size': -64000,  # Page cache of about 64 MB per connection (negative values are KiB)
+    'mmap_size': 268435456,  # Read the first 256 MB of the database through memory mapping
+}
+
+# Start transactions with BEGIN IMMEDIATE, so writers wait on busy_timeout instead of failing
+SQLITE_IMMEDIATE_TRANSACTIONS = True
@@ -0,0 +1,18 @@
+"""
+Test settings for neofi_api.
+
+Extends the default settings with a second note shard, `shard1`, so the test suite can
+exercise sharding; the sharding tests spread notes over it with `NOTE_SHARDS`.
+`python manage.py test` selects this module unless `DJANGO_SETTINGS_MODULE` is set.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES
+
+DATABASES = {
+    **DATABASES,
+    'shard1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db.shard1.sqlite3',
+    },
+}